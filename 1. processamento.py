@@ -3,7 +3,10 @@ import time
 import numpy as np
 import matplotlib.pyplot as plt
 from PIL import Image
-import zipfile
+from filtros import filtro_media_integral
+from armazenamento import salvar_npy_zip
+from imagens import carregar_manifesto, carregar_pilha
+from cache_etapas import CacheEtapas, hash_manifesto
 
 """
 
@@ -26,9 +29,10 @@ análises ou compressões.
    ➤ Cada imagem é convertida em uma matriz, onde cada elemento representa a 
       intensidade de cinza (valores de 0 a 255).
 
-5️⃣ **Zero Padding**
-   ➤ Adiciona uma borda de zeros nas imagens (tamanho configurável) para 
-      preservar as bordas durante operações de filtragem.
+5️⃣ **Zero Padding (virtual)**
+   ➤ As bordas são tratadas dentro do filtro (modo constante/refletir/repetir),
+      sem montar uma cópia da pilha com `np.pad`. Com `manter_padding` a saída
+      mantém o shape antigo, `size_padding` pixels maior de cada lado (3002x2002).
 
 6️⃣ **Filtro de Média**
    ➤ Aplica uma máscara NxN para suavizar a imagem, reduzindo ruídos. 
@@ -44,48 +48,27 @@ análises ou compressões.
 
 9️⃣ **Salvamento dos dados**
    ➤ As matrizes das imagens originais e suavizadas são salvas em arquivos `.npy`.
-   ➤ Esses arquivos são compactados em `.zip` para fácil armazenamento e transporte.
-   ➤ Após compactar, os arquivos `.npy` são apagados do diretório para não ocupar espaço extra.
+   ➤ O `.npy` é escrito direto dentro do `.zip` (em blocos), sem arquivo temporário no diretório.
 
 ⚙️ PARÂMETROS CONFIGURÁVEIS:
 - `pasta_imagens` → caminho onde estão as imagens.
+- `modo_bordas` → como tratar o que fica fora da imagem ("constante", "refletir", "repetir").
+- `manter_padding` → mantém o shape com padding (mesmo resultado de zero padding + filtro).
 - `size_padding` → tamanho do zero padding aplicado nas bordas (ex.: 1, 2...).
 - `filtro_size` → tamanho da máscara do filtro de média (ex.: 3x3, 5x5...).
 
 """
 ##################################
-# Contar imagens na pasta
-##################################
-def contareler_imagens(pasta):
-    formatos_validos = {"png", "jpg", "jpeg", "bmp"}
-    imagens = [f for f in os.listdir(pasta) if f.split(".")[-1].lower() in formatos_validos]
-    return len(imagens), imagens
-
-'''
-se
-"gato.png"
-"cachorro.JPG"
-"documento.pdf"
-"letra.txt"
-"pato.jpeg"
-
-retorna:
-quantidade de imagens (nesse caso seriam 3) e imagens:
-["gato.png", "cachorro.JPG", "pato.jpeg"]
-
-'''
-##################################
 # Obter tamanho das imagens
 ##################################
-def obter_tamanho_imagens(pasta):
-    _, imagens = contareler_imagens(pasta)
+def obter_tamanho_imagens(pasta, manifesto=None):
+    if manifesto is None:
+        manifesto = carregar_manifesto(pasta)  # só cabeçalhos, reaproveita o índice salvo
     tamanhos = set()
-    
-    for imagem in imagens:
-        caminho = os.path.join(pasta, imagem)  
-        with Image.open(caminho) as img:
-            tamanhos.add(img.size)  # (largura, altura)
-    
+
+    for entrada in manifesto:
+        tamanhos.add((entrada["largura"], entrada["altura"]))  # (largura, altura)
+
     return tamanhos
 
 '''
@@ -107,45 +90,37 @@ retorna:
 ##################################
 # Padronizar formatos para JPG
 ##################################
-def padronizar_formatos(pasta):
-    _, imagens = contareler_imagens(pasta)
-    formatos = set()
-    
-    for imagem in imagens:
-        caminho = os.path.join(pasta, imagem)
-        with Image.open(caminho) as img:
-            formatos.add(img.format.lower())
-    
+def padronizar_formatos(pasta, manifesto=None):
+    if manifesto is None:
+        manifesto = carregar_manifesto(pasta)
+    formatos = {entrada["formato"] for entrada in manifesto}
+
     if len(formatos) > 1:
-        for imagem in imagens:
-            caminho = os.path.join(pasta, imagem)
+        for entrada in manifesto:
+            caminho = os.path.join(pasta, entrada["nome"])
             with Image.open(caminho) as img:
                 novo_caminho = os.path.splitext(caminho)[0] + ".jpg"
                 img.convert("L").save(novo_caminho, "JPEG")
                 os.remove(caminho)
+        manifesto = carregar_manifesto(pasta)  # reinspeciona só os arquivos convertidos
+
+    return manifesto
 
 
 
 ##################################
 # Converter imagens para matrizes de intensidade
 ##################################
-def converter_para_matriz(pasta):
-    _, imagens = contareler_imagens(pasta)
-    matrizes = []
-    
-    for imagem in imagens:
-        caminho = os.path.join(pasta, imagem)
-        with Image.open(caminho) as img:
-            matriz = np.array(img, dtype=np.uint8) # transforma os pixels da imagem em uma matriz de números inteiros (entre 0 e 255)
-            matrizes.append(matriz)
-    
-    return matrizes # escala de cinza
+def converter_para_matriz(pasta, manifesto=None, usar_cache=False):
+    # decodifica as imagens em várias threads direto numa pilha (n, altura, largura) uint8
+    # (com usar_cache o JPG só é decodificado na primeira execução; depois vem do cache .npy)
+    return carregar_pilha(pasta, manifesto, usar_cache=usar_cache) # escala de cinza
 
 '''
 np.array(img) → converte a imagem para uma matriz.
 dtype=np.uint8 → define que os valores vão de 0 a 255.
 
-Retorna a lista matrizes, que contém todas as imagens convertidas em matrizes NumPy
+Retorna a pilha matrizes, com todas as imagens convertidas em matrizes NumPy
 '''
 ##################################
 # Obter tamanho de uma matriz
@@ -157,48 +132,18 @@ def obter_tamanho_matriz(matriz):
 '''
 verificar se tamanho da matriz é = ao da imagem
 '''
-##################################
-# Adicionar zero padding
-##################################
-def zero_padding(matrizes, size):
-    return [np.pad(matriz, pad_width=size, mode='constant', constant_values=0) for matriz in matrizes]
-
-'''
-[[1, 2, 3],
- [4, 5, 6],
- [7, 8, 9]]
-
- size = 1
- [[0, 0, 0, 0, 0],
- [0, 1, 2, 3, 0],
- [0, 4, 5, 6, 0],
- [0, 7, 8, 9, 0],
- [0, 0, 0, 0, 0]]
-'''
-
 ##################################
 # Aplicar filtro de média NxN
 ##################################
-def filtro_media(matrizes, filtro_size):
-    pad = filtro_size // 2
-    suavizadas = []
-
-    for matriz in matrizes:
-        altura, largura = matriz.shape
-        nova_matriz = np.copy(matriz)
-
-        # Percorre apenas os pixels que NÃO são do padding
-        for i in range(pad, altura - pad):
-            for j in range(pad, largura - pad):
-                # Extrai a região NxN ao redor do pixel atual
-                vizinhanca = matriz[i-pad:i+pad+1, j-pad:j+pad+1]
-                media = np.sum(vizinhanca) / (filtro_size ** 2)     # Calcula a média
-                nova_matriz[i, j] = int(media)                      # Atualiza o pixel
-
-        suavizadas.append(nova_matriz.astype(np.uint8))
-
-    return suavizadas
-
+def filtro_media(matrizes, filtro_size, bordas=None, manter_padding=False, size_padding=None):
+    # Soma de cada janela via imagem integral (custo por pixel independente de filtro_size)
+    # Sem `bordas`: mesmo resultado do laço por pixel (bordas intactas, média truncada com int())
+    # Com `bordas`: padding virtual; com manter_padding=True o resultado é o mesmo de
+    # zero padding de size_padding (np.pad constante) seguido do filtro, sem a cópia com padding
+    # devolve a pilha (n, h, w) uint8 direto, sem lista (evita a cópia de np.array depois)
+    return filtro_media_integral(np.asarray(matrizes), filtro_size,
+                                 bordas=bordas, manter_padding=manter_padding,
+                                 size_padding=size_padding)
 
 '''
 
@@ -263,27 +208,17 @@ def exibir_histograma(matriz, titulo='Histograma de Intensidade'):
 def calcular_desvio_padrao(matriz):
     return np.std(matriz)
 
-##################################
-# Salvar matrizes em .npy
-##################################
-def salvar_matrizes(nome_arquivo, matrizes):
-    np.save(nome_arquivo, np.array(matrizes))
-    print(f"Matrizes salvas em {nome_arquivo}")
-
-##################################
-# Compactar em zip
-##################################
-def compactar_npy(nome_arquivo_npy, nome_zip):
-    with zipfile.ZipFile(nome_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(nome_arquivo_npy)
-    print(f"Arquivo compactado salvo como {nome_zip}")
-
 ##############################################
 # CONFIGURAÇÕES INICIAIS (PARÂMETROS AJUSTÁVEIS)
 ##############################################
 pasta_imagens = r"C:\\Users\\rafae\\Desktop\\perc-x-conv-rn\\img"  # Caminho da pasta com imagens
 size_padding = 1             # ➤ Tamanho do zero padding (ex: 1, 2, ...)
-filtro_size = 3              # ➤ Tamanho da máscara do filtro de média (ex: 3, 5, ...)
+filtro_size = 3              # ➤ Tamanho da máscara do filtro de média (ímpar: 3, 5, ...)
+modo_bordas = "constante"    # ➤ Fora da imagem: "constante" (zeros), "refletir" ou "repetir"
+manter_padding = True        # ➤ Saída com o padding de size_padding pixels, como antes
+pasta_cache = "cache_etapas" # ➤ Resultados por etapa (chave = entradas + parâmetros)
+limite_cache = 8 * 1024 ** 3 # ➤ Tamanho máximo da pasta de cache (bytes)
+usar_cache_decodificadas = True  # ➤ .npy sem compressão por imagem em <pasta>_decodificadas (~6 MB cada, sem limite)
 
 ##############################################
 # PROCESSAMENTO DAS IMAGENS
@@ -293,17 +228,21 @@ filtro_size = 3              # ➤ Tamanho da máscara do filtro de média (ex:
 tempo_inicio = time.time()
 
 # 📸 Contagem de imagens e padronização de formatos
-quantidade, _ = contareler_imagens(pasta_imagens)
-padronizar_formatos(pasta_imagens)
+# (manifesto: um único passe lendo só cabeçalhos, salvo ao lado da pasta)
+manifesto = carregar_manifesto(pasta_imagens)
+quantidade = len(manifesto)
+manifesto = padronizar_formatos(pasta_imagens, manifesto)
 
 # 🔄 Conversão das imagens para matrizes
-matrizes = converter_para_matriz(pasta_imagens)
-
-# ➕ Aplicação de zero padding
-padded_matrices = zero_padding(matrizes, size_padding)
+matrizes = converter_para_matriz(pasta_imagens, manifesto, usar_cache_decodificadas)
 
-# 🧹 Aplicação do filtro de média
-matrizes_suavizadas = filtro_media(padded_matrices, filtro_size)
+# 🧹 Aplicação do filtro de média (zero padding virtual, sem cópia da pilha)
+# Com as mesmas imagens (hashes do manifesto) e parâmetros, vem direto do cache
+cache = CacheEtapas(pasta_cache, limite_bytes=limite_cache)
+matrizes_suavizadas, chave_suavizadas = cache.executar(
+    "suavizacao", filtro_media, [matrizes], filtro_size,
+    chaves_entradas=[hash_manifesto(manifesto)],
+    bordas=modo_bordas, manter_padding=manter_padding, size_padding=size_padding)
 
 # 📐 Médias
 media_original = np.mean(matrizes[0])
@@ -316,7 +255,7 @@ desvio_padrao_original = calcular_desvio_padrao(matrizes[0])
 
 # 📏 Obtenção e exibição dos tamanhos das matrizes (original e com padding)
 tamanho_original = obter_tamanho_matriz(matrizes[0])
-tamanho_padded = obter_tamanho_matriz(padded_matrices[0])
+tamanho_padded = obter_tamanho_matriz(matrizes_suavizadas[0])
 
 
 # ⏱️ Fim do temporizador e cálculo do tempo total
@@ -345,23 +284,15 @@ print(f"⏳ Tempo total de execução: {tempo_total:.2f} segundos")
 
 # verificar formato de grupos de imagens
 print(matrizes)
-print(np.array(matrizes_suavizadas).shape)
+print(matrizes_suavizadas.shape)
 
-# 💾 Salvamento das matrizes (lidas do zip) em arquivo .npy
-npy_path_matrizes = "matrizes_tcc.npy"
+# 💾 Salvamento das matrizes direto no zip (.npy escrito em streaming, sem arquivo temporário)
 zip_path_matrizes = "matrizes_tcc.zip"
+salvar_npy_zip(zip_path_matrizes, matrizes)
 
-salvar_matrizes(npy_path_matrizes, matrizes)
-compactar_npy(npy_path_matrizes, zip_path_matrizes)
-os.remove(npy_path_matrizes)
-
-# 💾 Salvamento das matrizes suavizadas em arquivo .npy
-npy_path_suavizadas = "matrizes_suavizadas_tcc.npy"
+# 💾 Salvamento das matrizes suavizadas direto no zip
 zip_path_suavizadas = "matrizes_suavizadas_tcc.zip"
-
-salvar_matrizes(npy_path_suavizadas, matrizes_suavizadas)
-compactar_npy(npy_path_suavizadas, zip_path_suavizadas)
-os.remove(npy_path_suavizadas)
+salvar_npy_zip(zip_path_suavizadas, matrizes_suavizadas)
 
 """
 📂 Total de imagens: 24
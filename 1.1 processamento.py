@@ -1,9 +1,9 @@
-import io
 import numpy as np
 import matplotlib.pyplot as plt
-from PIL import Image
-import zipfile
-import os
+from armazenamento import salvar_mascaras_zip, carregar_matrizes_zip
+from filtros import reduzir_blocos, binarizar_por_histograma
+from pilha import PilhaImagens
+from cache_etapas import CacheEtapas
 
 """
 
@@ -15,27 +15,12 @@ redução das matrizes, além de visualização e salvamento dos resultados.
 """
 zip_path_original = 'matrizes_tcc.zip'
 zip_path_suavizadas = 'matrizes_suavizadas_tcc.zip'
+pasta_cache = "cache_etapas"    # ➤ Resultados por etapa (chave = entradas + parâmetros)
+limite_cache = 8 * 1024 ** 3    # ➤ Tamanho máximo da pasta de cache (bytes)
 
-matrizes = []
-matrizes_suavizadas = []
-
-# Abrir matrizes originais
-with zipfile.ZipFile(zip_path_original, 'r') as zip_ref:
-    npy_arquivos = [nome for nome in zip_ref.namelist()
-                    if nome.endswith('.npy')]
-    for nome in npy_arquivos:
-        with zip_ref.open(nome) as arquivo:
-            matriz = np.load(io.BytesIO(arquivo.read()))
-            matrizes.append(matriz)
-
-# Abrir matrizes suavizadas
-with zipfile.ZipFile(zip_path_suavizadas, 'r') as zip_ref:
-    npy_arquivos = [nome for nome in zip_ref.namelist()
-                    if nome.endswith('.npy')]
-    for nome in npy_arquivos:
-        with zip_ref.open(nome) as arquivo:
-            matriz = np.load(io.BytesIO(arquivo.read()))
-            matrizes_suavizadas.append(matriz)
+# Abrir matrizes originais e suavizadas como pilhas (n, altura, largura) uint8
+matrizes = PilhaImagens.de_matrizes(carregar_matrizes_zip(zip_path_original), "originais")
+matrizes_suavizadas = PilhaImagens.de_matrizes(carregar_matrizes_zip(zip_path_suavizadas), "suavizadas")
 
 ##############################################
 # FUNÇÕES
@@ -70,85 +55,29 @@ def exibir_histograma(matriz_original, matriz_suavizada, titulo_original='Histog
     plt.tight_layout()
     plt.show()
 
-##################################
-# Calcular desvio padrão do histograma (intensidade)
-##################################
-
-
-def calcular_desvio_padrao(matriz):
-    return np.std(matriz)
-
-"""
-def calcular_desvio_padrao_manual(matriz):
-    # Converter a matriz para um array 1D de valores de intensidade
-    valores = matriz.ravel()
-
-    # 1. Calcular a média
-    media = np.mean(valores)
-
-    # 2. Calcular a soma dos quadrados das diferenças em relação à média
-    soma_quadrados = np.sum((valores - media) ** 2)
-
-    # 3. Calcular a variância (média dos quadrados das diferenças)
-    variancia = soma_quadrados / len(valores)
-
-    # 4. Calcular o desvio padrão (raiz quadrada da variância)
-    desvio_padrao_manual = np.sqrt(variancia)
-
-    return desvio_padrao_manual
-"""
 ##################################
 # Binarizar matrizes suavizadas
 ##################################
 
-def binarizar_matrizes(matrizes, limiares):
-    """
-    Binariza cada matriz da lista com seu respectivo limiar, gerando valores 0 e 255.
-    
-    Args:
-        matrizes (array): shape (N, altura, largura)
-        limiares (list ou array): lista de limiares de tamanho N
-    
-    Retorna:
-        Array binarizado com valores 0 e 255, shape (N, altura, largura)
-    """
-    matrizes_binarizadas = []
-
-    for i, matriz in enumerate(matrizes):
-        binarizada = np.where(matriz >= limiares[i], 255, 0)
-        matrizes_binarizadas.append(binarizada)
-
-    return np.array(matrizes_binarizadas, dtype=np.uint8)
+def binarizar_pilha(matrizes, k_desvios):
+    # um único limiar k·σ + μ para a pilha inteira ([None]: a pilha é uma unidade);
+    # o histograma do passe de binarização também dá média, desvio e limiar,
+    # guardados no cache junto com a máscara
+    binarizadas, estatisticas = binarizar_por_histograma(matrizes[None], k_desvios)
+    return {"binarizadas": binarizadas[0], **estatisticas}
 
 
 ##################################
 # Redução por máscara de blocos
 ##################################
+def reduzir_com_mascara(binary_images, block_size):
     """
     Reduz um conjunto de imagens binarizadas.
     binary_images: array numpy no formato (n_imagens, altura, largura)
     Retorna: array numpy no formato (n_imagens, altura//block_size, largura//block_size)
     """
-def reduzir_com_mascara(binary_images, block_size):
-    n_batches, n_imagens, h, w = binary_images.shape
-
-    reduced_h = h // block_size
-    reduced_w = w // block_size
-
-    # criar array para armazenar as imagens reduzidas
-    reduced_images = np.zeros(
-        (n_batches, n_imagens, reduced_h, reduced_w), dtype=np.uint8)
-
-    for b in range(n_batches):
-        for idx in range(n_imagens):
-            for i in range(reduced_h):
-                for j in range(reduced_w):
-                    block = binary_images[b, idx, i*block_size:(
-                        i+1)*block_size, j*block_size:(j+1)*block_size]
-                    reduced_images[b, idx, i, j] = 255 if np.mean(
-                        block) > ((255+255)/4) else 0
-
-    return reduced_images
+    # blocos via reshape (vetorizado): 255 se a média do bloco > (255+255)/4, senão 0
+    return reduzir_blocos(binary_images, block_size, regra="media", bordas="cortar")
 
 ##################################
 # Exibir imagens (agora com 2 colunas)
@@ -180,75 +109,52 @@ def exibir_imagens1(binarizada, reduzida):
 
     plt.tight_layout()
     plt.show()
-##################################
-# Salvar matrizes em .npy
-##################################
-def salvar_matrizes(nome_arquivo, matrizes):
-    np.save(nome_arquivo, np.array(matrizes))
-    print(f"Matrizes salvas em {nome_arquivo}")
-
-##################################
-# Compactar em zip
-##################################
-
-
-def compactar_npy(nome_arquivo_npy, nome_zip):
-    with zipfile.ZipFile(nome_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(nome_arquivo_npy)
-    print(f"Arquivo compactado salvo como {nome_zip}")
-
 ##############################################
 # PROCESSAMENTO DAS IMAGENS
 ##############################################
 
-
-# 📐 Médias
-# media_original = np.mean(matrizes[0])
-# media = np.mean(matrizes_suavizadas[0])
-# 📉 Cálculo do desvio padrão das matrizes originais e suavizadas
-# desvio_padrao_original = calcular_desvio_padrao(matrizes[0])
-# desvio_padrao = calcular_desvio_padrao(matrizes_suavizadas[0])
-#desvio_padrao_original_manual = calcular_desvio_padrao_manual(matrizes[0])
-#desvio_padrao_manual = calcular_desvio_padrao_manual(matrizes_suavizadas[0])
-# limiar = 5 * desvio_padrao + media  # ➤ Limiar para binarização (0 a 255)
-
-# 🧠 Cálculo das médias e desvios
-medias_suavizadas = [np.mean(m) for m in matrizes_suavizadas]
-desvios_suavizadas = [calcular_desvio_padrao(m) for m in matrizes_suavizadas]
-
-# 📐 Cálculo dos limiares
-limiares = [5 * desvios_suavizadas[i] + medias_suavizadas[i] for i in range(len(matrizes_suavizadas))]
-
-# ⬛ Binarização das matrizes suavizadas com base no limiar
-matrizes_binarizadas = binarizar_matrizes(matrizes_suavizadas, limiares)
-matrizes_binarizadas = np.array(matrizes_binarizadas)
-
-# 🔵 Definir o tamanho do bloco para redução
-# block_size = 2  # bloco 2x2 = 4 (reduz 4 pixeis para 1)
-#matrizes_reduzidas = reduzir_com_mascara(matrizes_binarizadas, block_size)
+# 🧠 Média, desvio e limiar (k * desvio + média) pelo histograma de 256 posições
+# da pilha inteira, no mesmo passe da binarização: um único limiar para todas
+# as imagens (não um por imagem)
+k_desvios = 5
+
+# 🗃️ Binarização e redução vêm do cache quando as suavizadas (hash do conteúdo),
+# k_desvios e block_size são os mesmos da última execução
+cache = CacheEtapas(pasta_cache, limite_bytes=limite_cache)
+estatisticas, chave_binarizadas = cache.executar(
+    "binarizacao", binarizar_pilha, [matrizes_suavizadas.dados], k_desvios)
+matrizes_binarizadas = matrizes_suavizadas.seguinte("binarizacao", estatisticas["binarizadas"],
+                                                    dtype=np.uint8, mesmo_shape=True)
+medias_suavizadas = estatisticas["medias"]
+desvios_suavizadas = estatisticas["desvios"]
+limiares = estatisticas["limiares"]
 
 # 🔵 Reduzindo as matrizes binarizadas com blocos 2x2 usando média
 block_size = 2
-matrizes_reduzidas = reduzir_com_mascara(matrizes_binarizadas, block_size)
+reduzidas, chave_reduzidas = cache.executar(
+    "reducao", reduzir_com_mascara, [matrizes_binarizadas.dados], block_size,
+    chaves_entradas=[chave_binarizadas])
+matrizes_reduzidas = matrizes_binarizadas.seguinte("reducao", reduzidas, dtype=np.uint8)
+print(matrizes_reduzidas.memoria())
+
+# 🗜️ Binarizadas só são usadas para exibir e salvar: manter compactadas em bits (8x menor)
+matrizes_binarizadas = matrizes_binarizadas.para_mascara()
 
 # verificar formato de grupos de imagens
-#print(np.array(matrizes).shape)
-print(f"Formato da lista das matrizes original: {np.array(matrizes).shape}")
-#print(np.array(matrizes_suavizadas).shape)
-print(f"Formato da lista das matrizes suavizdas: {np.array(matrizes_suavizadas).shape}")
+print(f"Formato da lista das matrizes original: {matrizes.shape}")
+print(f"Formato da lista das matrizes suavizdas: {matrizes_suavizadas.shape}")
 
 # 📋 Impressão de resultados
 print(f"🎯 Desvio padrão da matriz suavizada [0]: {desvios_suavizadas[0]:.2f}")
 print(f"📊 Média da matriz suavizada [0]: {medias_suavizadas[0]:.2f}")
-print(f"📐 Limiar [0]: 5 * {desvios_suavizadas[0]:.2f} + {medias_suavizadas[0]:.2f} = {limiares[0]:.2f}")
+print(f"📐 Limiar [0]: {k_desvios} * {desvios_suavizadas[0]:.2f} + {medias_suavizadas[0]:.2f} = {limiares[0]:.2f}")
 
 print(f"Formato da lista das matrizes binarizadas: {matrizes_binarizadas.shape}")
-#print(matrizes_binarizadas.shape)  # Verifique se ficou (24, x, y)
 print("Formato da matriz binarizada:", matrizes_binarizadas[0].shape)
 print("Formato da matriz reduzidas:", matrizes_reduzidas[0].shape)
+print(f"Memória das binarizadas compactadas: {matrizes_binarizadas.nbytes / 1e6:.1f} MB")
 
 print(f"Formato da lista das matrizes reduzidas: {matrizes_reduzidas.shape}")
-#print(matrizes_reduzidas.shape)  # Verifique se ficou (24, x, y)
 print("Formato da matriz binarizada:", matrizes_reduzidas[0].shape)
 print("Formato da matriz reduzidas:", matrizes_reduzidas[0].shape)
 
@@ -256,41 +162,32 @@ print("Formato da matriz reduzidas:", matrizes_reduzidas[0].shape)
 exibir_histograma(matrizes[0], matrizes_suavizadas[0])
 
 # 📊 Plot: imagem original, suavizada, binarizada e reduzida
-exibir_imagens(matrizes[0][0],             # First image (3000, 2000)
-               matrizes_suavizadas[0][0])   # First smoothed image (3002, 2002)
+exibir_imagens(matrizes[0],             # First image (3000, 2000)
+               matrizes_suavizadas[0])   # First smoothed image (3002, 2002)
 
 # 📊 Plot: imagem original, suavizada, binarizada e reduzida
-exibir_imagens1(matrizes_binarizadas[0][0],  # First binarized image (3002, 2002)
-               matrizes_reduzidas[0][0])    # First reduced image (1501, 1001)
+exibir_imagens1(matrizes_binarizadas[0].para_uint8(),  # First binarized image (3002, 2002)
+               matrizes_reduzidas[0])    # First reduced image (1501, 1001)
 
-# 💾 Salvamento das matrizes binarizadas em arquivo .npy
-npy_path_binarizadas = "matrizes_binarizadas_tcc.npy"
+# 💾 Salvamento das matrizes binarizadas no zip (uma entrada por imagem, 8 pixels por byte)
 zip_path_binarizadas = "matrizes_binarizadas_tcc.zip"
+salvar_mascaras_zip(zip_path_binarizadas, matrizes_binarizadas)
 
-salvar_matrizes(npy_path_binarizadas, matrizes_binarizadas)
-compactar_npy(npy_path_binarizadas, zip_path_binarizadas)
-os.remove(npy_path_binarizadas)
-
-# 💾 Salvamento das matrizes reduzidas em arquivo .npy
-npy_path_reduzidas = "matrizes_reduzidas_tcc.npy"
+# 💾 Salvamento das matrizes reduzidas no zip (uma entrada por imagem, 8 pixels por byte)
 zip_path_reduzidas = "matrizes_reduzidas_tcc.zip"
-
-salvar_matrizes(npy_path_reduzidas, matrizes_reduzidas)
-compactar_npy(npy_path_reduzidas, zip_path_reduzidas)
-os.remove(npy_path_reduzidas)
+salvar_mascaras_zip(zip_path_reduzidas, matrizes_reduzidas.dados)
 
 """
 Resultados:
-Formato da lista das matrizes original: (1, 24, 3000, 2000)
-Formato da lista das matrizes suavizdas: (1, 24, 3002, 2002)
+Formato da lista das matrizes original: (24, 3000, 2000)
+Formato da lista das matrizes suavizdas: (24, 3002, 2002)
 🎯 Desvio padrão da matriz suavizada [0]: 25.30
 📊 Média da matriz suavizada [0]: 50.49
-📐 Limiar [0]: 5.8 * 25.30 + 50.49 = 176.99
-Formato da lista das matrizes binarizadas: (1, 24, 3002, 2002)
-Formato da matriz binarizada: (24, 3002, 2002)
-Formato da lista das matrizes reduzidas: (1, 24, 1501, 1001)
-Formato da matriz binarizada: (24, 1501, 1001)
-Matrizes salvas em matrizes_binarizadas_tcc.npy
-Arquivo compactado salvo como matrizes_binarizadas_tcc.zip
-Arquivo compactado salvo como matrizes_reduzidas_tcc.zip
+📐 Limiar [0]: 5 * 25.30 + 50.49 = 176.99
+Formato da lista das matrizes binarizadas: (24, 3002, 2002)
+Formato da matriz binarizada: (3002, 2002)
+Formato da matriz reduzidas: (1501, 1001)
+Formato da lista das matrizes reduzidas: (24, 1501, 1001)
+Matrizes salvas em matrizes_binarizadas_tcc.zip (24 imagens, shape (24, 3002, 2002))
+Matrizes salvas em matrizes_reduzidas_tcc.zip (24 imagens, shape (24, 1501, 1001))
 """
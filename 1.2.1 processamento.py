@@ -1,63 +1,42 @@
 import numpy as np
-import zipfile
-import io
 import matplotlib.pyplot as plt
-import os
-from scipy.ndimage import correlate, binary_erosion, binary_dilation
+from armazenamento import salvar_mascaras_zip, carregar_mascaras_zip
+from mascaras import MascaraBits
+from morfologia import (aplicar_padroes_3x3, padrao_de_esqueleto, erosao, dilatacao,
+                        aplicar_padroes_bits, erosao_bits, dilatacao_bits)
+from pilha import achatar_lote
+from cache_etapas import CacheEtapas
 
 ##############################################
 # Carregar matrizes do ZIP
 ##############################################
 zip_path_reduzidas = "matrizes_reduzidas_tcc.zip"
-
-
-def carregar_matrizes_zip(zip_path):
-    matrizes = []
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        npy_arquivos = [nome for nome in zip_ref.namelist()
-                        if nome.endswith('.npy')]
-        for nome in npy_arquivos:
-            with zip_ref.open(nome) as arquivo:
-                matriz = np.load(io.BytesIO(arquivo.read()))
-                matrizes.append(matriz)
-    matrizes = np.concatenate(matrizes, axis=0)
-    return matrizes
+pasta_cache = "cache_etapas"    # ➤ Resultados por etapa (chave = entradas + parâmetros)
+limite_cache = 8 * 1024 ** 3    # ➤ Tamanho máximo da pasta de cache (bytes)
 
 ##############################################
 # Erosão
 ##############################################
 
 
-def aplicar_erosao(matrizes, tamanho_kernel):
-    b, n, h, w = matrizes.shape
-    estrutura = np.ones((tamanho_kernel, tamanho_kernel), dtype=bool)
-    resultado = np.zeros_like(matrizes)
-
-    for i in range(b):
-        for j in range(n):
-            binaria = (matrizes[i, j] == 255)
-            erodida = binary_erosion(binaria, structure=estrutura)
-            resultado[i, j] = (erodida * 255).astype(np.uint8)
-
-    return resultado
+def aplicar_erosao(matrizes, tamanho_kernel, out=None):
+    # máscaras compactadas: AND de deslocamentos, 64 pixels por operação
+    if isinstance(matrizes, MascaraBits):
+        return erosao_bits(matrizes, tamanho_kernel)
+    # pilha inteira numa chamada: kernel quadrado separado em duas passadas 1D
+    # de mínimo deslizante (custo por pixel não cresce com tamanho_kernel)
+    return erosao(matrizes, tamanho_kernel, out=out)
 
 ##############################################
 # Dilatação
 ##############################################
 
 
-def aplicar_dilatacao(matrizes, tamanho_kernel):
-    b, n, h, w = matrizes.shape
-    estrutura = np.ones((tamanho_kernel, tamanho_kernel), dtype=bool)
-    resultado = np.zeros_like(matrizes)
-
-    for i in range(b):
-        for j in range(n):
-            binaria = (matrizes[i, j] == 255)
-            dilatada = binary_dilation(binaria, structure=estrutura)
-            resultado[i, j] = (dilatada * 255).astype(np.uint8)
-
-    return resultado
+def aplicar_dilatacao(matrizes, tamanho_kernel, out=None):
+    # idem, com OR de deslocamentos / máximo deslizante
+    if isinstance(matrizes, MascaraBits):
+        return dilatacao_bits(matrizes, tamanho_kernel)
+    return dilatacao(matrizes, tamanho_kernel, out=out)
 
 ##############################################
 # Filtro de esqueletos
@@ -65,21 +44,11 @@ def aplicar_dilatacao(matrizes, tamanho_kernel):
 
 
 def aplicar_filtro_esqueleto_binario(matrizes, esqueletos):
-    b, n, h, w = matrizes.shape
-    resultado = matrizes.copy()
-
-    for esqueleto in esqueletos:
-        kernel = (esqueleto == 255).astype(np.uint8)
-        soma_kernel = np.sum(kernel)
-
-        for i in range(b):
-            for j in range(n):
-                img_bin = (resultado[i, j] == 255).astype(np.uint8)
-                resposta = correlate(img_bin, kernel, mode='constant', cval=0)
-                correspondencias = (resposta == soma_kernel)
-                resultado[i, j][correspondencias] = 0
-
-    return resultado
+    # um passe da tabela de 512 códigos por esqueleto, sobre a pilha inteira
+    padroes = [padrao_de_esqueleto(esqueleto, modo="correlacao") for esqueleto in esqueletos]
+    if isinstance(matrizes, MascaraBits):
+        return aplicar_padroes_bits(matrizes, padroes, modo="sequencial", bordas="zero")
+    return aplicar_padroes_3x3(matrizes, padroes, modo="sequencial", bordas="zero")
 
 
 ##################################
@@ -92,76 +61,59 @@ esqueletos = [
     np.array([[0, 0, 255], [0, 255, 0], [255, 0, 0]], dtype=np.uint8)
 ]
 
-##################################
-# Salvar e compactar
-##################################
-
-
-def salvar_matrizes(nome_arquivo, matrizes):
-    np.save(nome_arquivo, np.array(matrizes))
-    print(f"Matrizes salvas em {nome_arquivo}")
-
-
-def compactar_npy(nome_arquivo_npy, nome_zip):
-    with zipfile.ZipFile(nome_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(nome_arquivo_npy)
-    print(f"Arquivo compactado salvo como {nome_zip}")
-
 
 ##################################
 # PROCESSAMENTO
 ##################################
-# 1. Carregar
-matrizes_reduzidas = carregar_matrizes_zip(zip_path_reduzidas)
+# 1. Carregar (compactadas em bits: erosão, esqueletos e dilatação operam sem desempacotar)
+matrizes_reduzidas = achatar_lote(carregar_mascaras_zip(zip_path_reduzidas))
 print(f"Formato das matrizes: {matrizes_reduzidas.shape}")
 
 
 # 5. Visualizações intermediárias
 plt.figure(figsize=(15, 4))
 plt.subplot(1, 3, 1)
-plt.imshow(matrizes_reduzidas[0, 0], cmap='gray')
+plt.imshow(matrizes_reduzidas[0].para_uint8(), cmap='gray')
 plt.title('Após redução')
 plt.axis('off')
 
-# 2. Aplicar erosão (rios somem)
-matrizes_erosao = aplicar_erosao(matrizes_reduzidas, tamanho_kernel=1)
+# 2. Aplicar erosão (rios somem); com as mesmas reduzidas (hash do conteúdo)
+# e o mesmo tamanho de kernel, erosão e dilatação vêm do cache
+cache = CacheEtapas(pasta_cache, limite_bytes=limite_cache)
+matrizes_erosao, chave_erosao = cache.executar("erosao", aplicar_erosao, [matrizes_reduzidas],
+                                               tamanho_kernel=1)
 
 # 3. Aplicar filtros de esqueletos sobre imagens erodidas
 # matrizes_filtradas = aplicar_filtro_esqueleto_binario(matrizes_erosao, esqueletos)
 
 # 4. Aplicar dilatação separadamente (alvos expandem)
-matrizes_dilatacao = aplicar_dilatacao(matrizes_erosao, tamanho_kernel=4)
+matrizes_dilatacao, _ = cache.executar("dilatacao", aplicar_dilatacao, [matrizes_erosao],
+                                       chaves_entradas=[chave_erosao], tamanho_kernel=4)
 
 # 5. Visualizações intermediárias
 plt.subplot(1, 3, 2)
-plt.imshow(matrizes_erosao[0, 0], cmap='gray')
+plt.imshow(matrizes_erosao[0].para_uint8(), cmap='gray')
 plt.title('Após Erosão')
 plt.axis('off')
 
 """
 plt.subplot(1, 3, 2)
-plt.imshow(matrizes_filtradas[0, 0], cmap='gray')
+plt.imshow(matrizes_filtradas[0].para_uint8(), cmap='gray')
 plt.title('Após Filtros')
 plt.axis('off')
 """
 
 plt.subplot(1, 3, 3)
-plt.imshow(matrizes_dilatacao[0, 0], cmap='gray')
+plt.imshow(matrizes_dilatacao[0].para_uint8(), cmap='gray')
 plt.title('Após Dilatação')
 plt.axis('off')
 plt.tight_layout()
 plt.show()
 
 # 6. Salvar e compactar
-salvar_matrizes("matrizes_erosao.npy", matrizes_erosao)
-compactar_npy("matrizes_erosao.npy", "matrizes_erosao.zip")
-os.remove("matrizes_erosao.npy")
+salvar_mascaras_zip("matrizes_erosao.zip", matrizes_erosao)
 
 """
-salvar_matrizes("matrizes_filtradas.npy", matrizes_filtradas)
-compactar_npy("matrizes_filtradas.npy", "matrizes_filtradas.zip")
-os.remove("matrizes_filtradas.npy")
+salvar_mascaras_zip("matrizes_filtradas.zip", matrizes_filtradas)
 """
-salvar_matrizes("matrizes_dilatacao.npy", matrizes_dilatacao)
-compactar_npy("matrizes_dilatacao.npy", "matrizes_dilatacao.zip")
-os.remove("matrizes_dilatacao.npy")
+salvar_mascaras_zip("matrizes_dilatacao.zip", matrizes_dilatacao)
@@ -1,6 +1,8 @@
 import numpy as np
-import zipfile
-import io
+from armazenamento import carregar_matrizes_zip
+from janelas import DatasetJanelas
+from rede import treinar_mini_lotes, mapa_alvos
+from ladrilhos import processar_em_ladrilhos
 from scipy.ndimage import label
 
 ##############################################
@@ -13,51 +15,26 @@ neuronios_ocultos = 256
 num_epochs = 5
 limiar_alvo = 220
 taxa_aprendizado = 0.1
+tamanho_lote = 4096             # Janelas por mini-lote (memória do treino ~ tamanho_lote)
+arquivo_janelas = None          # Ex.: "janelas_tcc.npy" grava a matriz de projeto uint8 em memmap
+tamanho_ladrilho = 512          # Lado dos ladrilhos da detecção (memória ~ ladrilho × neurônios)
 arquivo_matrizes = "matrizes_tcc.npy"
 zip_path_matrizes = "matrizes_tcc.zip"
 
-##############################################
-# Função de ativação e derivada (Sigmoid)
-##############################################
-def sigmoid(x):
-    return 1 / (1 + np.exp(-x))
-
-def derivada_sigmoid(x):
-    sx = sigmoid(x)
-    return sx * (1 - sx)
-
-##############################################
-# Carregar matrizes suavizadas do arquivo
-##############################################
-def carregar_matrizes_zip(zip_path):
-    matrizes = []
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        npy_arquivos = [nome for nome in zip_ref.namelist() if nome.endswith('.npy')]
-        for nome in npy_arquivos:
-            with zip_ref.open(nome) as arquivo:
-                matriz = np.load(io.BytesIO(arquivo.read())).astype(np.float32)
-                matrizes.append(matriz)
-    matrizes = np.concatenate(matrizes, axis=0)
-    return matrizes
-
 ##############################################
 # Geração das janelas e rótulos (dataset)
 ##############################################
 def gerar_dados_treino(matrizes, tamanho_janela, limiar_alvo):
-    X = []
-    y = []
-    pad = tamanho_janela // 2
+    # janelas como view com strides sobre a pilha (nada é copiado aqui);
+    # os mini-lotes (b, janela²) são copiados sob demanda por DatasetJanelas
+    dataset = DatasetJanelas(matrizes, tamanho_janela)
 
-    for matriz in matrizes:
-        for i in range(pad, matriz.shape[0] - pad):
-            for j in range(pad, matriz.shape[1] - pad):
-                janela = matriz[i-pad:i+pad+1, j-pad:j+pad+1]
-                vetor = janela.flatten()
-                media = np.mean(vetor)
-                X.append(vetor)
-                y.append(1 if media > limiar_alvo else 0)
+    # rótulo = média da janela > limiar ⇔ soma da janela > limiar * janela²:
+    # uma soma de caixa por imagem, sem média por janela; o mapa fica guardado
+    # no dataset por limiar. y é uma view (N, 1) uint8 do mapa de rótulos
+    y = dataset.rotulos(limiar_alvo).reshape(-1, 1)
 
-    return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32).reshape(-1, 1)
+    return dataset, y
 
 ##############################################
 # Inicialização de pesos
@@ -71,65 +48,15 @@ def inicializar_pesos(entrada, camadas_ocultas, saida):
     return pesos
 
 ##############################################
-# Feedforward
-##############################################
-def feedforward(x, pesos):
-    ativacoes = [x]
-    entrada = x
-    for w in pesos:
-        entrada = sigmoid(np.dot(entrada, w) + bias)
-        ativacoes.append(entrada)
-    return ativacoes
-
-##############################################
-# Backpropagation
-##############################################
-def backpropagation(pesos, ativacoes, y_real):
-    gradientes = [None] * len(pesos)
-    erro = ativacoes[-1] - y_real
-    delta = erro * derivada_sigmoid(ativacoes[-1])
-    for i in reversed(range(len(pesos))):
-        gradientes[i] = np.dot(ativacoes[i].T, delta)
-        if i > 0:
-            delta = np.dot(delta, pesos[i].T) * derivada_sigmoid(ativacoes[i])
-    return gradientes
-
-##############################################
-# Treinamento
-##############################################
-def treinar(X, y, pesos, epocas):
-    for epoca in range(epocas):
-        ativacoes = feedforward(X, pesos)
-        gradientes = backpropagation(pesos, ativacoes, y)
-        for i in range(len(pesos)):
-            pesos[i] -= taxa_aprendizado * gradientes[i]
-        if epoca % 1 == 0:
-            pred = (ativacoes[-1] > 0.5).astype(int)
-            acuracia = np.mean(pred == y)
-            print(f"Época {epoca+1}/{epocas} - Acurácia: {acuracia:.4f}")
-    return pesos
-
-##############################################
-# Contar alvos com janelas em lote e regiões conectadas
+# Contar alvos com a rede convolucional e regiões conectadas
 ##############################################
 def contar_alvos_rapido(matriz_teste, pesos, tamanho_janela):
-    pad = tamanho_janela // 2
-    janelas = []
-    posicoes = []
-
-    for i in range(pad, matriz_teste.shape[0] - pad):
-        for j in range(pad, matriz_teste.shape[1] - pad):
-            janela = matriz_teste[i-pad:i+pad+1, j-pad:j+pad+1].flatten()
-            janelas.append(janela)
-            posicoes.append((i, j))
-
-    janelas = np.array(janelas, dtype=np.float32)
-    saidas = feedforward(janelas, pesos)[-1]
-
-    mapa_binario = np.zeros_like(matriz_teste, dtype=np.uint8)
-    for idx, (i, j) in enumerate(posicoes):
-        if saidas[idx] > 0.5:
-            mapa_binario[i, j] = 1
+    # mapa de probabilidades direto da imagem (matmuls deslocados por bloco de
+    # linhas), sem listas de janelas e posições, por ladrilhos com halo
+    # tamanho_janela // 2: as ativações ficam do tamanho de um ladrilho
+    mapa_binario = processar_em_ladrilhos(mapa_alvos, matriz_teste, tamanho_janela // 2,
+                                          tamanho_ladrilho, pesos=pesos,
+                                          tamanho_janela=tamanho_janela, bias=bias)
 
     estrutura = np.ones((3, 3), dtype=np.uint8)
     mapa_rotulado, num_alvos = label(mapa_binario, structure=estrutura)
@@ -140,16 +67,19 @@ def contar_alvos_rapido(matriz_teste, pesos, tamanho_janela):
 ##############################################
 if __name__ == "__main__":
     print("🔍 Carregando matrizes...")
+    # pilha uint8 (sem cópia float32): cada mini-lote é convertido para float32 ao ser copiado
     matrizes = carregar_matrizes_zip(zip_path_matrizes)
 
     print("📦 Gerando dados de treino...")
-    X, y = gerar_dados_treino(matrizes, tamanho_janela, limiar_alvo)
+    dataset, y = gerar_dados_treino(matrizes, tamanho_janela, limiar_alvo)
+    # janelas sob demanda (view) ou matriz de projeto uint8 mapeada em disco
+    X = dataset if arquivo_janelas is None else dataset.salvar_memmap(arquivo_janelas)
 
     print("🧠 Inicializando rede neural...")
-    pesos = inicializar_pesos(X.shape[1], num_camadas_ocultas, 1)
+    pesos = inicializar_pesos(dataset.num_entradas, num_camadas_ocultas, 1)
 
     print("🏋️ Treinando rede neural...")
-    pesos = treinar(X, y, pesos, num_epochs)
+    pesos = treinar_mini_lotes(X, y, pesos, num_epochs, tamanho_lote, bias, taxa_aprendizado)
 
     print("🧪 Testando em nova imagem...")
     imagem_teste = matrizes[0]
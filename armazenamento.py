@@ -0,0 +1,478 @@
+import os
+import json
+import struct
+import zipfile
+import numpy as np
+from mascaras import MascaraBits
+
+"""
+
+Leitura e escrita dos artefatos `.zip` com matrizes `.npy`.
+
+`salvar_npy_zip` substitui a sequência salvar_matrizes → compactar_npy →
+os.remove dos scripts: o cabeçalho `.npy` e os dados são escritos em
+blocos direto na entrada do zip, sem arquivo temporário e sem a cópia
+extra feita por `np.array(matrizes)`.
+
+`carregar_matrizes_zip` é o carregador único usado pelos scripts: lê o
+cabeçalho `.npy` do fluxo do zip e descomprime direto no array de saída.
+
+`salvar_imagens_zip` grava cada imagem numa entrada própria do zip, o que
+permite ler uma imagem sem descomprimir a pilha inteira e acrescentar
+imagens uma a uma (`adicionar_imagem_zip`).
+
+Máscaras binárias (0/255) são gravadas compactadas em bits
+(`salvar_mascaras_zip`), ocupando 1/8 do espaço.
+
+"""
+
+TAMANHO_BLOCO = 16 * 1024 * 1024  # bytes lidos/escritos por vez no zip
+
+
+##################################
+# Escrita em blocos
+##################################
+def _escrever_blocos(destino, matriz, dtype):
+    """
+    Escreve os bytes de `matriz` (ordem C) em blocos de até TAMANHO_BLOCO.
+    Só copia a imagem quando é preciso converter o dtype ou a ordem.
+    """
+    matriz = np.ascontiguousarray(matriz, dtype=dtype)
+    dados = memoryview(matriz.reshape(-1)).cast("B")
+    for inicio in range(0, len(dados), TAMANHO_BLOCO):
+        destino.write(dados[inicio:inicio + TAMANHO_BLOCO])
+
+
+##################################
+# Salvar matrizes direto no zip
+##################################
+def salvar_npy_zip(nome_zip, matrizes, nome_npy=None, nivel_compressao=6, comprimir=True):
+    """
+    Salva `matrizes` como um `.npy` dentro de `nome_zip`, em streaming.
+
+    Args:
+        nome_zip (str): arquivo .zip de saída (sobrescrito)
+        matrizes (array ou list): array ou lista de arrays de mesmo shape
+            (a lista é gravada como `np.array(matrizes)` seria, sem criá-lo)
+        nome_npy (str ou None): nome da entrada no zip
+            (padrão: nome do zip com extensão .npy, como nos scripts)
+        nivel_compressao (int): 0 a 9 (ZIP_DEFLATED)
+        comprimir (bool): False grava sem compressão (ZIP_STORED), o que
+            permite abrir a entrada depois com memmap
+
+    Retorna:
+        Shape gravado.
+    """
+    if nome_npy is None:
+        nome_npy = os.path.splitext(os.path.basename(nome_zip))[0] + ".npy"
+
+    if isinstance(matrizes, np.ndarray):
+        partes = [matrizes]
+        shape = matrizes.shape
+        dtype = matrizes.dtype
+    else:
+        partes = [np.asarray(m) for m in matrizes]
+        shapes = {m.shape for m in partes}
+        if len(shapes) > 1:
+            raise ValueError(f"Matrizes com shapes diferentes: {sorted(shapes)}")
+        shape = (len(partes),) + (shapes.pop() if partes else ())
+        dtype = np.result_type(*partes) if partes else np.dtype(np.float64)
+
+    cabecalho = {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": shape,
+    }
+    tamanho_total = int(np.prod(shape)) * dtype.itemsize
+
+    if comprimir:
+        compressao = zipfile.ZIP_DEFLATED
+    else:
+        compressao, nivel_compressao = zipfile.ZIP_STORED, None
+
+    with zipfile.ZipFile(nome_zip, "w", compressao, compresslevel=nivel_compressao) as zipf:
+        with zipf.open(nome_npy, "w", force_zip64=tamanho_total > zipfile.ZIP64_LIMIT) as destino:
+            np.lib.format.write_array_header_1_0(destino, cabecalho)
+            for parte in partes:
+                _escrever_blocos(destino, parte, dtype)
+
+    print(f"Matrizes salvas em {nome_zip} ({nome_npy}, shape {shape})")
+    return shape
+
+
+##################################
+# Leitura em streaming
+##################################
+def _ler_exato(arquivo, destino):
+    """
+    Preenche o memoryview `destino` com bytes lidos de `arquivo`, em blocos.
+    """
+    destino = destino.cast("B")
+    lidos = 0
+    while lidos < len(destino):
+        fim = min(lidos + TAMANHO_BLOCO, len(destino))
+        n = arquivo.readinto(destino[lidos:fim])
+        if not n:
+            raise ValueError("Fim inesperado dos dados .npy dentro do zip")
+        lidos += n
+
+
+def _ler_cabecalho_npy(arquivo):
+    versao = np.lib.format.read_magic(arquivo)
+    if versao == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(arquivo)
+    else:
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(arquivo)
+    if dtype.hasobject:
+        raise ValueError("Arrays com dtype object não são suportados")
+    return shape, fortran, dtype
+
+
+def _inicio_dados_zip(zip_path, info):
+    """
+    Posição no arquivo .zip onde começam os bytes da entrada `info`
+    (pula o cabeçalho local do zip, que tem tamanho variável).
+    """
+    with open(zip_path, "rb") as f:
+        f.seek(info.header_offset)
+        cabecalho_local = f.read(30)
+        tamanho_nome, tamanho_extra = struct.unpack("<HH", cabecalho_local[26:30])
+    return info.header_offset + 30 + tamanho_nome + tamanho_extra
+
+
+def _memmap_entrada(zip_path, info):
+    inicio = _inicio_dados_zip(zip_path, info)
+    with open(zip_path, "rb") as f:
+        f.seek(inicio)
+        shape, fortran, dtype = _ler_cabecalho_npy(f)
+        deslocamento = f.tell()
+    return np.memmap(zip_path, dtype=dtype, mode="r", offset=deslocamento,
+                     shape=shape, order="F" if fortran else "C")
+
+
+##################################
+# Carregar matrizes do ZIP
+##################################
+def carregar_matrizes_zip(zip_path, indices=None):
+    """
+    Carrega os `.npy` de um zip empilhados no eixo 0 (como o antigo
+    `np.concatenate` dos scripts), sem BytesIO e sem cópias intermediárias.
+
+    O cabeçalho `.npy` é lido do próprio fluxo do zip e os dados são
+    descomprimidos direto no array de saída, já pré-alocado.
+    Entradas gravadas sem compressão (ZIP_STORED) são abertas com memmap.
+
+    Args:
+        zip_path (str): arquivo .zip com um ou mais .npy
+        indices (list ou None): carrega só estas imagens. As imagens são
+            numeradas em ordem sobre todos os eixos menos os dois últimos
+            (ex.: shape (1, 24, h, w) → imagens 0..23)
+
+    Retorna:
+        Array com o shape concatenado, ou (len(indices), h, w) quando
+        `indices` é informado.
+    """
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        if NOME_FORMATO in zip_ref.namelist():
+            return ler_imagens_zip(zip_path, indices)
+
+        infos = [info for info in zip_ref.infolist() if info.filename.endswith(".npy")]
+        if not infos:
+            raise ValueError(f"Nenhum .npy encontrado em {zip_path}")
+
+        cabecalhos = []
+        for info in infos:
+            with zip_ref.open(info) as arquivo:
+                cabecalhos.append(_ler_cabecalho_npy(arquivo))
+
+        restos = {shape[1:] for shape, _, _ in cabecalhos}
+        dtypes = {dtype for _, _, dtype in cabecalhos}
+        if len(restos) > 1 or len(dtypes) > 1:
+            raise ValueError(f"Os .npy de {zip_path} não podem ser empilhados")
+        resto, dtype = restos.pop(), dtypes.pop()
+        total = sum(shape[0] for shape, _, _ in cabecalhos)
+        shape_total = (total,) + resto
+
+        # Uma única entrada sem compressão: memmap direto do arquivo .zip
+        if len(infos) == 1 and infos[0].compress_type == zipfile.ZIP_STORED:
+            mapa = _memmap_entrada(zip_path, infos[0])
+            if indices is None:
+                return mapa
+            return np.ascontiguousarray(mapa.reshape((-1,) + mapa.shape[-2:])[list(indices)])
+
+        if indices is None:
+            resultado = np.empty(shape_total, dtype=dtype)
+            inicio = 0
+            for info, (shape, fortran, _) in zip(infos, cabecalhos):
+                destino = resultado[inicio:inicio + shape[0]]
+                with zip_ref.open(info) as arquivo:
+                    _ler_cabecalho_npy(arquivo)
+                    if fortran:
+                        # bytes em ordem Fortran = transposta em ordem C
+                        bloco = np.empty(shape[::-1], dtype=dtype)
+                        _ler_exato(arquivo, memoryview(bloco.reshape(-1)))
+                        destino[...] = bloco.T
+                    else:
+                        _ler_exato(arquivo, memoryview(destino.reshape(-1)))
+                inicio += shape[0]
+            return resultado
+
+        # Subconjunto de imagens: descomprime em sequência até a última pedida
+        altura, largura = shape_total[-2:]
+        indices = [int(k) for k in indices]
+        resultado = np.empty((len(indices), altura, largura), dtype=dtype)
+        posicoes = {}
+        for saida, k in enumerate(indices):
+            posicoes.setdefault(k, []).append(saida)
+        descarte = np.empty((altura, largura), dtype=dtype)
+
+        primeira_imagem = 0
+        for info, (shape, fortran, _) in zip(infos, cabecalhos):
+            num_imagens = int(np.prod(shape[:-2]))
+            locais = [k - primeira_imagem for k in posicoes
+                      if primeira_imagem <= k < primeira_imagem + num_imagens]
+            if locais:
+                if fortran:
+                    raise ValueError("Leitura por índice não suporta .npy em ordem Fortran")
+                with zip_ref.open(info) as arquivo:
+                    _ler_cabecalho_npy(arquivo)
+                    for local in range(max(locais) + 1):
+                        saidas = posicoes.get(primeira_imagem + local)
+                        destino = resultado[saidas[0]] if saidas else descarte
+                        _ler_exato(arquivo, memoryview(destino.reshape(-1)))
+                        for extra in (saidas or [])[1:]:
+                            resultado[extra] = destino
+            primeira_imagem += num_imagens
+
+        faltando = [k for k in posicoes if not 0 <= k < primeira_imagem]
+        if faltando:
+            raise IndexError(f"Índices fora do intervalo 0..{primeira_imagem - 1}: {faltando}")
+        return resultado
+
+
+##################################
+# Formato por imagem (acesso aleatório)
+##################################
+NOME_FORMATO = "formato.json"
+VERSAO_FORMATO = 1
+
+
+def _nome_imagem(k):
+    return f"imagem_{k:05d}.npy"
+
+'''
+matrizes_reduzidas_tcc.zip
+├── formato.json        {"lote": [1], "altura": 1501, "largura": 1001, "descr": "|u1"}
+├── imagem_00000.npy    (1501, 1001), comprimida separadamente
+├── imagem_00001.npy
+└── ...
+
+O diretório central do zip já guarda a posição de cada entrada, então ler
+a imagem k descomprime só `imagem_k.npy`.
+'''
+
+
+def _compressao(comprimir, nivel_compressao):
+    if comprimir:
+        return zipfile.ZIP_DEFLATED, nivel_compressao
+    return zipfile.ZIP_STORED, None
+
+
+def _escrever_imagem(zipf, k, imagem, dtype):
+    cabecalho = {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": imagem.shape,
+    }
+    with zipf.open(_nome_imagem(k), "w") as destino:
+        np.lib.format.write_array_header_1_0(destino, cabecalho)
+        _escrever_blocos(destino, imagem, dtype)
+
+
+def _ler_formato(zip_ref):
+    formato = json.loads(zip_ref.read(NOME_FORMATO))
+    if formato.get("versao") != VERSAO_FORMATO:
+        raise ValueError(f"Versão de formato desconhecida: {formato.get('versao')}")
+    formato["num_imagens"] = sum(1 for nome in zip_ref.namelist()
+                                 if nome.startswith("imagem_") and nome.endswith(".npy"))
+    return formato
+
+
+def salvar_imagens_zip(nome_zip, matrizes, nivel_compressao=6, comprimir=True, metadados=None):
+    """
+    Salva a pilha com cada imagem numa entrada `.npy` própria do zip.
+
+    Args:
+        nome_zip (str): arquivo .zip de saída (sobrescrito)
+        matrizes (array ou list): shape (..., altura, largura); a ordem das
+            imagens segue todos os eixos menos os dois últimos
+        nivel_compressao (int): 0 a 9 (ZIP_DEFLATED)
+        comprimir (bool): False grava sem compressão (ZIP_STORED)
+        metadados (dict ou None): chaves extras gravadas em formato.json
+
+    Retorna:
+        Shape gravado.
+    """
+    if isinstance(matrizes, np.ndarray):
+        lote = matrizes.shape[:-3]
+        imagens = matrizes.reshape((-1,) + matrizes.shape[-2:])
+    else:
+        lote = ()
+        imagens = [np.asarray(m) for m in matrizes]
+    if len(imagens) == 0:
+        raise ValueError("Nenhuma imagem para salvar")
+
+    altura, largura = imagens[0].shape
+    dtype = imagens[0].dtype
+    formato = {"versao": VERSAO_FORMATO, "lote": list(lote),
+               "altura": altura, "largura": largura,
+               "descr": np.lib.format.dtype_to_descr(dtype)}
+    formato.update(metadados or {})
+
+    compressao, nivel = _compressao(comprimir, nivel_compressao)
+    with zipfile.ZipFile(nome_zip, "w", compressao, compresslevel=nivel) as zipf:
+        zipf.writestr(NOME_FORMATO, json.dumps(formato))
+        for k, imagem in enumerate(imagens):
+            if imagem.shape != (altura, largura):
+                raise ValueError(f"Imagem {k} com shape {imagem.shape}, esperado {(altura, largura)}")
+            _escrever_imagem(zipf, k, imagem, dtype)
+
+    # máscaras compactadas: informa a largura lógica, não a de bytes
+    shape = tuple(lote) + (len(imagens), altura, formato.get("largura_bits", largura))
+    print(f"Matrizes salvas em {nome_zip} ({len(imagens)} imagens, shape {shape})")
+    return shape
+
+
+def adicionar_imagem_zip(nome_zip, imagem, nivel_compressao=6, comprimir=True):
+    """
+    Acrescenta uma imagem ao fim de um zip no formato por imagem
+    (cria o arquivo se ele ainda não existe). As imagens já gravadas
+    não são reescritas.
+
+    Zips gravados com eixos de lote (`lote` com mais de uma imagem, ex.:
+    pilha (2, n, altura, largura)) guardam as imagens na ordem do lote;
+    uma imagem a mais no fim deixaria de caber no shape, então eles são
+    recusados: regrave a pilha com `salvar_imagens_zip`.
+
+    Zips de máscaras compactadas (`salvar_mascaras_zip`) recebem uma
+    `MascaraBits` ou uma matriz 0/255 (ou bool) com a largura lógica,
+    compactada antes de ser gravada como as demais.
+
+    Retorna:
+        Índice da imagem acrescentada.
+    """
+    if not os.path.exists(nome_zip):
+        if isinstance(imagem, MascaraBits):
+            salvar_mascaras_zip(nome_zip, MascaraBits(imagem.bits[None], (1,) + imagem.shape),
+                                nivel_compressao, comprimir)
+        else:
+            salvar_imagens_zip(nome_zip, [np.asarray(imagem)], nivel_compressao, comprimir)
+        return 0
+
+    compressao, nivel = _compressao(comprimir, nivel_compressao)
+    with zipfile.ZipFile(nome_zip, "a", compressao, compresslevel=nivel) as zipf:
+        formato = _ler_formato(zipf)
+        lote = tuple(formato["lote"])
+        if int(np.prod(lote)) != 1:
+            raise ValueError(f"{nome_zip} tem lote {lote}: imagens avulsas não podem ser "
+                             f"acrescentadas, regrave a pilha com salvar_imagens_zip")
+        dtype = np.dtype(np.lib.format.descr_to_dtype(formato["descr"]))
+        largura_bits = formato.get("largura_bits")
+        if largura_bits is not None:
+            # máscara: compara o shape lógico e grava as linhas compactadas
+            if not isinstance(imagem, MascaraBits):
+                imagem = MascaraBits.de_matriz(imagem)
+            if imagem.shape != (formato["altura"], largura_bits):
+                raise ValueError(f"Máscara {imagem.shape} incompatível com {nome_zip} "
+                                 f"{(formato['altura'], largura_bits)}")
+            imagem = imagem.bits
+        elif isinstance(imagem, MascaraBits):
+            raise ValueError(f"{nome_zip} não guarda máscaras compactadas: "
+                             f"acrescente imagem.para_uint8()")
+        imagem = np.asarray(imagem)
+        if imagem.shape != (formato["altura"], formato["largura"]) or imagem.dtype != dtype:
+            raise ValueError(f"Imagem {imagem.shape} {imagem.dtype} incompatível com {nome_zip}")
+        k = formato["num_imagens"]
+        _escrever_imagem(zipf, k, imagem, dtype)
+    return k
+
+
+def ler_imagens_zip(nome_zip, indices=None, desempacotar=True):
+    """
+    Lê um zip no formato por imagem, descomprimindo só as imagens pedidas.
+
+    Zips de máscaras compactadas (`salvar_mascaras_zip`) são devolvidos
+    como uint8 0/255, ou como `MascaraBits` com `desempacotar=False`.
+
+    Retorna:
+        Array com shape lote + (n, altura, largura) quando `indices` é None,
+        senão (len(indices), altura, largura).
+    """
+    with zipfile.ZipFile(nome_zip, "r") as zip_ref:
+        formato = _ler_formato(zip_ref)
+        dtype = np.dtype(np.lib.format.descr_to_dtype(formato["descr"]))
+        altura, largura = formato["altura"], formato["largura"]
+        n = formato["num_imagens"]
+
+        if indices is None:
+            lote = tuple(formato["lote"])
+            por_lote = int(np.prod(lote))
+            if n % por_lote:
+                raise ValueError(f"{n} imagens não cabem no lote {lote}")
+            resultado = np.empty(lote + (n // por_lote, altura, largura), dtype=dtype)
+            selecionadas = range(n)
+        else:
+            selecionadas = [int(k) for k in indices]
+            resultado = np.empty((len(selecionadas), altura, largura), dtype=dtype)
+
+        planas = resultado.reshape((-1, altura, largura))
+        for saida, k in enumerate(selecionadas):
+            if not 0 <= k < n:
+                raise IndexError(f"Índice {k} fora do intervalo 0..{n - 1}")
+            with zip_ref.open(_nome_imagem(k)) as arquivo:
+                shape_k, _, _ = _ler_cabecalho_npy(arquivo)
+                if shape_k != (altura, largura):
+                    raise ValueError(f"Imagem {k} com shape {shape_k} em {nome_zip}")
+                _ler_exato(arquivo, memoryview(planas[saida]))
+
+    largura_bits = formato.get("largura_bits")
+    if largura_bits is None:
+        return resultado
+    mascara = MascaraBits(resultado, resultado.shape[:-1] + (largura_bits,))
+    return mascara.para_uint8() if desempacotar else mascara
+
+
+##################################
+# Máscaras compactadas em bits
+##################################
+def salvar_mascaras_zip(nome_zip, mascaras, nivel_compressao=6, comprimir=True):
+    """
+    Salva máscaras binárias no formato por imagem, com 8 pixels por byte.
+
+    Args:
+        mascaras (MascaraBits ou array): array 0/255 (ou bool) é compactado antes
+
+    Retorna:
+        Shape lógico gravado.
+    """
+    if not isinstance(mascaras, MascaraBits):
+        mascaras = MascaraBits.de_matriz(mascaras)
+    salvar_imagens_zip(nome_zip, mascaras.bits, nivel_compressao, comprimir,
+                       metadados={"largura_bits": mascaras.shape[-1]})
+    return mascaras.shape
+
+
+def carregar_mascaras_zip(nome_zip, indices=None):
+    """
+    Carrega máscaras salvas com `salvar_mascaras_zip` sem desempacotar.
+
+    Artefatos antigos (um .npy 0/255 sem compactação) são compactados na leitura.
+
+    Retorna:
+        MascaraBits
+    """
+    with zipfile.ZipFile(nome_zip, "r") as zip_ref:
+        formato = json.loads(zip_ref.read(NOME_FORMATO)) if NOME_FORMATO in zip_ref.namelist() else {}
+    if "largura_bits" in formato:
+        return ler_imagens_zip(nome_zip, indices, desempacotar=False)
+    return MascaraBits.de_matriz(carregar_matrizes_zip(nome_zip, indices))
@@ -0,0 +1,308 @@
+import os
+import json
+import types
+import hashlib
+import weakref
+from functools import partial
+import numpy as np
+from mascaras import MascaraBits
+
+"""
+
+Cache das etapas do pipeline, endereçado pelo conteúdo.
+
+A saída de cada etapa é guardada sob uma chave sha256 calculada a partir
+de: nome da etapa, função, hash das entradas e parâmetros (size_padding,
+filtro_size, k, block_size, tamanhos de kernel, conjunto de esqueletos...).
+Rodar de novo uma etapa com as mesmas entradas e parâmetros só abre o
+`.npy` salvo (em memmap, sem ler a pilha inteira). Etapas que devolvem
+mais de um resultado (ex.: binarização + estatísticas) devolvem um
+dicionário de arrays, guardado num único `.npz`.
+
+A função entra na chave pelo nome (`__qualname__`, sem o módulo: rodar
+`pipeline.py` como script ou importá-lo dá a mesma chave) e pelo hash do
+bytecode dela e das funções do repositório que ela chama, então editar
+uma etapa (ou um filtro usado por ela) invalida as entradas antigas.
+Um atributo `versao_cache` na função substitui o hash do código.
+
+A chave devolvida por uma etapa serve de identidade da entrada da etapa
+seguinte, então as pilhas grandes não precisam ser re-hasheadas a cada
+passo: imagens (manifesto) → suavizadas → binarizadas → reduzidas → ...
+
+A pasta do cache tem um limite de tamanho; quando ele é ultrapassado, os
+artefatos usados há mais tempo são apagados primeiro (LRU pelo mtime, que
+é atualizado a cada leitura). Artefatos devolvidos por `obter` como memmap
+e ainda referenciados não são apagados, e um arquivo que o sistema não
+deixa remover (aberto por outro processo no Windows) é pulado.
+
+"""
+
+EXTENSOES_CACHE = (".npy", ".npz")
+TIPO_DICIONARIO = "_dicionario"  # entrada do .npz que marca um dicionário de arrays
+
+
+##################################
+# Hash de entradas e parâmetros
+##################################
+def hash_array(matriz, tamanho_bloco=1 << 24):
+    """
+    sha256 de shape, dtype e bytes de um array (ou MascaraBits), em blocos.
+    """
+    h = hashlib.sha256()
+    if isinstance(matriz, MascaraBits):
+        h.update(f"MascaraBits{matriz.shape}".encode())
+        matriz = matriz.bits
+    matriz = np.ascontiguousarray(matriz)
+    h.update(f"{matriz.shape}{matriz.dtype.str}".encode())
+    dados = memoryview(matriz.reshape(-1)).cast("B")
+    for inicio in range(0, len(dados), tamanho_bloco):
+        h.update(dados[inicio:inicio + tamanho_bloco])
+    return h.hexdigest()
+
+
+def hash_manifesto(manifesto):
+    """
+    Identidade de uma pasta de imagens: nomes e hashes do manifesto, em ordem.
+    """
+    conteudo = json.dumps([(e["nome"], e["hash"]) for e in manifesto])
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def _hash_codigo(codigo, h, nomes):
+    h.update(codigo.co_code)
+    nomes.update(codigo.co_names)
+    for constante in codigo.co_consts:
+        if isinstance(constante, types.CodeType):
+            _hash_codigo(constante, h, nomes)  # funções internas, lambdas, compreensões
+        else:
+            h.update(repr(constante).encode())
+
+
+def identidade_funcao(funcao):
+    """
+    Identidade estável de uma função para a chave: nome qualificado + hash
+    do código (da função e das funções chamadas definidas na mesma pasta),
+    ou nome + `versao_cache`. Funções sem bytecode (ufuncs, builtins) entram
+    por módulo + nome.
+    """
+    if isinstance(funcao, partial):
+        return {"funcao": identidade_funcao(funcao.func), "args": _serializavel(list(funcao.args)),
+                "kwargs": _serializavel(funcao.keywords)}
+    nome = getattr(funcao, "__qualname__", None) or type(funcao).__qualname__
+    versao = getattr(funcao, "versao_cache", None)
+    if versao is not None:
+        return f"{nome}@{versao}"
+    if not isinstance(funcao, types.FunctionType):
+        return f"{getattr(funcao, '__module__', '')}.{nome}"
+
+    pasta = os.path.dirname(funcao.__code__.co_filename)
+    h = hashlib.sha256()
+    pendentes, vistas = [funcao], set()
+    while pendentes:
+        atual = pendentes.pop()
+        if id(atual) in vistas:
+            continue
+        vistas.add(id(atual))
+        nomes = set()
+        h.update(atual.__qualname__.encode())
+        _hash_codigo(atual.__code__, h, nomes)
+        h.update(repr((atual.__defaults__, atual.__kwdefaults__)).encode())
+        for nome_global in sorted(nomes):
+            chamada = atual.__globals__.get(nome_global)
+            if (isinstance(chamada, types.FunctionType)
+                    and os.path.dirname(chamada.__code__.co_filename) == pasta):
+                pendentes.append(chamada)
+    return f"{nome}@{h.hexdigest()[:16]}"
+
+
+def _serializavel(valor):
+    if isinstance(valor, (np.ndarray, MascaraBits)):
+        return {"array": hash_array(valor)}
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (list, tuple)):
+        return [_serializavel(v) for v in valor]
+    if isinstance(valor, dict):
+        return {str(k): _serializavel(v) for k, v in valor.items()}
+    if callable(valor):
+        return identidade_funcao(valor)
+    return valor
+
+
+def chave_etapa(nome, funcao, entradas, parametros):
+    """
+    Chave sha256 de uma etapa.
+
+    Args:
+        nome (str): nome da etapa
+        funcao (callable): função da etapa (nome + hash do código, ver `identidade_funcao`)
+        entradas (list): chaves de etapas anteriores / hashes (str) ou arrays
+            (hasheados pelo conteúdo)
+        parametros (dict): parâmetros da etapa (arrays, como os esqueletos,
+            entram pelo hash do conteúdo)
+    """
+    identidade = {
+        "etapa": nome,
+        "funcao": _serializavel(funcao),
+        "entradas": [e if isinstance(e, str) else hash_array(e) for e in entradas],
+        "parametros": _serializavel(parametros),
+    }
+    return hashlib.sha256(json.dumps(identidade, sort_keys=True).encode()).hexdigest()
+
+
+##################################
+# Cache em disco
+##################################
+class CacheEtapas:
+    """
+    Artefatos `<chave>.npy` (arrays) ou `<chave>.npz` (MascaraBits ou
+    dicionário de arrays) numa pasta, com limite de tamanho e remoção dos menos usados recentemente.
+    """
+
+    def __init__(self, pasta, limite_bytes=8 * 1024 ** 3, mmap=True):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self.mmap = mmap
+        self._abertos = {}  # caminho → weakrefs dos memmaps devolvidos por `obter`
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, chave, extensao):
+        return os.path.join(self.pasta, chave + extensao)
+
+    def obter(self, chave):
+        """
+        Devolve o artefato salvo sob `chave` (ou None), marcando-o como usado.
+        """
+        for extensao in EXTENSOES_CACHE:
+            caminho = self._caminho(chave, extensao)
+            if os.path.exists(caminho):
+                os.utime(caminho)  # mtime = último uso (LRU)
+                if extensao == ".npy":
+                    resultado = np.load(caminho, mmap_mode="r" if self.mmap else None)
+                    if isinstance(resultado, np.memmap):
+                        self._abertos.setdefault(caminho, []).append(weakref.ref(resultado))
+                    return resultado
+                with np.load(caminho) as dados:
+                    if TIPO_DICIONARIO in dados.files:
+                        return {nome: dados[nome] for nome in dados.files if nome != TIPO_DICIONARIO}
+                    return MascaraBits(dados["bits"], tuple(dados["shape"]))
+        return None
+
+    def guardar(self, chave, resultado):
+        """
+        Grava o artefato (arquivo temporário + os.replace, nunca fica pela metade)
+        e aplica o limite de tamanho.
+        """
+        if isinstance(resultado, MascaraBits):
+            caminho = self._caminho(chave, ".npz")
+            with open(caminho + ".tmp", "wb") as f:
+                np.savez(f, bits=resultado.bits, shape=np.array(resultado.shape))
+        elif isinstance(resultado, dict):
+            if not all(isinstance(v, np.ndarray) for v in resultado.values()):
+                raise TypeError("Dicionários no cache só podem ter arrays")
+            caminho = self._caminho(chave, ".npz")
+            with open(caminho + ".tmp", "wb") as f:
+                np.savez(f, **{TIPO_DICIONARIO: np.array(True)}, **resultado)
+        elif isinstance(resultado, np.ndarray):
+            caminho = self._caminho(chave, ".npy")
+            with open(caminho + ".tmp", "wb") as f:
+                np.save(f, resultado)
+        else:
+            raise TypeError(f"Só arrays, MascaraBits e dicionários de arrays vão para o cache, "
+                            f"recebido {type(resultado).__name__}")
+        os.replace(caminho + ".tmp", caminho)
+        self.limitar(manter=caminho)
+
+    def em_uso(self, caminho):
+        """
+        True se algum memmap devolvido por `obter` para `caminho` ainda existe
+        (views e fatias mantêm o memmap vivo).
+        """
+        vivos = [ref for ref in self._abertos.get(caminho, ()) if ref() is not None]
+        if vivos:
+            self._abertos[caminho] = vivos
+        else:
+            self._abertos.pop(caminho, None)
+        return bool(vivos)
+
+    def tamanho(self):
+        return sum(os.path.getsize(c) for c, _ in self._artefatos())
+
+    def _artefatos(self):
+        artefatos = []
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(EXTENSOES_CACHE):
+                caminho = os.path.join(self.pasta, nome)
+                artefatos.append((caminho, os.stat(caminho).st_mtime_ns))
+        return artefatos
+
+    def limitar(self, manter=None):
+        """
+        Apaga os artefatos usados há mais tempo até a pasta caber em `limite_bytes`.
+        `manter` (o artefato recém-gravado) e os artefatos em uso (memmaps
+        abertos por `obter`) nunca são apagados; se a remoção falhar (arquivo
+        aberto por outro processo), o artefato fica e o próximo é tentado.
+        """
+        artefatos = sorted(self._artefatos(), key=lambda a: a[1])
+        total = sum(os.path.getsize(c) for c, _ in artefatos)
+        for caminho, _ in artefatos:
+            if total <= self.limite_bytes:
+                break
+            if caminho == manter or self.em_uso(caminho):
+                continue
+            tamanho = os.path.getsize(caminho)
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+
+    def chave(self, nome, funcao, identidades, *args, **parametros):
+        """
+        Chave que `executar` usaria, sem rodar nada (permite saber quais
+        etapas já estão prontas antes de calcular as entradas).
+        """
+        return chave_etapa(nome, funcao, identidades, {"args": list(args), **parametros})
+
+    def executar(self, nome, funcao, entradas, *args, chaves_entradas=None, **parametros):
+        """
+        Roda `funcao(*entradas, *args, **parametros)` só se o resultado ainda
+        não estiver no cache.
+
+        Args:
+            nome (str): nome da etapa
+            funcao (callable): deve devolver um array, MascaraBits ou
+                dicionário de arrays (lido de volta em memória, sem memmap)
+            entradas (list ou callable): arrays de entrada da etapa, ou uma
+                função sem argumentos que os devolve (só chamada se faltar no cache)
+            chaves_entradas (list ou None): identidade das entradas (chaves das
+                etapas que as produziram); None = hash do conteúdo das entradas
+            *args, **parametros: demais argumentos de `funcao` (entram na chave)
+
+        Retorna:
+            (resultado, chave); a chave identifica o resultado para a etapa seguinte.
+        """
+        if chaves_entradas is None:
+            if callable(entradas):
+                entradas = entradas()
+            chaves_entradas = entradas
+        chave = self.chave(nome, funcao, chaves_entradas, *args, **parametros)
+        resultado = self.obter(chave)
+        if resultado is None:
+            if callable(entradas):
+                entradas = entradas()
+            resultado = funcao(*entradas, *args, **parametros)
+            self.guardar(chave, resultado)
+        return resultado, chave
+
+'''
+Exemplo:
+cache = CacheEtapas("cache_etapas", limite_bytes=4 * 1024 ** 3)
+manifesto = carregar_manifesto(pasta_imagens)
+imagens = carregar_pilha(pasta_imagens, manifesto, usar_cache=True)
+suavizadas, chave = cache.executar("suavizacao", filtro_media_integral, [imagens], filtro_size,
+                                   chaves_entradas=[hash_manifesto(manifesto)],
+                                   bordas="constante", manter_padding=True)
+reduzidas, chave = cache.executar("reducao", reduzir_blocos, [binarizadas], 2,
+                                  chaves_entradas=[chave_binarizadas])
+'''
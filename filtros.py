@@ -0,0 +1,398 @@
+import numpy as np
+
+"""
+
+Filtros de vizinhança vetorizados usados pelos scripts de processamento.
+
+Cada função trabalha sobre a pilha inteira de imagens de uma vez
+(qualquer número de eixos iniciais, os dois últimos são altura e largura),
+sem laços Python por pixel.
+
+"""
+
+##################################
+# Bordas virtuais
+##################################
+BORDAS = ("constante", "refletir", "repetir")
+
+
+def indices_borda(n, antes, depois, bordas):
+    """
+    Índice de origem de cada posição de uma linha de `n` pixels estendida
+    virtualmente com `antes` posições à esquerda e `depois` à direita.
+
+        "constante" → -1 fora da imagem (o chamador usa o valor constante)
+        "refletir"  → espelha incluindo o pixel da borda (3 2 1 | 1 2 3 | 3 2 1)
+        "repetir"   → repete o pixel da borda        (1 1 1 | 1 2 3 | 3 3 3)
+
+    Mesmos modos de `scipy.ndimage` ("constant", "reflect", "nearest") e de
+    `np.pad` ("constant", "symmetric", "edge").
+    """
+    posicoes = np.arange(-antes, n + depois)
+    if bordas == "constante":
+        return np.where((posicoes >= 0) & (posicoes < n), posicoes, -1)
+    if bordas == "repetir":
+        return np.clip(posicoes, 0, n - 1)
+    if bordas == "refletir":
+        periodo = np.mod(posicoes, 2 * n)
+        return np.where(periodo < n, periodo, 2 * n - 1 - periodo)
+    raise ValueError(f"Modo de bordas desconhecido: {bordas!r} (use {BORDAS})")
+
+'''
+n = 3, antes = 2, depois = 2
+"constante" → [-1, -1, 0, 1, 2, -1, -1]
+"refletir"  → [ 1,  0, 0, 1, 2,  2,  1]
+"repetir"   → [ 0,  0, 0, 1, 2,  2,  2]
+'''
+
+##################################
+# Soma de janelas por somas acumuladas
+##################################
+def _soma_janela(matrizes, tamanho, eixo, bordas=None, valor_borda=0, extra=0):
+    """
+    Soma deslizante de `tamanho` elementos ao longo de `eixo`.
+
+    Sem `bordas`, retorna um array int32 com `shape[eixo] - tamanho + 1`
+    posições nesse eixo (só janelas inteiras). Com `bordas`, a linha é
+    estendida virtualmente (ver `indices_borda`) direto no vetor de somas
+    acumuladas, sem cópia com padding, e o eixo mantém o tamanho original
+    mais `extra` posições de cada lado (janelas centradas fora da imagem).
+    """
+    matrizes = np.moveaxis(matrizes, eixo, -1)
+    n = matrizes.shape[-1]
+    if bordas is None:
+        acumulada = np.zeros(matrizes.shape[:-1] + (n + 1,), dtype=np.int32)
+        np.cumsum(matrizes, axis=-1, dtype=np.int32, out=acumulada[..., 1:])
+    else:
+        antes = tamanho // 2 + extra
+        depois = tamanho - 1 - tamanho // 2 + extra
+        indices = indices_borda(n, antes, depois, bordas)
+        acumulada = np.empty(matrizes.shape[:-1] + (n + antes + depois + 1,), dtype=np.int32)
+        acumulada[..., 0] = 0
+        acumulada[..., antes + 1:antes + 1 + n] = matrizes
+        for destino, origem in ((slice(1, antes + 1), indices[:antes]),
+                                (slice(antes + 1 + n, None), indices[antes + n:])):
+            acumulada[..., destino] = valor_borda if bordas == "constante" else matrizes[..., origem]
+        np.cumsum(acumulada, axis=-1, out=acumulada)
+    soma = acumulada[..., tamanho:] - acumulada[..., :-tamanho]
+    return np.moveaxis(soma, -1, eixo)
+
+'''
+linha = [1, 2, 3, 4], tamanho = 3
+acumulada = [0, 1, 3, 6, 10]
+soma = [6-0, 10-1] = [6, 9]
+'''
+
+##################################
+# Soma de caixa lado x lado
+##################################
+def soma_caixa(matrizes, lado):
+    """
+    Soma de cada janela lado x lado inteira dentro da imagem (int32), com
+    shape (..., altura - lado + 1, largura - lado + 1). A posição [i, j] é a
+    janela cujo canto superior esquerdo está em (i, j).
+    """
+    return _soma_janela(_soma_janela(np.asarray(matrizes), lado, -1), lado, -2)
+
+##################################
+# Extensão virtual (padding) de uma região
+##################################
+def extensao_virtual(matrizes, linhas, colunas, bordas, valor_borda=0):
+    """
+    Valores de `np.pad(matrizes, ...)` nas posições `linhas` x `colunas`
+    (índices de `indices_borda`), sem montar a pilha com padding.
+    """
+    regiao = np.take(np.take(matrizes, np.maximum(linhas, 0), axis=-2), np.maximum(colunas, 0), axis=-1)
+    if bordas == "constante":
+        regiao[..., linhas < 0, :] = valor_borda
+        regiao[..., :, colunas < 0] = valor_borda
+    return regiao
+
+##################################
+# Filtro de média NxN (imagem integral)
+##################################
+def filtro_media_integral(matrizes, filtro_size, bordas=None, valor_borda=0, manter_padding=False,
+                          size_padding=None):
+    """
+    Filtro de média NxN equivalente a `filtro_media`, calculado para a pilha inteira.
+
+    A soma de cada janela vem de somas acumuladas separáveis (linhas e depois
+    colunas), então o custo por pixel não depende de `filtro_size`.
+    Sem `bordas`, mantém a mesma semântica do laço original:
+      - as `filtro_size // 2` linhas/colunas da borda ficam intactas;
+      - o valor do pixel é `int(soma / filtro_size**2)` (truncado).
+
+    Com `bordas`, todos os pixels são filtrados e o que fica fora da imagem
+    vem de um padding virtual (ver `indices_borda`), sem montar a cópia com
+    `np.pad`. `manter_padding=True` devolve o shape antigo (zero padding
+    seguido do filtro), igual a
+    `filtro_media_integral(np.pad(matrizes, size_padding, ...), filtro_size)`:
+    a imagem cresce `size_padding` pixels de cada lado e a moldura de
+    `filtro_size // 2` pixels da imagem com padding fica sem filtrar.
+
+    Args:
+        matrizes (array): shape (..., altura, largura), valores uint8
+        filtro_size (int): tamanho da máscara, ímpar (ex.: 3, 5...)
+        bordas (str ou None): None, "constante", "refletir" ou "repetir"
+        valor_borda (int): valor fora da imagem no modo "constante"
+        manter_padding (bool): devolve a imagem com padding (ver acima)
+        size_padding (int ou None): largura do padding (None = filtro_size // 2)
+
+    Retorna:
+        Array uint8 com o mesmo shape da entrada (com `manter_padding`,
+        `size_padding` pixels maior de cada lado).
+    """
+    if filtro_size < 1 or filtro_size % 2 == 0:
+        # com tamanho par a janela centrada teria filtro_size + 1 pixels de lado
+        raise ValueError(f"filtro_size precisa ser ímpar, recebido {filtro_size}")
+    matrizes = np.asarray(matrizes)
+    pad = filtro_size // 2
+    janela = filtro_size
+    altura, largura = matrizes.shape[-2:]
+
+    if bordas is None:
+        if manter_padding:
+            raise ValueError("manter_padding precisa de um modo de bordas")
+        suavizadas = matrizes.astype(np.uint8, copy=True)
+        if altura < janela or largura < janela:
+            return suavizadas
+
+        soma = soma_caixa(matrizes, janela)
+        media = soma // (filtro_size ** 2)
+        suavizadas[..., pad:altura - pad, pad:largura - pad] = media.astype(np.uint8)
+        return suavizadas
+
+    if bordas not in BORDAS:
+        raise ValueError(f"Modo de bordas desconhecido: {bordas!r} (use {BORDAS})")
+    if not manter_padding:
+        return _media_virtual(matrizes, janela, bordas, valor_borda)
+
+    # imagem com padding P: o miolo (sem a moldura de `pad`) são as médias das
+    # janelas centradas em -(P - pad) .. altura + (P - pad) da imagem original
+    P = pad if size_padding is None else size_padding
+    if P < 0:
+        raise ValueError(f"size_padding inválido: {size_padding}")
+    linhas = indices_borda(altura, P, P, bordas)
+    colunas = indices_borda(largura, P, P, bordas)
+    miolo_h, miolo_w = altura + 2 * (P - pad), largura + 2 * (P - pad)
+    if miolo_h <= 0 or miolo_w <= 0:
+        return extensao_virtual(matrizes, linhas, colunas, bordas, valor_borda)
+
+    extra, corte = max(P - pad, 0), max(pad - P, 0)
+    media = _media_virtual(matrizes, janela, bordas, valor_borda, extra)
+    suavizadas = np.empty(matrizes.shape[:-2] + (altura + 2 * P, largura + 2 * P), dtype=np.uint8)
+    suavizadas[..., pad:pad + miolo_h, pad:pad + miolo_w] = \
+        media[..., corte:corte + miolo_h, corte:corte + miolo_w]
+    return preencher_moldura(suavizadas, matrizes, pad, bordas, valor_borda)
+
+
+def preencher_moldura(suavizadas, matrizes, pad, bordas, valor_borda=0):
+    """
+    Escreve em `suavizadas` (imagem com padding, `size_padding` pixels maior
+    de cada lado que `matrizes`) a moldura de `pad` pixels que o filtro não
+    altera: os valores do padding virtual (e da imagem, se `pad` > size_padding).
+    """
+    if pad:
+        altura, largura = matrizes.shape[-2:]
+        P = (suavizadas.shape[-2] - altura) // 2
+        linhas = indices_borda(altura, P, P, bordas)
+        colunas = indices_borda(largura, P, P, bordas)
+        for fatia_linhas, fatia_colunas in ((np.s_[:pad], np.s_[:]), (np.s_[-pad:], np.s_[:]),
+                                            (np.s_[pad:-pad], np.s_[:pad]), (np.s_[pad:-pad], np.s_[-pad:])):
+            suavizadas[..., fatia_linhas, fatia_colunas] = extensao_virtual(
+                matrizes, linhas[fatia_linhas], colunas[fatia_colunas], bordas, valor_borda)
+    return suavizadas
+
+
+def _media_virtual(matrizes, janela, bordas, valor_borda, extra=0):
+    """
+    Média janela x janela com padding virtual, `extra` pixels além da imagem de cada lado.
+    """
+    # no padding constante, a soma de cada linha fora da imagem vale valor_borda * janela
+    soma = _soma_janela(_soma_janela(matrizes, janela, -1, bordas, valor_borda, extra),
+                        janela, -2, bordas, valor_borda * janela, extra)
+    return (soma // (janela * janela)).astype(np.uint8)
+
+'''
+filtro_size = 3, bordas = "constante" (padding virtual de zeros)
+[[1, 2, 3],        pixel (0, 0): soma = 0+0+0+0+1+2+0+4+5 = 12
+ [4, 5, 6],   →    média = 12 // 9 = 1
+ [7, 8, 9]]
+'''
+
+##################################
+# Redução por blocos (vetorizada)
+##################################
+REGRAS_REDUCAO = ("media", "maioria", "qualquer", "todos", "maximo")
+
+
+def reduzir_blocos(matrizes, block_size, regra="media", bordas="cortar"):
+    """
+    Reduz cada bloco `block_size` x `block_size` a um pixel, sem laços Python.
+
+    Args:
+        matrizes (array): shape (..., altura, largura)
+        block_size (int): lado do bloco
+        regra (str):
+            "media"    → 255 se a média do bloco > 127.5 (regra de `reduzir_com_mascara`)
+            "maioria"  → 255 se mais da metade dos pixels do bloco é diferente de 0
+            "qualquer" → 255 se algum pixel do bloco é diferente de 0
+            "todos"    → 255 se todos os pixels do bloco são diferentes de 0
+            "maximo"   → maior valor do bloco (mantém o dtype)
+        bordas (str): o que fazer quando altura/largura não são múltiplos do bloco
+            "cortar"    → descarta as linhas/colunas que sobram (comportamento original)
+            "preencher" → completa com zeros até o próximo múltiplo
+
+    Retorna:
+        Array com shape (..., altura // block_size, largura // block_size)
+        (ou arredondado para cima com "preencher"), uint8 0/255 salvo em "maximo".
+    """
+    if regra not in REGRAS_REDUCAO:
+        raise ValueError(f"Regra de redução desconhecida: {regra!r} (use {REGRAS_REDUCAO})")
+    matrizes = np.asarray(matrizes)
+    altura, largura = matrizes.shape[-2:]
+
+    if bordas == "cortar":
+        reduzida_h, reduzida_w = altura // block_size, largura // block_size
+        matrizes = matrizes[..., :reduzida_h * block_size, :reduzida_w * block_size]
+    elif bordas == "preencher":
+        reduzida_h, reduzida_w = -(-altura // block_size), -(-largura // block_size)
+        extra = [(0, 0)] * (matrizes.ndim - 2) + [
+            (0, reduzida_h * block_size - altura), (0, reduzida_w * block_size - largura)]
+        if extra[-1][1] or extra[-2][1]:
+            matrizes = np.pad(matrizes, extra, mode="constant", constant_values=0)
+    else:
+        raise ValueError(f"Modo de bordas desconhecido: {bordas!r} (use 'cortar' ou 'preencher')")
+
+    # (..., H, W) → (..., H/k, k, W/k, k): cada bloco vira os eixos -3 e -1
+    blocos = matrizes.reshape(matrizes.shape[:-2] + (reduzida_h, block_size, reduzida_w, block_size))
+    eixos = (-3, -1)
+    area = block_size * block_size
+
+    if regra == "maximo":
+        return blocos.max(axis=eixos)
+    if regra == "media":
+        # média > 127.5  ⇔  2 * soma > 255 * área (comparação exata em inteiros)
+        soma = blocos.sum(axis=eixos, dtype=np.int64)
+        ligado = 2 * soma > 255 * area
+    else:
+        contagem = np.count_nonzero(blocos, axis=eixos)
+        if regra == "maioria":
+            ligado = 2 * contagem > area
+        elif regra == "qualquer":
+            ligado = contagem > 0
+        else:
+            ligado = contagem == area
+
+    reduzidas = ligado.view(np.uint8)
+    np.multiply(reduzidas, 255, out=reduzidas)
+    return reduzidas
+
+'''
+block_size = 2, regra = "media"
+[[255, 255,   0, 0],
+ [255,   0,   0, 255]]
+blocos: [[255, 255], [255, 0]] → média 191.25 → 255
+        [[0, 0], [0, 255]]     → média 63.75  → 0
+resultado: [[255, 0]]
+'''
+
+##################################
+# Estatísticas + binarização (passe único)
+##################################
+def _histograma_uint8(matriz, tamanho_bloco=1 << 20):
+    """
+    Histograma de 256 posições; o bincount é feito em blocos para que o
+    temporário int64 criado pelo NumPy fique limitado a `tamanho_bloco` pixels.
+    """
+    valores = np.ravel(matriz)
+    histograma = np.zeros(256, dtype=np.int64)
+    for inicio in range(0, valores.size, tamanho_bloco):
+        histograma += np.bincount(valores[inicio:inicio + tamanho_bloco], minlength=256)
+    return histograma
+
+
+def _estatisticas(histograma, k):
+    """
+    Média, desvio padrão e limiar k·σ + μ a partir do histograma de 256 posições.
+    Histograma vazio (imagem sem pixels) dá média, desvio e limiar 0, em vez
+    de NaN, que não vira um corte inteiro na binarização.
+    """
+    valores = np.arange(256, dtype=np.float64)
+    total = histograma.sum()
+    if total == 0:
+        return 0.0, 0.0, 0.0
+    media = histograma @ valores / total
+    desvio = np.sqrt(histograma @ (valores - media) ** 2 / total)
+    return media, desvio, k * desvio + media
+
+
+def estatisticas_histograma(matrizes, k=5):
+    """
+    Só as estatísticas de `binarizar_por_histograma` (um passe de bincount por
+    `matrizes[i]`, sem binarizar): dicionário com "medias", "desvios",
+    "limiares" (N,) e "histogramas" (N, 256).
+    """
+    matrizes = np.asarray(matrizes)
+    n = len(matrizes)
+    histogramas = np.empty((n, 256), dtype=np.int64)
+    medias, desvios, limiares = np.empty(n), np.empty(n), np.empty(n)
+    for i, matriz in enumerate(matrizes):
+        histogramas[i] = _histograma_uint8(matriz)
+        medias[i], desvios[i], limiares[i] = _estatisticas(histogramas[i], k)
+    return {"medias": medias, "desvios": desvios, "limiares": limiares, "histogramas": histogramas}
+
+
+def binarizar_por_histograma(matrizes, k=5, saida=None, dtype=np.uint8):
+    """
+    Calcula média e desvio padrão pelo histograma e binariza com k·σ + μ.
+
+    Cada `matrizes[i]` é uma unidade (mesma iteração de `binarizar_matrizes`):
+    o histograma de 256 posições sai de um único passe com `np.bincount`,
+    média e desvio vêm do histograma, e a comparação escreve direto no
+    buffer de saída (sem o temporário int64 do `np.where`).
+
+    Args:
+        matrizes (array): uint8, shape (N, ...)
+        k (float): multiplicador do desvio padrão no limiar
+        saida (array ou None): buffer pré-alocado com o shape de `matrizes`
+            (uint8 ou bool)
+        dtype: dtype da saída quando `saida` é None (np.uint8 → 0/255, bool → False/True)
+
+    Retorna:
+        (binarizadas, estatisticas), onde estatisticas é um dicionário com
+        "medias", "desvios", "limiares" (N,) e "histogramas" (N, 256).
+    """
+    matrizes = np.asarray(matrizes)
+    if matrizes.dtype != np.uint8:
+        raise ValueError(f"binarizar_por_histograma espera uint8, recebeu {matrizes.dtype}")
+    if saida is None:
+        saida = np.empty(matrizes.shape, dtype=dtype)
+    elif saida.shape != matrizes.shape or saida.dtype not in (np.uint8, bool):
+        raise ValueError(f"Buffer de saída inválido: {saida.shape} {saida.dtype}")
+
+    n = len(matrizes)
+    histogramas = np.empty((n, 256), dtype=np.int64)
+    medias = np.empty(n)
+    desvios = np.empty(n)
+    limiares = np.empty(n)
+
+    for i, matriz in enumerate(matrizes):
+        histograma = _histograma_uint8(matriz)
+        media, desvio, limiar = _estatisticas(histograma, k)
+
+        histogramas[i], medias[i], desvios[i], limiares[i] = histograma, media, desvio, limiar
+
+        # pixel >= limiar  ⇔  pixel >= ceil(limiar), pois os pixels são inteiros
+        corte = int(np.clip(np.ceil(limiar), 0, 256))
+        destino = saida[i].view(bool)
+        if corte > 255:
+            destino[...] = False
+        else:
+            np.greater_equal(matriz, np.uint8(corte), out=destino)
+        if saida.dtype == np.uint8:
+            np.multiply(saida[i], 255, out=saida[i])
+
+    estatisticas = {"medias": medias, "desvios": desvios, "limiares": limiares,
+                    "histogramas": histogramas}
+    return saida, estatisticas
@@ -0,0 +1,242 @@
+import os
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+"""
+
+Índice (manifesto) das imagens de uma pasta.
+
+O manifesto registra, para cada imagem, nome, tamanho em bytes, dimensões,
+formato, modo, mtime e um hash do conteúdo. Ele é obtido lendo apenas o
+cabeçalho das imagens (`Image.open` não decodifica os pixels) e fica salvo
+ao lado da pasta (`img` → `img_manifesto.json`).
+Nas execuções seguintes só são lidos de novo os arquivos cujo tamanho
+ou mtime mudou.
+
+O hash do manifesto também identifica a cópia decodificada de cada imagem
+(`.npy` sem compressão), que evita decodificar os JPGs a cada execução.
+Esse cache é opcional (`usar_cache=True`): ele ocupa altura × largura bytes
+por imagem (6 MB para 3000x2000), não tem limite de tamanho e guarda as
+versões antigas das imagens alteradas; libere o espaço apagando a pasta
+`<pasta>_decodificadas`.
+
+"""
+
+FORMATOS_VALIDOS = {"png", "jpg", "jpeg", "bmp"}
+VERSAO_MANIFESTO = 1
+
+
+##################################
+# Caminho do manifesto
+##################################
+def caminho_manifesto(pasta):
+    pasta = os.path.normpath(pasta)
+    return pasta + "_manifesto.json"
+
+'''
+"C:/perc-x-conv-rn/img" → "C:/perc-x-conv-rn/img_manifesto.json"
+'''
+
+##################################
+# Hash do conteúdo do arquivo
+##################################
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+##################################
+# Ler cabeçalho de uma imagem
+##################################
+def inspecionar_imagem(pasta, nome):
+    caminho = os.path.join(pasta, nome)
+    info = os.stat(caminho)
+    with Image.open(caminho) as img:  # lê só o cabeçalho
+        largura, altura = img.size
+        formato = (img.format or "").lower()
+        modo = img.mode
+
+    return {
+        "nome": nome,
+        "tamanho_bytes": info.st_size,
+        "mtime_ns": info.st_mtime_ns,
+        "largura": largura,
+        "altura": altura,
+        "formato": formato,
+        "modo": modo,
+        "hash": hash_arquivo(caminho),
+    }
+
+##################################
+# Carregar (ou criar) o manifesto
+##################################
+def carregar_manifesto(pasta, salvar=True):
+    """
+    Devolve o manifesto das imagens da pasta, reaproveitando o salvo em disco.
+
+    Args:
+        pasta (str): pasta com as imagens
+        salvar (bool): grava o manifesto atualizado ao lado da pasta
+
+    Retorna:
+        Lista de dicionários (um por imagem), na ordem de `os.listdir`.
+    """
+    arquivo_manifesto = caminho_manifesto(pasta)
+    anteriores = {}
+    if os.path.exists(arquivo_manifesto):
+        with open(arquivo_manifesto, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        if dados.get("versao") == VERSAO_MANIFESTO:
+            anteriores = dados.get("arquivos", {})
+
+    nomes = [f for f in os.listdir(pasta) if f.split(".")[-1].lower() in FORMATOS_VALIDOS]
+    manifesto = []
+    alterado = len(nomes) != len(anteriores)
+
+    for nome in nomes:
+        entrada = anteriores.get(nome)
+        info = os.stat(os.path.join(pasta, nome))
+        if (entrada is None or entrada["tamanho_bytes"] != info.st_size
+                or entrada["mtime_ns"] != info.st_mtime_ns):
+            entrada = inspecionar_imagem(pasta, nome)
+            alterado = True
+        manifesto.append(entrada)
+
+    if salvar and alterado:
+        with open(arquivo_manifesto, "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO_MANIFESTO,
+                       "arquivos": {e["nome"]: e for e in manifesto}}, f, indent=1)
+
+    return manifesto
+
+##################################
+# Cache de imagens decodificadas
+##################################
+def pasta_decodificadas(pasta):
+    pasta = os.path.normpath(pasta)
+    return pasta + "_decodificadas"
+
+'''
+"C:/perc-x-conv-rn/img" → "C:/perc-x-conv-rn/img_decodificadas/<hash>.npy"
+'''
+
+def carregar_imagem_decodificada(pasta, entrada, mmap=True):
+    """
+    Devolve os pixels de uma imagem do manifesto como array uint8.
+
+    Na primeira vez a imagem é decodificada pelo PIL e salva sem compressão
+    em `<pasta>_decodificadas/<hash>.npy`. Todas as chamadas (inclusive a
+    primeira) devolvem o `.npy` aberto com `np.load`, sem decodificar o JPEG:
+    com `mmap_mode='r'` só as páginas realmente acessadas são lidas do disco.
+
+    Args:
+        pasta (str): pasta com as imagens
+        entrada (dict): item do manifesto (usa `nome` e `hash`)
+        mmap (bool): devolve um memmap somente leitura em vez de um array em memória
+
+    Retorna:
+        Array (ou memmap) uint8 com shape (altura, largura).
+    """
+    destino = pasta_decodificadas(pasta)
+    caminho_cache = os.path.join(destino, entrada["hash"] + ".npy")
+
+    if not os.path.exists(caminho_cache):
+        with Image.open(os.path.join(pasta, entrada["nome"])) as img:
+            matriz = np.array(img, dtype=np.uint8)
+        os.makedirs(destino, exist_ok=True)
+        temporario = caminho_cache + ".tmp"
+        with open(temporario, "wb") as f:
+            np.save(f, matriz)
+        os.replace(temporario, caminho_cache)  # nunca deixa um .npy pela metade
+
+    # mesmo caminho na primeira chamada e nas seguintes (o .npy recém-gravado
+    # ainda está no cache de páginas do sistema)
+    return np.load(caminho_cache, mmap_mode="r" if mmap else None)
+
+##################################
+# Decodificação em paralelo (threads)
+##################################
+def _decodificar(pasta, entrada, usar_cache):
+    if usar_cache:
+        return carregar_imagem_decodificada(pasta, entrada)
+    with Image.open(os.path.join(pasta, entrada["nome"])) as img:
+        return np.asarray(img, dtype=np.uint8)
+
+
+def carregar_pilha(pasta, manifesto=None, num_threads=None, usar_cache=False):
+    """
+    Decodifica as imagens em várias threads direto numa pilha pré-alocada.
+
+    O PIL libera o GIL durante a decodificação, então threads bastam.
+
+    Args:
+        pasta (str): pasta com as imagens
+        manifesto (list ou None): manifesto já carregado
+        num_threads (int ou None): número de threads (None = os.cpu_count())
+        usar_cache (bool): usa o cache de imagens decodificadas (grava um
+            `.npy` sem compressão por imagem, sem limite de tamanho)
+
+    Retorna:
+        Array uint8 contíguo com shape (n, altura, largura).
+
+    Levanta ValueError se a pasta não tem imagens, se alguma não está em
+    escala de cinza (modo "L" do PIL: RGB daria (altura, largura, 3)) ou
+    se os tamanhos diferem.
+    """
+    if manifesto is None:
+        manifesto = carregar_manifesto(pasta)
+    if not manifesto:
+        raise ValueError(f"Nenhuma imagem ({', '.join(sorted(FORMATOS_VALIDOS))}) em {pasta}")
+    fora_de_cinza = [f"{e['nome']} ({e['modo']})" for e in manifesto if e["modo"] != "L"]
+    if fora_de_cinza:
+        raise ValueError(f"Imagens fora da escala de cinza (modo L) em {pasta}: "
+                         f"{', '.join(fora_de_cinza)}; converta com Image.convert('L')")
+    tamanhos = {(e["altura"], e["largura"]) for e in manifesto}
+    if len(tamanhos) != 1:
+        raise ValueError(f"Imagens com tamanhos diferentes: {sorted(tamanhos)}")
+    altura, largura = tamanhos.pop()
+
+    pilha = np.empty((len(manifesto), altura, largura), dtype=np.uint8)
+
+    def decodificar_em(k):
+        pilha[k] = _decodificar(pasta, manifesto[k], usar_cache)
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(decodificar_em, range(len(manifesto))))
+
+    return pilha
+
+
+def iterar_imagens(pasta, manifesto=None, num_threads=2, prefetch=2, usar_cache=False):
+    """
+    Gerador que entrega (indice, matriz) na ordem do manifesto, decodificando
+    as próximas imagens em segundo plano enquanto a atual é processada.
+
+    No máximo `prefetch` imagens ficam decodificadas à frente do consumidor,
+    então a memória usada é limitada mesmo para pastas grandes.
+    """
+    if manifesto is None:
+        manifesto = carregar_manifesto(pasta)
+    pendentes = deque()
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        proximo = 0
+        while proximo < len(manifesto) or pendentes:
+            while proximo < len(manifesto) and len(pendentes) < max(prefetch, 1):
+                pendentes.append(executor.submit(_decodificar, pasta, manifesto[proximo], usar_cache))
+                proximo += 1
+            indice = proximo - len(pendentes)
+            yield indice, pendentes.popleft().result()
+
+'''
+Exemplo: filtrar a imagem k enquanto a k+1 é decodificada
+
+for k, matriz in iterar_imagens(pasta_imagens, prefetch=2):
+    suavizada = filtro_media_integral(np.pad(matriz, 1), 3)
+'''
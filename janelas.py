@@ -0,0 +1,185 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pilha import achatar_lote
+from filtros import soma_caixa
+
+"""
+
+Dataset de janelas deslizantes para o treino da rede (2.1).
+
+`gerar_dados_treino` montava uma lista com um vetor por janela (144 milhões
+de objetos para 24 imagens 3000x2000) e depois copiava tudo com `np.array`.
+Aqui as janelas são uma view com strides (`sliding_window_view`) sobre a
+pilha uint8: nada é materializado até um mini-lote ser pedido, e cada lote
+é copiado para um array contíguo (b, lado²) só com as janelas pedidas.
+
+Os rótulos (média da janela > limiar_alvo) saem de uma soma de caixa sobre
+a pilha inteira comparada com `limiar_alvo * lado²`, sem uma média por
+janela. Os mapas de rótulos ficam guardados no dataset por limiar: mudar
+`limiar_alvo` só refaz os rótulos, e as janelas nunca são recalculadas
+(são uma view).
+
+A ordem das janelas é a mesma do laço original: imagem, linha, coluna.
+O lado da janela é `2 * (tamanho_janela // 2) + 1`, como no laço
+(`matriz[i-pad:i+pad+1, j-pad:j+pad+1]`).
+
+"""
+
+
+##################################
+# Índices dos mini-lotes (embaralhados por blocos)
+##################################
+def indices_lotes(total, tamanho_lote, embaralhar=False, semente=None, tamanho_bloco=4096,
+                  blocos_por_grupo=64):
+    """
+    Gera os índices de cada mini-lote de uma época sobre `total` amostras.
+
+    Com `embaralhar`, as amostras são divididas em blocos de `tamanho_bloco`
+    índices consecutivos; a ordem dos blocos é sorteada e cada grupo de
+    `blocos_por_grupo` blocos (de regiões e imagens diferentes) é embaralhado
+    com `rng.permutation` antes de ser cortado em lotes. Todas as amostras
+    aparecem uma vez, e a memória fica em um grupo de índices (não numa
+    permutação de `total` inteiros).
+    """
+    if not embaralhar:
+        for inicio in range(0, total, tamanho_lote):
+            yield np.arange(inicio, min(inicio + tamanho_lote, total), dtype=np.int64)
+        return
+
+    rng = np.random.default_rng(semente)
+    num_blocos = -(-total // tamanho_bloco)
+    ordem = rng.permutation(num_blocos)
+    resto = np.empty(0, dtype=np.int64)
+    for g in range(0, num_blocos, blocos_por_grupo):
+        grupo = [np.arange(b * tamanho_bloco, min((b + 1) * tamanho_bloco, total), dtype=np.int64)
+                 for b in ordem[g:g + blocos_por_grupo]]
+        indices = np.concatenate([resto, rng.permutation(np.concatenate(grupo))])
+        completos = len(indices) // tamanho_lote * tamanho_lote
+        for inicio in range(0, completos, tamanho_lote):
+            yield indices[inicio:inicio + tamanho_lote]
+        resto = indices[completos:]  # sobra do grupo vai para o primeiro lote do próximo
+    if len(resto):
+        yield resto
+
+
+##################################
+# Dataset de janelas
+##################################
+class DatasetJanelas:
+    """
+    Janelas lado x lado de uma pilha (n, altura, largura), como view.
+
+    `janelas` tem shape (n, altura - lado + 1, largura - lado + 1, lado, lado)
+    e compartilha a memória de `matrizes` (zero cópia).
+    """
+
+    def __init__(self, matrizes, tamanho_janela):
+        self.matrizes = achatar_lote(matrizes)
+        self.tamanho_janela = tamanho_janela
+        self.lado = 2 * (tamanho_janela // 2) + 1
+        self.janelas = sliding_window_view(self.matrizes, (self.lado, self.lado), axis=(-2, -1))
+        self._rotulos = {}  # limiar_alvo → mapa de rótulos
+
+    @property
+    def shape_posicoes(self):
+        """(n, linhas, colunas) das posições de janela."""
+        return self.janelas.shape[:3]
+
+    @property
+    def num_entradas(self):
+        return self.lado * self.lado
+
+    def __len__(self):
+        n, linhas, colunas = self.shape_posicoes
+        return n * linhas * colunas
+
+    def com_janela(self, tamanho_janela):
+        """
+        Mesmo dataset com outro tamanho de janela (nova view, nenhuma cópia).
+        """
+        return DatasetJanelas(self.matrizes, tamanho_janela)
+
+    def rotulos(self, limiar_alvo):
+        """
+        Mapa de rótulos uint8 (n, linhas, colunas): 1 se a média da janela > limiar_alvo.
+
+        média > limiar  ⇔  soma > limiar * lado², com a soma de caixa de cada
+        imagem num passe vetorizado (o temporário int32 fica limitado a uma
+        imagem). `.reshape(-1)` segue a ordem das janelas.
+        """
+        if limiar_alvo not in self._rotulos:
+            mapa = np.empty(self.shape_posicoes, dtype=bool)
+            corte = limiar_alvo * self.num_entradas
+            for k, matriz in enumerate(self.matrizes):
+                np.greater(soma_caixa(matriz, self.lado), corte, out=mapa[k])
+            self._rotulos[limiar_alvo] = mapa.view(np.uint8)
+        return self._rotulos[limiar_alvo]
+
+    def lote(self, indices, out=None, dtype=np.float32):
+        """
+        Copia as janelas `indices` (posição na ordem imagem/linha/coluna)
+        para um array contíguo (len(indices), lado²).
+
+        Args:
+            indices (array de int): índices das janelas
+            out (array ou None): buffer (b, lado²) reutilizado entre lotes
+            dtype: dtype do lote quando `out` é None
+        """
+        indices = np.asarray(indices)
+        imagem, linha, coluna = np.unravel_index(indices, self.shape_posicoes)
+        janelas = self.janelas[imagem, linha, coluna].reshape(len(indices), self.num_entradas)
+        if out is None:
+            return janelas.astype(dtype, copy=False)
+        out = out[:len(indices)]
+        np.copyto(out, janelas, casting="unsafe")
+        return out
+
+    def fatia(self, inicio, fim, out=None, dtype=np.float32):
+        """
+        Lote das janelas consecutivas inicio..fim-1.
+        """
+        return self.lote(np.arange(inicio, min(fim, len(self))), out, dtype)
+
+    def indices_lotes(self, tamanho_lote, embaralhar=False, semente=None):
+        """
+        Índices de cada mini-lote de uma época (ver `indices_lotes`).
+        """
+        return indices_lotes(len(self), tamanho_lote, embaralhar, semente)
+
+    def lotes(self, tamanho_lote, embaralhar=False, semente=None, dtype=np.float32):
+        """
+        Gerador de (indices, lote) com no máximo `tamanho_lote` janelas;
+        o mesmo buffer é reaproveitado de um lote para o outro.
+        """
+        buffer = np.empty((tamanho_lote, self.num_entradas), dtype=dtype)
+        for indices in self.indices_lotes(tamanho_lote, embaralhar, semente):
+            yield indices, self.lote(indices, out=buffer)
+
+    def salvar_memmap(self, caminho, linhas_por_bloco=64):
+        """
+        Grava a matriz de projeto (N, lado²) uint8 num `.npy` mapeado em memória,
+        em blocos de `linhas_por_bloco` linhas de janelas de cada imagem.
+
+        Retorna:
+            memmap somente leitura (np.load(caminho, mmap_mode="r")).
+        """
+        n, linhas, colunas = self.shape_posicoes
+        destino = np.lib.format.open_memmap(caminho, mode="w+", dtype=self.matrizes.dtype,
+                                            shape=(len(self), self.num_entradas))
+        por_imagem = linhas * colunas
+        for k in range(n):
+            for inicio in range(0, linhas, linhas_por_bloco):
+                fim = min(inicio + linhas_por_bloco, linhas)
+                bloco = self.janelas[k, inicio:fim].reshape(-1, self.num_entradas)
+                base = k * por_imagem + inicio * colunas
+                destino[base:base + len(bloco)] = bloco
+        destino.flush()
+        del destino
+        return np.load(caminho, mmap_mode="r")
+
+'''
+Exemplo: matriz 4x4, tamanho_janela = 3 → 2x2 = 4 janelas de 9 valores
+dataset = DatasetJanelas(matrizes, 3)
+for indices, X_lote in dataset.lotes(4096, embaralhar=True, semente=epoca):
+    ...  # X_lote: (≤ 4096, 9) float32 contíguo
+'''
@@ -0,0 +1,120 @@
+import numpy as np
+
+"""
+
+Execução por ladrilhos (tiles) para operadores de vizinhança.
+
+Filtro de média, erosão/dilatação, filtros de esqueleto e a inferência
+por janela só olham para uma vizinhança limitada de cada pixel. Então a
+imagem pode ser processada em ladrilhos de tamanho fixo, cada um lido com
+uma margem (halo) do tamanho do raio do operador: o resultado costurado é
+idêntico ao da imagem inteira, e a memória de pico depende do tamanho do
+ladrilho, não do tamanho da pilha.
+
+Com a entrada e a saída em memmap (`np.load(..., mmap_mode="r")` e
+`np.lib.format.open_memmap`) a pilha nunca precisa estar inteira na memória.
+
+Raio (halo) dos operadores do repositório:
+    filtro_media_integral(m, n)         → n // 2
+    erosao / dilatacao(m, k)            → k // 2 (por eixo, para k retangular)
+    aplicar_padroes_3x3(m, padroes)     → 1 ("paralelo") ou len(padroes) ("sequencial")
+    mapa_alvos(m, pesos, k)             → k // 2
+Operadores encadeados somam os raios. O afinamento de Zhang-Suen não tem
+raio limitado e não pode ser feito por ladrilhos.
+
+"""
+
+
+##################################
+# Grade de ladrilhos
+##################################
+def _par(valor):
+    if np.isscalar(valor):
+        return int(valor), int(valor)
+    y, x = valor
+    return int(y), int(x)
+
+
+def ladrilhos(altura, largura, tamanho_ladrilho):
+    """
+    Gera as posições (y0, y1, x0, x1) dos ladrilhos que cobrem a imagem,
+    linha por linha. Os ladrilhos da última linha/coluna podem ser menores.
+    """
+    passo_y, passo_x = _par(tamanho_ladrilho)
+    if passo_y < 1 or passo_x < 1:
+        raise ValueError(f"Tamanho de ladrilho inválido: {tamanho_ladrilho!r}")
+    for y0 in range(0, altura, passo_y):
+        for x0 in range(0, largura, passo_x):
+            yield y0, min(y0 + passo_y, altura), x0, min(x0 + passo_x, largura)
+
+'''
+altura = 5, largura = 7, tamanho_ladrilho = 4
+(0, 4, 0, 4)  (0, 4, 4, 7)
+(4, 5, 0, 4)  (4, 5, 4, 7)
+'''
+
+##################################
+# Executor por ladrilhos
+##################################
+def processar_em_ladrilhos(funcao, matrizes, halo, tamanho_ladrilho=512, saida=None, **kwargs):
+    """
+    Aplica `funcao(regiao, **kwargs)` em ladrilhos com halo e costura o resultado.
+
+    Cada ladrilho é lido com `halo` pixels a mais de cada lado (cortados
+    na borda real da imagem), a função roda sobre essa região e só o miolo
+    correspondente ao ladrilho é copiado para a saída. Os efeitos de borda
+    que a função produz nas beiradas artificiais da região ficam dentro do
+    halo e são descartados; nas beiradas reais a função vê a mesma borda
+    que veria na imagem inteira.
+
+    Args:
+        funcao (callable): operador que devolve um array 2D com o shape da
+            região recebida (ex.: filtro_media_integral, erosao, aplicar_padroes_3x3)
+        matrizes (array ou memmap): shape (..., altura, largura)
+        halo (int ou (int, int)): raio do operador (ver tabela no topo do módulo)
+        tamanho_ladrilho (int ou (int, int)): lado do ladrilho sem o halo
+        saida (array, memmap ou None): destino com o shape de `matrizes`;
+            None aloca um array com o dtype devolvido pela função
+        **kwargs: parâmetros repassados para `funcao`
+
+    Retorna:
+        `saida`, com o mesmo resultado de `funcao(matrizes, **kwargs)`.
+    """
+    altura, largura = matrizes.shape[-2:]
+    halo_y, halo_x = _par(halo)
+    if halo_y < 0 or halo_x < 0:
+        raise ValueError(f"Halo inválido: {halo!r}")
+    if saida is not None and saida.shape != matrizes.shape:
+        raise ValueError(f"Saída com shape {saida.shape}, esperado {matrizes.shape}")
+
+    for indice in np.ndindex(*matrizes.shape[:-2]):
+        imagem = matrizes[indice]
+        for y0, y1, x0, x1 in ladrilhos(altura, largura, tamanho_ladrilho):
+            ya, yb = max(y0 - halo_y, 0), min(y1 + halo_y, altura)
+            xa, xb = max(x0 - halo_x, 0), min(x1 + halo_x, largura)
+
+            # cópia contígua: com memmap só esta região é lida do disco
+            regiao = np.ascontiguousarray(imagem[ya:yb, xa:xb])
+            resultado = np.asarray(funcao(regiao, **kwargs))
+            if resultado.shape != regiao.shape:
+                raise ValueError(
+                    f"A função devolveu shape {resultado.shape} para uma região {regiao.shape}; "
+                    "só operadores que preservam o shape podem ser usados por ladrilhos")
+
+            if saida is None:
+                saida = np.empty(matrizes.shape, dtype=resultado.dtype)
+            saida[indice + (slice(y0, y1), slice(x0, x1))] = \
+                resultado[y0 - ya:y1 - ya, x0 - xa:x1 - xa]
+
+    return saida
+
+'''
+Exemplo: filtro de média 3x3 de uma pilha em disco, sem carregá-la inteira
+
+entrada = np.load("matrizes.npy", mmap_mode="r")
+saida = np.lib.format.open_memmap("suavizadas.npy", mode="w+",
+                                  dtype=np.uint8, shape=entrada.shape)
+processar_em_ladrilhos(filtro_media_integral, entrada, halo=1,
+                       tamanho_ladrilho=512, saida=saida, filtro_size=3)
+saida.flush()
+'''
@@ -0,0 +1,100 @@
+import numpy as np
+
+"""
+
+Máscaras binárias compactadas em bits.
+
+Depois da binarização todas as matrizes só têm 0 e 255 (binarizadas,
+reduzidas, esqueletos, erosão, dilatação). `MascaraBits` guarda cada linha
+com `np.packbits` (8 pixels por byte) e só desempacota quando um valor
+0/255 ou bool é realmente necessário.
+
+"""
+
+
+##################################
+# Máscara compactada
+##################################
+class MascaraBits:
+    """
+    Pilha de máscaras binárias com shape lógico (..., altura, largura).
+
+    `bits` guarda as linhas compactadas: shape (..., altura, ceil(largura / 8)),
+    uint8, bit mais significativo primeiro (padrão do `np.packbits`).
+    """
+
+    __slots__ = ("bits", "shape")
+
+    def __init__(self, bits, shape):
+        bits = np.asarray(bits, dtype=np.uint8)
+        shape = tuple(int(s) for s in shape)
+        esperado = shape[:-1] + ((shape[-1] + 7) // 8,)
+        if bits.shape != esperado:
+            raise ValueError(f"bits com shape {bits.shape}, esperado {esperado} para {shape}")
+        self.bits = bits
+        self.shape = shape
+
+    @classmethod
+    def de_matriz(cls, matrizes):
+        """
+        Compacta uma matriz 0/255 (ou bool): pixel ligado = valor diferente de 0.
+        """
+        matrizes = np.asarray(matrizes)
+        if matrizes.dtype != bool:
+            matrizes = matrizes != 0
+        return cls(np.packbits(matrizes, axis=-1), matrizes.shape)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, indice):
+        """
+        Seleciona nos eixos de lote (ex.: mascara[0] ou mascara[0, 3]),
+        sem desempacotar.
+        """
+        if not isinstance(indice, tuple):
+            indice = (indice,)
+        if len(indice) > self.ndim - 2:
+            raise IndexError("Só é possível indexar os eixos de lote de uma MascaraBits")
+        bits = self.bits[indice]
+        return MascaraBits(bits, bits.shape[:-1] + (self.shape[-1],))
+
+    def para_bool(self):
+        return np.unpackbits(self.bits, axis=-1, count=self.shape[-1]).view(bool)
+
+    def para_uint8(self, valor=255):
+        matriz = np.unpackbits(self.bits, axis=-1, count=self.shape[-1])
+        if valor != 1:
+            np.multiply(matriz, valor, out=matriz)
+        return matriz
+
+    def contar(self):
+        """
+        Número de pixels ligados (sem desempacotar).
+        """
+        return int(_BITS_POR_BYTE[self.bits].sum(dtype=np.int64))
+
+    def __eq__(self, outra):
+        if not isinstance(outra, MascaraBits):
+            return NotImplemented
+        return self.shape == outra.shape and np.array_equal(self.bits, outra.bits)
+
+    def __repr__(self):
+        return f"MascaraBits(shape={self.shape}, nbytes={self.nbytes})"
+
+
+_BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+'''
+Exemplo:
+matriz = [[0, 255, 255, 0, 0, 0, 0, 0, 255]]   (largura 9)
+bits   = [[0b01100000, 0b10000000]]             (2 bytes)
+'''
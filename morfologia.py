@@ -0,0 +1,500 @@
+import numpy as np
+from mascaras import MascaraBits
+from filtros import BORDAS, indices_borda
+
+"""
+
+Operadores morfológicos binários vetorizados.
+
+Filtros de esqueleto (hit-or-miss 3x3): cada pixel recebe um código de
+9 bits com a sua vizinhança 3x3, calculado com deslocamentos de fatias
+(sem laços por pixel e sem cópia com padding). Um conjunto qualquer de
+padrões 3x3 vira uma tabela (LUT) de 512 posições, aplicada de uma vez
+sobre a pilha inteira (b, n, h, w).
+
+Bits do código (posição na janela 3x3):
+    [[0, 1, 2],
+     [3, 4, 5],
+     [6, 7, 8]]
+código = soma(2**bit para cada posição ligada). Fora da imagem conta como 0.
+
+Erosão e dilatação com elementos retangulares são separadas em passadas
+1D de mínimo/máximo deslizante (van Herk / Gil-Werman), com custo por
+pixel constante mesmo para elementos grandes.
+
+As versões `*_bits` fazem as mesmas operações sobre `MascaraBits`,
+com as linhas em palavras uint64 (64 pixels por AND/OR/deslocamento).
+
+`afinar_zhang_suen` faz a esqueletização de verdade (afinamento iterativo
+de Zhang-Suen) com a mesma ideia de LUT de 512 códigos, reavaliando a cada
+subiteração só os vizinhos dos pixels apagados.
+
+"""
+
+NAO_IMPORTA = -1  # célula do padrão que aceita 0 ou 1
+
+
+##################################
+# Código 3x3 de cada pixel
+##################################
+def codigo_vizinhanca(binarias, out=None):
+    """
+    Código de 9 bits da vizinhança 3x3 de cada pixel.
+
+    O código é montado em duas etapas separáveis: primeiro os 3 bits de
+    cada linha (vizinhos esquerda/centro/direita), depois as 3 linhas
+    (acima/centro/abaixo) deslocadas de 3 em 3 bits.
+
+    Args:
+        binarias (array bool): shape (..., altura, largura)
+        out (array uint16 ou None): buffer pré-alocado
+
+    Retorna:
+        Array uint16 com o mesmo shape.
+    """
+    binarias = np.asarray(binarias, dtype=bool)
+    altura, largura = binarias.shape[-2:]
+    if out is None:
+        out = np.empty(binarias.shape, dtype=np.uint16)
+
+    # bits 0, 1, 2 da linha: vizinho da esquerda, centro, vizinho da direita
+    linha = binarias.astype(np.uint16)
+    np.left_shift(linha, 1, out=linha)
+    linha[..., :, 1:] |= binarias[..., :, :-1]
+    linha[..., :, :-1] |= binarias[..., :, 1:].astype(np.uint16) << 2
+
+    # linha de cima (bits 0-2), linha do centro (3-5), linha de baixo (6-8)
+    np.left_shift(linha, 3, out=out)
+    out[..., 1:, :] |= linha[..., :-1, :]
+    np.left_shift(linha[..., 1:, :], 6, out=linha[..., 1:, :])
+    out[..., :-1, :] |= linha[..., 1:, :]
+    return out
+
+##################################
+# Padrões e tabela (LUT)
+##################################
+def padrao_de_esqueleto(esqueleto, modo="exato"):
+    """
+    Converte um esqueleto 3x3 com valores 0/255 num padrão 1/0/NAO_IMPORTA.
+
+    modo="exato"     → a janela 3x3 precisa ser igual ao esqueleto
+                       (as células 0 precisam estar desligadas)
+    modo="correlacao" → só as células 255 precisam estar ligadas
+                       (as células 0 não importam)
+    """
+    if modo not in ("exato", "correlacao"):
+        raise ValueError(f"Modo de padrão desconhecido: {modo!r}")
+    esqueleto = np.asarray(esqueleto)
+    padrao = np.where(esqueleto == 255, 1, 0 if modo == "exato" else NAO_IMPORTA)
+    return padrao.astype(np.int8)
+
+
+def tabela_padroes(padroes):
+    """
+    LUT bool de 512 posições: True nos códigos que casam com algum padrão.
+    """
+    codigos = np.arange(512)
+    bits = (codigos[:, None] >> np.arange(9)) & 1   # (512, 9)
+    tabela = np.zeros(512, dtype=bool)
+
+    for padrao in padroes:
+        padrao = np.asarray(padrao).reshape(9)
+        importa = padrao != NAO_IMPORTA
+        tabela |= np.all(bits[:, importa] == padrao[importa], axis=1)
+
+    return tabela
+
+
+##################################
+# Hit-or-miss 3x3 por LUT
+##################################
+def aplicar_padroes_3x3(matrizes, padroes, modo="sequencial", bordas="zero", valor=255):
+    """
+    Zera o pixel central onde a vizinhança 3x3 casa com algum padrão.
+
+    Args:
+        matrizes (array): shape (..., altura, largura); pixel ligado = `valor`
+            (bool também é aceito)
+        padroes (list): padrões 3x3 com 1, 0 e NAO_IMPORTA
+        modo (str):
+            "sequencial" → cada padrão vê o resultado do anterior
+                           (como os laços de esqueletos dos scripts)
+            "paralelo"   → todos os padrões olham a entrada original,
+                           numa única passada da LUT
+        bordas (str):
+            "zero"    → pixels da borda também são testados (fora = 0),
+                        como `correlate(mode='constant')`
+            "ignorar" → pixels da borda nunca mudam, como a comparação direta
+
+    Retorna:
+        Cópia de `matrizes` com os pixels casados zerados.
+    """
+    if modo not in ("sequencial", "paralelo"):
+        raise ValueError(f"Modo desconhecido: {modo!r} (use 'sequencial' ou 'paralelo')")
+    if bordas not in ("zero", "ignorar"):
+        raise ValueError(f"Modo de bordas desconhecido: {bordas!r} (use 'zero' ou 'ignorar')")
+
+    matrizes = np.asarray(matrizes)
+    resultado = matrizes.copy()
+    binarias = matrizes.copy() if matrizes.dtype == bool else matrizes == valor
+
+    codigos = np.empty(binarias.shape, dtype=np.uint16)
+    grupos = [padroes] if modo == "paralelo" else [[p] for p in padroes]
+
+    for grupo in grupos:
+        tabela = tabela_padroes(grupo)
+        codigo_vizinhanca(binarias, out=codigos)
+        casados = np.take(tabela, codigos)
+        if bordas == "ignorar":
+            casados[..., 0, :] = casados[..., -1, :] = False
+            casados[..., :, 0] = casados[..., :, -1] = False
+        resultado[casados] = 0
+        binarias[casados] = False
+
+    return resultado
+
+
+##################################
+# Mínimo/máximo deslizante 1D (van Herk / Gil-Werman)
+##################################
+def _minmax_deslizante(matrizes, tamanho, inicio, operacao, eixo, bordas="constante"):
+    """
+    out[i] = operacao(x[i + inicio], ..., x[i + inicio + tamanho - 1]) ao longo de `eixo`,
+    com 0 fora da imagem ("constante") ou a borda refletida/repetida
+    ("refletir"/"repetir"). Custo O(1) por pixel, qualquer que seja `tamanho`.
+
+    van Herk / Gil-Werman: a linha é dividida em blocos de `tamanho`; dentro de
+    cada bloco calcula-se o acumulado da esquerda (g) e da direita (h), e toda
+    janela cobre o fim de um bloco e o começo do seguinte: out = op(h[i], g[i+k-1]).
+    """
+    if tamanho == 1:
+        return matrizes
+    eixo = eixo % matrizes.ndim
+    n = matrizes.shape[eixo]
+    esquerda = -inicio
+    total = -(-(n + tamanho - 1) // tamanho) * tamanho  # múltiplo de `tamanho`
+    antes, depois = matrizes.shape[:eixo], matrizes.shape[eixo + 1:]
+    resto = (slice(None),) * len(depois)
+
+    estendido = np.zeros(antes + (total,) + depois, dtype=matrizes.dtype)
+    estendido[(Ellipsis, slice(esquerda, esquerda + n)) + resto] = matrizes
+    if bordas != "constante":
+        # padding virtual só nas posições de fora, dentro do buffer que já existe
+        indices = indices_borda(n, esquerda, total - esquerda - n, bordas)
+        for fora in (slice(0, esquerda), slice(esquerda + n, total)):
+            estendido[(Ellipsis, fora) + resto] = np.take(matrizes, indices[fora], axis=eixo)
+
+    # (..., total, ...) → (..., blocos, tamanho, ...): o acumulado percorre o eixo `tamanho`
+    forma_blocos = antes + (total // tamanho, tamanho) + depois
+    g = estendido.reshape(forma_blocos)
+    h = g.copy()
+    for j in range(1, tamanho):
+        atual, anterior = (Ellipsis, j) + resto, (Ellipsis, j - 1) + resto
+        operacao(g[anterior], g[atual], out=g[atual])
+    for j in range(tamanho - 2, -1, -1):
+        atual, seguinte = (Ellipsis, j) + resto, (Ellipsis, j + 1) + resto
+        operacao(h[seguinte], h[atual], out=h[atual])
+
+    g = g.reshape(estendido.shape)
+    h = h.reshape(estendido.shape)
+    return operacao(h[(Ellipsis, slice(0, n)) + resto],
+                    g[(Ellipsis, slice(tamanho - 1, tamanho - 1 + n)) + resto])
+
+
+def _tamanho_2d(tamanho):
+    if np.isscalar(tamanho):
+        return int(tamanho), int(tamanho)
+    altura, largura = tamanho
+    return int(altura), int(largura)
+
+
+def _morfologia_separavel(matrizes, tamanho, operacao, inicio, out, valor, bordas):
+    if bordas not in BORDAS:
+        raise ValueError(f"Modo de bordas desconhecido: {bordas!r} (use {BORDAS})")
+    matrizes = np.asarray(matrizes)
+    kh, kw = _tamanho_2d(tamanho)
+    trabalho = (matrizes if matrizes.dtype == bool else matrizes == valor).view(np.uint8)
+
+    trabalho = _minmax_deslizante(trabalho, kw, inicio(kw), operacao, -1, bordas)
+    trabalho = _minmax_deslizante(trabalho, kh, inicio(kh), operacao, -2, bordas)
+
+    if out is None:
+        out = np.empty(matrizes.shape, dtype=matrizes.dtype)
+    if out.dtype == bool:
+        np.copyto(out, trabalho.view(bool) if trabalho.dtype == np.uint8 else trabalho)
+    else:
+        np.multiply(trabalho, valor, out=out, casting="unsafe")
+    return out
+
+
+##################################
+# Erosão e dilatação (elemento retangular)
+##################################
+def erosao(matrizes, tamanho, out=None, valor=255, bordas="constante"):
+    """
+    Erosão binária com elemento estruturante retangular cheio, na pilha inteira.
+
+    Equivale a `binary_erosion(matriz == valor, structure=np.ones(tamanho))`
+    (fora da imagem = 0), mas separada em duas passadas 1D de mínimo
+    deslizante (van Herk / Gil-Werman): custo O(1) por pixel.
+
+    Args:
+        matrizes (array): shape (..., altura, largura), 0/`valor` ou bool
+        tamanho (int ou tupla): lado do quadrado ou (altura, largura)
+        out (array ou None): buffer de saída (uint8 recebe 0/`valor`, bool recebe True/False)
+        valor (int): valor do pixel ligado
+        bordas (str): fora da imagem: "constante" (0, como o scipy),
+            "refletir" ou "repetir" (ver `filtros.indices_borda`)
+
+    Retorna:
+        `out` (ou um novo array com o dtype da entrada).
+    """
+    return _morfologia_separavel(matrizes, tamanho, np.minimum, lambda k: -(k // 2), out, valor, bordas)
+
+
+def dilatacao(matrizes, tamanho, out=None, valor=255, bordas="constante"):
+    """
+    Dilatação binária com elemento estruturante retangular cheio, na pilha inteira.
+
+    Equivale a `binary_dilation(matriz == valor, structure=np.ones(tamanho))`,
+    com duas passadas 1D de máximo deslizante (van Herk / Gil-Werman).
+    Mesmos argumentos de `erosao`.
+    """
+    return _morfologia_separavel(matrizes, tamanho, np.maximum, lambda k: -((k - 1) // 2), out, valor, bordas)
+
+'''
+Janela de cada pixel para um elemento de lado k (mesma origem do scipy):
+erosão:    x[i - k//2 ... i - k//2 + k - 1]        (k=4: i-2 ... i+1)
+dilatação: x[i - (k-1)//2 ... i - (k-1)//2 + k - 1] (k=4: i-1 ... i+2)
+'''
+
+
+##################################
+# Versão em bits (palavras de 64 pixels)
+##################################
+def _para_palavras(mascara):
+    """
+    Linhas de uma MascaraBits → palavras uint64 (64 pixels por palavra).
+    O pixel x fica no bit 63 - (x % 64) da palavra x // 64 (mesma ordem do packbits).
+    """
+    bits = mascara.bits
+    num_palavras = -(-bits.shape[-1] // 8)
+    bytes_linha = np.zeros(bits.shape[:-1] + (num_palavras * 8,), dtype=np.uint8)
+    bytes_linha[..., :bits.shape[-1]] = bits
+    return bytes_linha.view(">u8").astype(np.uint64)
+
+
+def _de_palavras(palavras, shape):
+    largura = shape[-1]
+    num_bytes = -(-largura // 8)
+    bits = palavras.astype(">u8").view(np.uint8)[..., :num_bytes]
+    bits = np.ascontiguousarray(bits)
+    if largura % 8:
+        bits[..., -1] &= np.uint8((0xFF << (8 - largura % 8)) & 0xFF)  # zera os bits de sobra
+    return MascaraBits(bits, shape)
+
+
+def _deslocar_x(palavras, s):
+    """
+    out[x] = in[x + s] ao longo da linha (0 fora da imagem).
+    """
+    if s == 0:
+        return palavras
+    num_palavras = palavras.shape[-1]
+    q, r = divmod(abs(s), 64)
+    out = np.zeros_like(palavras)
+    if q >= num_palavras:
+        return out
+    r64, c64 = np.uint64(r), np.uint64(64 - r)
+    if s > 0:
+        out[..., :num_palavras - q] = palavras[..., q:] << r64
+        if r:
+            out[..., :num_palavras - q - 1] |= palavras[..., q + 1:] >> c64
+    else:
+        out[..., q:] = palavras[..., :num_palavras - q] >> r64
+        if r:
+            out[..., q + 1:] |= palavras[..., :num_palavras - q - 1] << c64
+    return out
+
+
+def _deslocar_y(palavras, s):
+    """
+    out[y] = in[y + s] (linhas de fora da imagem = 0).
+    """
+    if s == 0:
+        return palavras
+    altura = palavras.shape[-2]
+    out = np.zeros_like(palavras)
+    if abs(s) >= altura:
+        return out
+    if s > 0:
+        out[..., :altura - s, :] = palavras[..., s:, :]
+    else:
+        out[..., -s:, :] = palavras[..., :altura + s, :]
+    return out
+
+
+def _morfologia_bits(mascara, tamanho, operacao, inicio):
+    kh, kw = _tamanho_2d(tamanho)
+    palavras = _para_palavras(mascara)
+
+    linhas = palavras.copy()
+    for s in range(inicio(kw), inicio(kw) + kw):
+        if s:
+            operacao(linhas, _deslocar_x(palavras, s), out=linhas)
+    resultado = linhas.copy()
+    for s in range(inicio(kh), inicio(kh) + kh):
+        if s:
+            operacao(resultado, _deslocar_y(linhas, s), out=resultado)
+
+    return _de_palavras(resultado, mascara.shape)
+
+
+def erosao_bits(mascara, tamanho):
+    """
+    `erosao` sobre uma MascaraBits, 64 pixels por operação (AND de deslocamentos).
+    Retorna uma MascaraBits idêntica a MascaraBits.de_matriz(erosao(...)).
+    """
+    return _morfologia_bits(mascara, tamanho, np.bitwise_and, lambda k: -(k // 2))
+
+
+def dilatacao_bits(mascara, tamanho):
+    """
+    `dilatacao` sobre uma MascaraBits, 64 pixels por operação (OR de deslocamentos).
+    """
+    return _morfologia_bits(mascara, tamanho, np.bitwise_or, lambda k: -((k - 1) // 2))
+
+
+def aplicar_padroes_bits(mascara, padroes, modo="sequencial", bordas="zero"):
+    """
+    `aplicar_padroes_3x3` sobre uma MascaraBits: cada célula do padrão vira um
+    AND com a máscara deslocada (ou o seu complemento), 64 pixels por operação.
+    Mesmos modos e bordas de `aplicar_padroes_3x3`.
+    """
+    if modo not in ("sequencial", "paralelo"):
+        raise ValueError(f"Modo desconhecido: {modo!r} (use 'sequencial' ou 'paralelo')")
+    if bordas not in ("zero", "ignorar"):
+        raise ValueError(f"Modo de bordas desconhecido: {bordas!r} (use 'zero' ou 'ignorar')")
+
+    palavras = _para_palavras(mascara)
+    altura, largura = mascara.shape[-2:]
+
+    # pixels que podem mudar: a imagem toda ou só o interior
+    permitido = _para_palavras(MascaraBits.de_matriz(np.ones((altura, largura), dtype=bool)))
+    if bordas == "ignorar":
+        interior = np.zeros((altura, largura), dtype=bool)
+        interior[1:-1, 1:-1] = True
+        permitido = _para_palavras(MascaraBits.de_matriz(interior))
+
+    grupos = [padroes] if modo == "paralelo" else [[p] for p in padroes]
+    for grupo in grupos:
+        casados = np.zeros_like(palavras)
+        for padrao in grupo:
+            casou = np.broadcast_to(permitido, palavras.shape).copy()
+            for bit, celula in enumerate(np.asarray(padrao).reshape(9)):
+                if celula == NAO_IMPORTA:
+                    continue
+                vizinho = _deslocar_x(_deslocar_y(palavras, bit // 3 - 1), bit % 3 - 1)
+                if celula == 1:
+                    casou &= vizinho
+                else:
+                    casou &= ~vizinho
+            casados |= casou
+        palavras &= ~casados
+
+    return _de_palavras(palavras, mascara.shape)
+
+
+##################################
+# Afinamento (Zhang-Suen) com conjunto ativo
+##################################
+def _tabelas_zhang_suen():
+    """
+    Duas LUTs de 512 posições (uma por subiteração) com True onde o pixel
+    central pode ser apagado.
+
+    Vizinhos na notação de Zhang-Suen → bit do código:
+        P9 P2 P3     0 1 2
+        P8 P1 P4  →  3 4 5
+        P7 P6 P5     6 7 8
+    """
+    bits = (np.arange(512)[:, None] >> np.arange(9)) & 1
+    p1 = bits[:, 4]
+    p2, p3, p4, p5, p6, p7, p8, p9 = (bits[:, b] for b in (1, 2, 5, 8, 7, 6, 3, 0))
+    vizinhos = np.stack([p2, p3, p4, p5, p6, p7, p8, p9], axis=1)
+
+    b = vizinhos.sum(axis=1)                                           # vizinhos ligados
+    a = ((vizinhos == 0) & (np.roll(vizinhos, -1, axis=1) == 1)).sum(axis=1)  # transições 0→1
+    base = (p1 == 1) & (b >= 2) & (b <= 6) & (a == 1)
+
+    primeira = base & (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+    segunda = base & (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+    return primeira, segunda
+
+
+def _indices_unicos(indices):
+    """
+    Índices ordenados sem repetição (ordenação + comparação com o vizinho,
+    mais rápido que `np.unique` para vetores grandes de inteiros).
+    """
+    indices = np.sort(indices)
+    if len(indices) < 2:
+        return indices
+    return indices[np.concatenate(([True], indices[1:] != indices[:-1]))]
+
+
+def afinar_zhang_suen(matrizes, valor=255, max_iteracoes=None):
+    """
+    Esqueletização por afinamento iterativo de Zhang-Suen, na pilha inteira.
+
+    Cada subiteração só reavalia os pixels vizinhos dos que foram apagados
+    desde a última vez que aquela subiteração rodou (conjunto ativo), então
+    o custo acompanha o número de pixels que mudam, e não área × iterações.
+    O resultado é o mesmo do algoritmo que varre a imagem inteira a cada passo.
+
+    Args:
+        matrizes (array): shape (..., altura, largura), 0/`valor` ou bool
+        valor (int): valor do pixel ligado
+        max_iteracoes (int ou None): limite de iterações (cada uma = 2 subiterações)
+
+    Retorna:
+        Array com o mesmo shape e dtype da entrada (0/`valor` ou bool).
+    """
+    matrizes = np.asarray(matrizes)
+    altura, largura = matrizes.shape[-2:]
+    binarias = matrizes if matrizes.dtype == bool else matrizes == valor
+
+    # Uma borda de zeros por imagem: vizinhos nunca atravessam para outra imagem
+    largura_p = largura + 2
+    imagem = np.zeros(matrizes.shape[:-2] + (altura + 2, largura_p), dtype=bool)
+    imagem[..., 1:-1, 1:-1] = binarias
+    plana = imagem.reshape(-1)
+
+    deslocamentos = np.array([(bit // 3 - 1) * largura_p + (bit % 3 - 1) for bit in range(9)])
+    pesos = (1 << np.arange(9)).astype(np.uint16)
+    tabelas = _tabelas_zhang_suen()
+
+    ligados = np.flatnonzero(plana)
+    ativos = [ligados, ligados]
+    iteracao = 0
+
+    while (len(ativos[0]) or len(ativos[1])) and (max_iteracoes is None or iteracao < max_iteracoes):
+        for sub in (0, 1):
+            candidatos = ativos[sub]
+            candidatos = candidatos[plana[candidatos]]
+            codigos = plana[candidatos[:, None] + deslocamentos] @ pesos
+            apagar = candidatos[tabelas[sub][codigos]]
+            plana[apagar] = False
+
+            # vizinhos dos apagados precisam ser reavaliados nas duas subiterações
+            afetados = _indices_unicos((apagar[:, None] + deslocamentos).reshape(-1))
+            ativos[sub] = afetados
+            ativos[1 - sub] = _indices_unicos(np.concatenate([ativos[1 - sub], afetados]))
+        iteracao += 1
+
+    resultado = imagem[..., 1:-1, 1:-1]
+    if matrizes.dtype == bool:
+        return resultado.copy()
+    saida = np.zeros(matrizes.shape, dtype=matrizes.dtype)
+    saida[resultado] = valor
+    return saida
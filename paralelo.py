@@ -0,0 +1,164 @@
+import os
+import numpy as np
+from multiprocessing import Pool, shared_memory
+
+"""
+
+Execução paralela de etapas por imagem.
+
+As etapas do pipeline (filtro de média, redução, erosão, dilatação,
+esqueletos) tratam cada imagem de forma independente. A binarização não:
+o limiar k·σ + μ é um só para a pilha inteira (é um passe único, barato).
+`executar_por_imagem` distribui as imagens de uma pilha entre processos,
+passando-as por buffers de `multiprocessing.shared_memory` para que os
+arrays grandes não sejam serializados (pickle) entre processos.
+
+⚠️ A função passada precisa ser importável pelos processos filhos
+(definida em um módulo, como `filtros.py`, ou um `functools.partial` dela).
+No Windows os filhos reimportam o script principal, então a chamada deve
+ficar dentro de `if __name__ == "__main__":`.
+
+"""
+
+# Estado de cada processo filho (preenchido pelo inicializador do Pool)
+_estado = {}
+
+
+##################################
+# Memória compartilhada
+##################################
+def _criar_compartilhado(shape, dtype):
+    dtype = np.dtype(dtype)
+    tamanho = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=tamanho)
+    try:
+        return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+
+
+def _inicializar_processo(funcao, kwargs, entrada, saida):
+    """
+    Anexa o processo filho aos blocos de memória compartilhada.
+    `entrada` e `saida` são tuplas (nome, shape, dtype).
+    """
+    _estado["funcao"] = funcao
+    _estado["kwargs"] = kwargs
+    for chave, (nome, shape, dtype) in (("entrada", entrada), ("saida", saida)):
+        shm = shared_memory.SharedMemory(name=nome)
+        _estado["shm_" + chave] = shm  # manter referência viva
+        _estado[chave] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _processar_imagem(indice):
+    entrada = _estado["entrada"]
+    saida = _estado["saida"]
+    saida[indice] = _estado["funcao"](entrada[indice], **_estado["kwargs"])
+    return indice
+
+
+##################################
+# Executor por imagem
+##################################
+def executar_por_imagem(funcao, matrizes, num_processos=None, imagens_por_bloco=None, saida=None, **kwargs):
+    """
+    Aplica `funcao(imagem, **kwargs)` a cada imagem da pilha, em paralelo.
+
+    As imagens passam pelos processos em blocos de `imagens_por_bloco`:
+    cada bloco é copiado para um buffer de entrada em memória compartilhada,
+    os filhos escrevem no buffer de saída e o bloco é copiado para o
+    resultado. Os dois buffers têm o tamanho de um bloco (a pilha não fica
+    duplicada), e com `matrizes` em memmap só o bloco da vez é lido do disco.
+
+    Limite: as duas cópias de cada bloco são feitas pelo processo principal,
+    uma depois da outra, com os filhos parados. Cada cópia é um `memcpy` de
+    altura × largura bytes por imagem, bem mais barato que o filtro, mas
+    esse tempo não se divide entre os processos. Com `matrizes` em memmap
+    ainda frio, a cópia de entrada inclui a leitura do disco.
+
+    A primeira imagem é processada no processo principal, antes do Pool:
+    `funcao` pode mudar o shape e o dtype (ex.: redução por blocos), e o
+    resultado dela define o shape e o dtype de `saida` e do buffer de saída
+    compartilhado. Com uma única imagem (ou `num_processos=1`) nenhum Pool é
+    criado.
+
+    Args:
+        funcao (callable): recebe uma imagem 2D e devolve um array 2D
+            (o shape pode mudar, ex.: redução por blocos)
+        matrizes (array ou memmap): shape (..., altura, largura), ex.: (b, n, h, w)
+        num_processos (int ou None): número de processos
+            (None = os.cpu_count(); 1 = execução serial, sem Pool)
+        imagens_por_bloco (int ou None): imagens por bloco (None = 2 por processo)
+        saida (array, memmap ou None): destino (..., altura_saida, largura_saida)
+        **kwargs: parâmetros repassados para `funcao`
+
+    Retorna:
+        Array com shape (..., altura_saida, largura_saida), idêntico ao
+        resultado da execução serial. Pilha vazia: devolve um array vazio
+        com o shape e o dtype da entrada (`funcao` não é chamada).
+    """
+    if not hasattr(matrizes, "shape"):
+        matrizes = np.asarray(matrizes)
+    eixos_lote = matrizes.shape[:-2]
+    indices = list(np.ndindex(*eixos_lote))
+    if not indices:
+        return np.empty(matrizes.shape, dtype=matrizes.dtype) if saida is None else saida
+
+    if num_processos is None:
+        num_processos = os.cpu_count() or 1
+    num_processos = max(1, min(num_processos, len(indices) - 1))
+
+    # A primeira imagem é processada aqui: o resultado dá shape e dtype da
+    # saída, necessários para alocar `saida` e o buffer compartilhado
+    primeira = np.asarray(funcao(matrizes[indices[0]], **kwargs))
+    if saida is None:
+        saida = np.empty(eixos_lote + primeira.shape, dtype=primeira.dtype)
+    elif saida.shape != eixos_lote + primeira.shape:
+        raise ValueError(f"Saída com shape {saida.shape}, esperado {eixos_lote + primeira.shape}")
+    saida[indices[0]] = primeira
+    restantes = indices[1:]
+
+    if num_processos == 1 or not restantes:
+        for indice in restantes:
+            saida[indice] = funcao(matrizes[indice], **kwargs)
+        return saida
+
+    bloco = max(1, min(imagens_por_bloco or 2 * num_processos, len(restantes)))
+    shm_entrada = shm_saida = entrada = buffer_saida = None
+    try:
+        shm_entrada, entrada = _criar_compartilhado((bloco,) + matrizes.shape[-2:], matrizes.dtype)
+        shm_saida, buffer_saida = _criar_compartilhado((bloco,) + primeira.shape, primeira.dtype)
+
+        info_entrada = (shm_entrada.name, entrada.shape, entrada.dtype)
+        info_saida = (shm_saida.name, buffer_saida.shape, buffer_saida.dtype)
+        with Pool(num_processos, initializer=_inicializar_processo,
+                  initargs=(funcao, kwargs, info_entrada, info_saida)) as pool:
+            for inicio in range(0, len(restantes), bloco):
+                lote = restantes[inicio:inicio + bloco]
+                # cópias seriais no processo principal (ver "Limite" na docstring)
+                for j, indice in enumerate(lote):
+                    entrada[j] = matrizes[indice]
+                pool.map(_processar_imagem, range(len(lote)))
+                for j, indice in enumerate(lote):
+                    saida[indice] = buffer_saida[j]
+    finally:
+        entrada = buffer_saida = None  # views soltas antes do close
+        for shm in (shm_entrada, shm_saida):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    return saida
+
+'''
+Exemplo (erosão 3x3 em 4 processos):
+
+from functools import partial
+from scipy.ndimage import binary_erosion
+
+if __name__ == "__main__":
+    erodidas = executar_por_imagem(partial(binary_erosion, structure=np.ones((3, 3))),
+                                   matrizes_reduzidas == 255, num_processos=4)
+'''
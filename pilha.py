@@ -0,0 +1,201 @@
+import numpy as np
+from mascaras import MascaraBits
+from imagens import carregar_pilha
+
+"""
+
+Pilha de imagens (n, altura, largura) com disciplina de dtype.
+
+Todas as etapas do pipeline trabalham com uma única pilha contígua por
+vez: uint8 (intensidades e máscaras 0/255) ou bool. `PilhaImagens` guarda
+essa pilha e confere cada passagem de uma etapa para a seguinte:
+
+  - listas de matrizes são recusadas (viram uma cópia em `np.array`);
+  - eixos de lote extras, como o (1, 24, h, w) dos zips antigos, são
+    achatados sem cópia para (24, h, w);
+  - dtypes diferentes de uint8/bool (int64 de `np.where`/`np.sum`,
+    float64...) geram erro em vez de passarem adiante;
+  - arrays não contíguos geram erro (a etapa seguinte faria uma cópia).
+
+O histórico registra shape, dtype e memória de cada etapa.
+
+"""
+
+DTYPES_PILHA = (np.dtype(np.uint8), np.dtype(bool))
+
+
+##################################
+# Achatar eixos de lote
+##################################
+def achatar_lote(matrizes):
+    """
+    (..., altura, largura) → (n, altura, largura), sem cópia.
+    Aceita array ou MascaraBits.
+    """
+    if isinstance(matrizes, MascaraBits):
+        bits = matrizes.bits.reshape((-1,) + matrizes.bits.shape[-2:])
+        return MascaraBits(bits, bits.shape[:-1] + (matrizes.shape[-1],))
+    matrizes = np.asarray(matrizes)
+    if matrizes.ndim < 2:
+        raise ValueError(f"Esperado (..., altura, largura), recebido shape {matrizes.shape}")
+    return matrizes.reshape((-1,) + matrizes.shape[-2:])
+
+'''
+(1, 24, 1501, 1001) → (24, 1501, 1001)
+(1501, 1001)        → (1, 1501, 1001)
+'''
+
+##################################
+# Conferir a pilha entregue por uma etapa
+##################################
+def verificar_pilha(matrizes, etapa, dtype=None, shape=None):
+    """
+    Confere que `matrizes` é uma pilha (n, altura, largura) contígua, uint8
+    ou bool, e (se dados) com o dtype e o shape esperados.
+
+    Retorna:
+        A própria pilha (nunca uma cópia).
+    """
+    if isinstance(matrizes, (list, tuple)):
+        raise TypeError(f"{etapa}: recebeu uma lista de matrizes; "
+                        "use um array (n, altura, largura) pré-alocado")
+    if not isinstance(matrizes, np.ndarray):
+        raise TypeError(f"{etapa}: esperado np.ndarray, recebido {type(matrizes).__name__}")
+    if matrizes.ndim != 3:
+        raise ValueError(f"{etapa}: esperado shape (n, altura, largura), recebido {matrizes.shape}")
+    if matrizes.dtype not in DTYPES_PILHA:
+        raise TypeError(f"{etapa}: dtype {matrizes.dtype} (promoção acidental?); "
+                        "as etapas devem manter uint8 ou bool")
+    if dtype is not None and matrizes.dtype != np.dtype(dtype):
+        raise TypeError(f"{etapa}: dtype {matrizes.dtype}, esperado {np.dtype(dtype)}")
+    if shape is not None and matrizes.shape != tuple(shape):
+        raise ValueError(f"{etapa}: shape {matrizes.shape}, esperado {tuple(shape)}")
+    if not matrizes.flags.c_contiguous:
+        raise ValueError(f"{etapa}: pilha não contígua (a etapa seguinte faria uma cópia)")
+    return matrizes
+
+
+##################################
+# Pilha de imagens
+##################################
+class PilhaImagens:
+    """
+    Pilha contígua (n, altura, largura) uint8 ou bool, com o nome da etapa
+    que a produziu e o histórico das etapas anteriores.
+    """
+
+    __slots__ = ("dados", "etapa", "historico")
+
+    def __init__(self, dados, etapa="entrada", historico=()):
+        self.dados = verificar_pilha(dados, etapa)
+        self.etapa = etapa
+        self.historico = list(historico) + [(etapa, self.dados.shape, self.dados.dtype, self.dados.nbytes)]
+
+    @classmethod
+    def alocar(cls, n, altura, largura, dtype=np.uint8, etapa="entrada"):
+        """
+        Pilha vazia pré-alocada (conteúdo indefinido, como `np.empty`).
+        """
+        return cls(np.empty((n, altura, largura), dtype=dtype), etapa)
+
+    @classmethod
+    def de_pasta(cls, pasta, manifesto=None, num_threads=None, usar_cache=False, etapa="imagens"):
+        """
+        Decodifica as imagens da pasta direto numa pilha uint8 pré-alocada
+        (`usar_cache`: ver `carregar_pilha`).
+        """
+        return cls(carregar_pilha(pasta, manifesto, num_threads, usar_cache), etapa)
+
+    @classmethod
+    def de_matrizes(cls, matrizes, etapa="entrada"):
+        """
+        Monta a pilha a partir de um array (eixos de lote extras são achatados)
+        ou de uma lista de matrizes 2D de mesmo shape e dtype (copiadas uma a
+        uma para a pilha pré-alocada, sem o array intermediário de `np.array`).
+        O dtype nunca é convertido.
+        """
+        if isinstance(matrizes, (list, tuple)):
+            if len(matrizes) == 0:
+                raise ValueError(f"{etapa}: nenhuma matriz")
+            primeira = np.asarray(matrizes[0])
+            pilha = cls.alocar(len(matrizes), *primeira.shape, dtype=primeira.dtype, etapa=etapa)
+            for k, matriz in enumerate(matrizes):
+                matriz = np.asarray(matriz)
+                if matriz.shape != primeira.shape or matriz.dtype != primeira.dtype:
+                    raise ValueError(f"{etapa}: matriz {k} com {matriz.shape} {matriz.dtype}, "
+                                     f"esperado {primeira.shape} {primeira.dtype}")
+                pilha.dados[k] = matriz
+            return pilha
+        matrizes = achatar_lote(matrizes)
+        if not matrizes.flags.c_contiguous:
+            matrizes = np.ascontiguousarray(matrizes)  # única cópia, na entrada
+        return cls(matrizes, etapa)
+
+    @property
+    def shape(self):
+        return self.dados.shape
+
+    @property
+    def dtype(self):
+        return self.dados.dtype
+
+    @property
+    def nbytes(self):
+        return self.dados.nbytes
+
+    def __len__(self):
+        return len(self.dados)
+
+    def __getitem__(self, indice):
+        return self.dados[indice]
+
+    def alocar_saida(self, dtype=None, shape=None):
+        """
+        Buffer para etapas com `out=`/`saida=` (mesmo shape e dtype, por padrão).
+        """
+        return np.empty(self.shape if shape is None else shape,
+                        dtype=self.dtype if dtype is None else dtype)
+
+    def seguinte(self, etapa, resultado, dtype=None, mesmo_shape=False):
+        """
+        Confere o resultado de uma etapa e devolve a pilha seguinte.
+
+        Args:
+            etapa (str): nome da etapa (aparece nos erros e no histórico)
+            resultado (array): pilha produzida pela etapa
+            dtype: dtype exigido (None = uint8 ou bool)
+            mesmo_shape (bool): exige o shape da pilha atual; senão, só o
+                número de imagens precisa ser o mesmo
+        """
+        verificar_pilha(resultado, etapa, dtype, self.shape if mesmo_shape else None)
+        if len(resultado) != len(self):
+            raise ValueError(f"{etapa}: {len(resultado)} imagens, esperado {len(self)}")
+        return PilhaImagens(resultado, etapa, self.historico)
+
+    def aplicar(self, etapa, funcao, *args, dtype=None, mesmo_shape=False, **kwargs):
+        """
+        `seguinte(etapa, funcao(self.dados, *args, **kwargs), ...)`.
+        """
+        return self.seguinte(etapa, funcao(self.dados, *args, **kwargs), dtype, mesmo_shape)
+
+    def para_mascara(self):
+        return MascaraBits.de_matriz(self.dados)
+
+    def memoria(self):
+        """
+        Uma linha por etapa com shape, dtype e memória ocupada.
+        """
+        return "\n".join(f"{etapa:<14} {str(shape):<22} {str(dtype):<6} {nbytes / 1e6:9.1f} MB"
+                         for etapa, shape, dtype, nbytes in self.historico)
+
+    def __repr__(self):
+        return f"PilhaImagens(etapa={self.etapa!r}, shape={self.shape}, dtype={self.dtype}, nbytes={self.nbytes})"
+
+'''
+Exemplo:
+suavizadas = PilhaImagens.de_matrizes(carregar_matrizes_zip("matrizes_suavizadas_tcc.zip"), "suavizadas")
+binarizadas, _ = binarizar_por_histograma(suavizadas.dados, 5, saida=suavizadas.alocar_saida())
+binarizadas = suavizadas.seguinte("binarizacao", binarizadas, dtype=np.uint8, mesmo_shape=True)
+reduzidas = binarizadas.aplicar("reducao", reduzir_blocos, 2, dtype=np.uint8)
+print(reduzidas.memoria())
+'''
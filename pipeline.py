@@ -0,0 +1,264 @@
+import time
+import numpy as np
+from scipy.ndimage import label
+from imagens import carregar_manifesto, carregar_pilha
+from filtros import filtro_media_integral, binarizar_por_histograma, reduzir_blocos, preencher_moldura
+from morfologia import erosao, dilatacao, aplicar_padroes_3x3, padrao_de_esqueleto
+from pilha import verificar_pilha
+from cache_etapas import CacheEtapas, hash_manifesto
+from paralelo import executar_por_imagem
+from ladrilhos import processar_em_ladrilhos
+
+"""
+
+Pipeline completo numa única execução, com as pilhas passando de uma
+etapa para a seguinte em memória:
+
+    ingestao → suavizacao → binarizacao → reducao → morfologia → deteccao
+
+Equivale a rodar `1.`, `1.1`, `1.2.1` e a contagem de alvos em sequência,
+sem escrever e reler os zips entre um script e outro. Só as etapas
+listadas em `persistir` são gravadas (no cache de etapas, endereçado por
+entradas + parâmetros).
+
+Como a chave de cada etapa só depende da chave da anterior e dos
+parâmetros, todas as chaves são conhecidas antes de rodar qualquer coisa:
+  - `inicio`/`fim` rodam só uma faixa de etapas (a etapa anterior a
+    `inicio` precisa estar persistida);
+  - com `retomar=True` a execução recomeça da última etapa persistida
+    da faixa (ex.: depois de uma queda no meio da morfologia).
+
+As etapas por imagem (suavização, redução, morfologia) podem rodar em
+vários processos (`num_processos`, ver paralelo.py); o resultado é o
+mesmo da execução serial, então `num_processos` não entra nas chaves.
+
+Com `tamanho_ladrilho`, a suavização e a morfologia (erosão, esqueletos,
+dilatação) rodam por ladrilhos com halo (ver ladrilhos.py): os temporários
+de cada operador (somas acumuladas int32, buffers dos mínimos/máximos
+deslizantes, códigos de vizinhança) ficam do tamanho de um ladrilho, não
+de uma imagem. As pilhas de entrada e saída de cada etapa continuam
+inteiras na memória, salvo as etapas lidas do cache (memmap).
+
+"""
+
+ETAPAS = ("ingestao", "suavizacao", "binarizacao", "reducao", "morfologia", "deteccao")
+
+PARAMETROS_PADRAO = {
+    "filtro_size": 3,
+    "modo_bordas": "constante",
+    "manter_padding": True,
+    "size_padding": 1,
+    "k_desvios": 5,
+    "block_size": 2,
+    "regra_reducao": "media",
+    "kernel_erosao": 1,
+    "kernel_dilatacao": 4,
+    "esqueletos": (),
+}
+
+
+##################################
+# Etapas
+##################################
+def etapa_suavizacao(imagens, filtro_size, modo_bordas, manter_padding, size_padding,
+                     tamanho_ladrilho=None):
+    """
+    Filtro de média com bordas virtuais. Por ladrilhos, o filtro (que
+    preserva o shape) roda com halo filtro_size // 2 e a moldura do padding
+    é escrita à parte; com size_padding diferente de filtro_size // 2 o
+    miolo passa da imagem e a etapa roda sem ladrilhos.
+    """
+    pad = filtro_size // 2
+    if tamanho_ladrilho is None or (manter_padding and size_padding != pad):
+        return filtro_media_integral(imagens, filtro_size, bordas=modo_bordas,
+                                     manter_padding=manter_padding, size_padding=size_padding)
+    parametros = {"filtro_size": filtro_size, "bordas": modo_bordas}
+    if not manter_padding:
+        return processar_em_ladrilhos(filtro_media_integral, imagens, pad, tamanho_ladrilho, **parametros)
+
+    altura, largura = imagens.shape[-2:]
+    suavizadas = np.empty(imagens.shape[:-2] + (altura + 2 * pad, largura + 2 * pad), dtype=np.uint8)
+    processar_em_ladrilhos(filtro_media_integral, imagens, pad, tamanho_ladrilho,
+                           saida=suavizadas[..., pad:pad + altura, pad:pad + largura], **parametros)
+    return preencher_moldura(suavizadas, imagens, pad, modo_bordas)
+
+
+def etapa_binarizacao(suavizadas, k_desvios):
+    """
+    Um único limiar k·σ + μ para a pilha inteira (como em `1.1`), não um por imagem.
+    """
+    return binarizar_por_histograma(suavizadas[None], k_desvios)[0][0]
+
+
+def etapa_reducao(binarizadas, block_size, regra_reducao):
+    return reduzir_blocos(binarizadas, block_size, regra=regra_reducao)
+
+
+def _morfologia(reduzidas, kernel_erosao, kernel_dilatacao, padroes):
+    matrizes = erosao(reduzidas, kernel_erosao)
+    if padroes:
+        matrizes = aplicar_padroes_3x3(matrizes, padroes, modo="sequencial", bordas="zero")
+    return dilatacao(matrizes, kernel_dilatacao)
+
+
+def etapa_morfologia(reduzidas, kernel_erosao, kernel_dilatacao, esqueletos, tamanho_ladrilho=None):
+    """
+    Erosão (rios somem) → filtros de esqueleto opcionais → dilatação (alvos expandem).
+
+    Por ladrilhos, a cadeia inteira roda em cada ladrilho com a soma dos
+    raios: k_erosao // 2 + número de esqueletos + k_dilatacao // 2.
+    """
+    padroes = [padrao_de_esqueleto(np.asarray(e), modo="correlacao") for e in esqueletos]
+    if tamanho_ladrilho is None:
+        return _morfologia(reduzidas, kernel_erosao, kernel_dilatacao, padroes)
+    halo = (np.broadcast_to(kernel_erosao, 2) // 2 + np.broadcast_to(kernel_dilatacao, 2) // 2
+            + len(padroes))
+    return processar_em_ladrilhos(_morfologia, reduzidas, tuple(halo), tamanho_ladrilho,
+                                  kernel_erosao=kernel_erosao, kernel_dilatacao=kernel_dilatacao,
+                                  padroes=padroes)
+
+
+def etapa_deteccao(mascaras):
+    """
+    Número de alvos (componentes 8-conectados) de cada imagem.
+    """
+    estrutura = np.ones((3, 3), dtype=np.uint8)
+    return np.array([label(mascara, structure=estrutura)[1] for mascara in mascaras], dtype=np.int64)
+
+
+# etapas que tratam cada imagem de forma independente (podem ir para processos)
+ETAPAS_POR_IMAGEM = ("suavizacao", "reducao", "morfologia")
+# etapas de vizinhança que aceitam `tamanho_ladrilho`
+ETAPAS_EM_LADRILHOS = ("suavizacao", "morfologia")
+
+FUNCOES_ETAPAS = {
+    "suavizacao": (etapa_suavizacao, ("filtro_size", "modo_bordas", "manter_padding",
+                                      "size_padding")),
+    "binarizacao": (etapa_binarizacao, ("k_desvios",)),
+    "reducao": (etapa_reducao, ("block_size", "regra_reducao")),
+    "morfologia": (etapa_morfologia, ("kernel_erosao", "kernel_dilatacao", "esqueletos")),
+    "deteccao": (etapa_deteccao, ()),
+}
+
+
+##################################
+# Chaves de todas as etapas
+##################################
+def chaves_pipeline(cache, manifesto, parametros):
+    """
+    Chave de cada etapa, encadeada a partir do hash do manifesto.
+    """
+    chaves = {"ingestao": hash_manifesto(manifesto)}
+    for anterior, nome in zip(ETAPAS, ETAPAS[1:]):
+        funcao, nomes_parametros = FUNCOES_ETAPAS[nome]
+        chaves[nome] = cache.chave(nome, funcao, [chaves[anterior]],
+                                   **{p: parametros[p] for p in nomes_parametros})
+    return chaves
+
+
+##################################
+# Execução
+##################################
+def executar_pipeline(pasta_imagens, parametros=None, inicio=None, fim=None, persistir=(),
+                      retomar=True, pasta_cache="cache_etapas", limite_cache=8 * 1024 ** 3,
+                      num_processos=1, tamanho_ladrilho=None, usar_cache_decodificadas=False):
+    """
+    Roda as etapas `inicio`..`fim` em memória.
+
+    Args:
+        pasta_imagens (str): pasta com as imagens
+        parametros (dict ou None): sobrescreve chaves de PARAMETROS_PADRAO
+        inicio, fim (str ou None): primeira e última etapa (None = todas)
+        persistir (iterável): etapas gravadas no cache ao terminar
+        retomar (bool): recomeça da última etapa da faixa já persistida
+        pasta_cache (str): pasta do cache de etapas
+        limite_cache (int): tamanho máximo do cache, em bytes
+        num_processos (int ou None): processos das etapas por imagem
+            (1 = serial; None = os.cpu_count())
+        tamanho_ladrilho (int ou None): lado dos ladrilhos da suavização e da
+            morfologia (None = imagem inteira); não muda o resultado
+        usar_cache_decodificadas (bool): guarda as imagens decodificadas em
+            `.npy` sem compressão (ver imagens.py; sem limite de tamanho)
+
+    Retorna:
+        (resultado da etapa `fim`, dicionário etapa → chave no cache)
+    """
+    parametros = {**PARAMETROS_PADRAO, **(parametros or {})}
+    primeira = ETAPAS.index(inicio) if inicio else 0
+    ultima = ETAPAS.index(fim) if fim else len(ETAPAS) - 1
+    if primeira > ultima:
+        raise ValueError(f"Etapa inicial {inicio!r} vem depois da final {fim!r}")
+    desconhecidas = set(persistir) - set(ETAPAS)
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas em persistir: {sorted(desconhecidas)} (use {ETAPAS})")
+
+    cache = CacheEtapas(pasta_cache, limite_bytes=limite_cache)
+    manifesto = carregar_manifesto(pasta_imagens)
+    chaves = chaves_pipeline(cache, manifesto, parametros)
+
+    # ponto de partida: última etapa persistida (retomar) ou a anterior a `inicio`
+    atual, partida = None, primeira
+    candidatas = range(ultima, primeira - 2, -1) if retomar else [primeira - 1]
+    for j in candidatas:
+        if j < 0:
+            break
+        atual = cache.obter(chaves[ETAPAS[j]])
+        if atual is not None:
+            partida = j + 1
+            print(f"↪️  {ETAPAS[j]}: carregada do cache")
+            break
+    if atual is None and primeira > 0:
+        raise ValueError(f"Para começar em {inicio!r} a etapa {ETAPAS[primeira - 1]!r} "
+                         "precisa estar persistida")
+
+    for nome in ETAPAS[partida:ultima + 1]:
+        tempo_inicio = time.time()
+        if nome == "ingestao":
+            atual = carregar_pilha(pasta_imagens, manifesto, usar_cache=usar_cache_decodificadas)
+        else:
+            funcao, nomes_parametros = FUNCOES_ETAPAS[nome]
+            argumentos = {p: parametros[p] for p in nomes_parametros}
+            if nome in ETAPAS_EM_LADRILHOS:
+                argumentos["tamanho_ladrilho"] = tamanho_ladrilho
+            if nome in ETAPAS_POR_IMAGEM:
+                atual = executar_por_imagem(funcao, atual, num_processos, **argumentos)
+            else:
+                atual = funcao(atual, **argumentos)
+        if nome != "deteccao":
+            verificar_pilha(atual, nome)  # uint8/bool, (n, h, w) e contígua
+        if nome in persistir:
+            cache.guardar(chaves[nome], atual)
+        print(f"✅ {nome}: {atual.shape} {atual.dtype} em {time.time() - tempo_inicio:.2f} s")
+
+    return atual, chaves
+
+'''
+Exemplo: só até a redução, guardando suavizadas e reduzidas;
+depois, a morfologia com outro kernel parte direto das reduzidas.
+
+reduzidas, chaves = executar_pipeline(pasta, fim="reducao", persistir=("suavizacao", "reducao"))
+alvos, chaves = executar_pipeline(pasta, {"kernel_dilatacao": 6}, inicio="morfologia")
+'''
+
+
+##############################################
+# Execução
+##############################################
+if __name__ == "__main__":
+    pasta_imagens = r"C:\\Users\\rafae\\Desktop\\perc-x-conv-rn\\img"  # Caminho da pasta com imagens
+    etapa_inicial = None                 # ➤ None = desde a ingestão
+    etapa_final = None                   # ➤ None = até a detecção
+    etapas_persistidas = ("reducao", "morfologia")
+    num_processos = None                 # ➤ None = um processo por núcleo; 1 = serial
+    tamanho_ladrilho = 512               # ➤ None = cada etapa sobre a imagem inteira
+    usar_cache_decodificadas = True      # ➤ .npy sem compressão por imagem (~6 MB cada, sem limite)
+    parametros = dict(PARAMETROS_PADRAO)
+
+    tempo_inicio = time.time()
+    resultado, chaves = executar_pipeline(pasta_imagens, parametros, etapa_inicial, etapa_final,
+                                          persistir=etapas_persistidas, num_processos=num_processos,
+                                          tamanho_ladrilho=tamanho_ladrilho,
+                                          usar_cache_decodificadas=usar_cache_decodificadas)
+    print(f"⏳ Tempo total de execução: {time.time() - tempo_inicio:.2f} segundos")
+    if resultado.ndim == 1:
+        print(f"🎯 Alvos detectados por imagem: {resultado.tolist()}")
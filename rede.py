@@ -0,0 +1,307 @@
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from janelas import DatasetJanelas, indices_lotes
+
+"""
+
+Motor de treino da rede (perceptron multicamadas com sigmoid) sem alocações
+por passo.
+
+`feedforward` e `backpropagation` dos scripts 2.1 criam arrays novos de
+ativação, delta e gradiente em cada camada a cada chamada. `MotorTreino`
+aloca uma vez, para um tamanho de lote, os buffers float32 de cada camada
+e faz o passo inteiro com `out=` (matmul, sigmoid e atualização dos pesos
+no lugar). Em regime, um passo não aloca nenhum array.
+
+A derivada da sigmoid sai da ativação já calculada: σ'(z) = a·(1 − a),
+com a = σ(z). (`derivada_sigmoid(ativacao)` dos scripts aplicava a sigmoid
+de novo sobre a ativação.) `treinar_mini_lotes` percorre as janelas em
+mini-lotes embaralhados e chama o motor a cada lote.
+
+`mapa_probabilidades` faz a inferência da rede treinada sobre a imagem
+inteira (ou um ladrilho) sem montar janelas: a primeira camada numa janela
+lado x lado é uma convolução, calculada como `lado` matmuls deslocados (um
+por linha da janela) acumulados sobre um bloco de linhas da imagem; as
+camadas seguintes são matmuls sobre o mapa de ativações do bloco.
+
+"""
+
+
+##################################
+# Sigmoid no lugar
+##################################
+def sigmoid_no_lugar(z):
+    """
+    z ← 1 / (1 + exp(-z)), sem temporários.
+    """
+    np.negative(z, out=z)
+    np.exp(z, out=z)
+    np.add(z, 1, out=z)
+    np.reciprocal(z, out=z)
+    return z
+
+
+##################################
+# Motor de treino
+##################################
+class MotorTreino:
+    """
+    Buffers por camada para lotes de até `tamanho_lote` amostras.
+
+    Args:
+        pesos (list): matrizes (entrada, saída) de cada camada; convertidas
+            para float32 contíguo e atualizadas no lugar
+        tamanho_lote (int): maior lote aceito por `passo`
+        bias (float): somado à pré-ativação de todas as camadas (fixo, como nos scripts)
+        taxa_aprendizado (float): passo do gradiente (soma sobre o lote, como em `treinar`)
+    """
+
+    def __init__(self, pesos, tamanho_lote, bias=1.0, taxa_aprendizado=0.1):
+        self.pesos = [np.ascontiguousarray(w, dtype=np.float32) for w in pesos]
+        self.tamanho_lote = tamanho_lote
+        self.bias = np.float32(bias)
+        self.taxa_aprendizado = np.float32(taxa_aprendizado)
+
+        saidas = [w.shape[1] for w in self.pesos]
+        self.ativacoes = [np.empty((tamanho_lote, s), dtype=np.float32) for s in saidas]
+        self.deltas = [np.empty((tamanho_lote, s), dtype=np.float32) for s in saidas]
+        self.derivadas = [np.empty((tamanho_lote, s), dtype=np.float32) for s in saidas]
+        self.gradientes = [np.empty_like(w) for w in self.pesos]
+        self.acertos = np.empty((tamanho_lote, saidas[-1]), dtype=bool)
+        self._completos = self._views(tamanho_lote)  # views prontas para o lote cheio
+
+    def _views(self, n):
+        return ([a[:n] for a in self.ativacoes], [d[:n] for d in self.deltas],
+                [d[:n] for d in self.derivadas], self.acertos[:n])
+
+    def feedforward(self, X_lote, ativacoes):
+        entrada = X_lote
+        for w, a in zip(self.pesos, ativacoes):
+            np.matmul(entrada, w, out=a)
+            np.add(a, self.bias, out=a)
+            sigmoid_no_lugar(a)
+            entrada = a
+        return ativacoes[-1]
+
+    def passo(self, X_lote, y_lote):
+        """
+        Feedforward + backpropagation + atualização dos pesos para um lote.
+
+        Args:
+            X_lote (array float32): (n, entradas), n <= tamanho_lote
+            y_lote (array): (n, saídas) com 0/1
+
+        Retorna:
+            Número de amostras do lote com predição (saída > 0.5) correta,
+            calculado com os pesos de antes da atualização.
+        """
+        n = len(X_lote)
+        if n > self.tamanho_lote:
+            raise ValueError(f"Lote com {n} amostras, o motor foi criado para {self.tamanho_lote}")
+        ativacoes, deltas, derivadas, acertos = (self._completos if n == self.tamanho_lote
+                                                 else self._views(n))
+
+        saida = self.feedforward(X_lote, ativacoes)
+
+        np.greater(saida, 0.5, out=acertos)
+        np.equal(acertos, y_lote, out=acertos)
+        num_acertos = int(np.count_nonzero(acertos))
+
+        # delta da saída: (a - y) · a(1 - a)
+        np.subtract(saida, y_lote, out=deltas[-1])
+        for i in reversed(range(len(self.pesos))):
+            a = ativacoes[i]
+            np.subtract(1, a, out=derivadas[i])
+            np.multiply(derivadas[i], a, out=derivadas[i])
+            np.multiply(deltas[i], derivadas[i], out=deltas[i])
+
+            entrada = X_lote if i == 0 else ativacoes[i - 1]
+            np.matmul(entrada.T, deltas[i], out=self.gradientes[i])
+            if i > 0:
+                np.matmul(deltas[i], self.pesos[i].T, out=deltas[i - 1])
+
+        for w, g in zip(self.pesos, self.gradientes):
+            np.multiply(g, self.taxa_aprendizado, out=g)
+            np.subtract(w, g, out=w)
+
+        return num_acertos
+
+'''
+Exemplo:
+motor = MotorTreino(pesos, tamanho_lote=4096, bias=1.0, taxa_aprendizado=0.1)
+for indices, X_lote in dataset.lotes(4096, embaralhar=True):
+    acertos = motor.passo(X_lote, y[indices])
+pesos = motor.pesos
+'''
+
+
+##################################
+# Treino em mini-lotes (streaming)
+##################################
+def lote_entradas(X, indices, buffer=None, bruto=None):
+    """
+    Entradas float32 das amostras `indices`: DatasetJanelas copia só as
+    janelas pedidas (no `buffer`); matriz de projeto (memmap) é lida por linhas.
+
+    Com `buffer`, a matriz de projeto não aloca nada: as linhas vão para
+    `bruto` (lote no dtype de X, uint8) com `np.take(..., out=)` e são
+    convertidas para float32 dentro de `buffer`. `mode="clip"` porque
+    com o padrão ("raise") o NumPy copia `out` num temporário.
+    """
+    if isinstance(X, DatasetJanelas):
+        return X.lote(indices, out=buffer)
+    if buffer is None:
+        return np.asarray(X[indices], dtype=np.float32)
+    n = len(indices)
+    if bruto is None:
+        bruto = np.empty((n, X.shape[1]), dtype=X.dtype)
+    np.take(X, indices, axis=0, out=bruto[:n], mode="clip")
+    np.copyto(buffer[:n], bruto[:n])
+    return buffer[:n]
+
+
+def treinar_mini_lotes(X, y, pesos, epocas, tamanho_lote=4096, bias=1.0, taxa_aprendizado=0.1,
+                       semente=None):
+    """
+    Gradiente descendente aplicado a cada mini-lote embaralhado.
+
+    O passo é feito pelo MotorTreino: buffers float32 por camada alocados
+    uma vez para `tamanho_lote` e pesos atualizados no lugar. A memória
+    usada é proporcional a `tamanho_lote`, não ao número de janelas.
+
+    Args:
+        X (DatasetJanelas ou array/memmap (N, janela²)): entradas
+        y (array (N, 1)): rótulos
+        pesos (list): pesos iniciais (o motor trabalha numa cópia float32)
+        epocas (int): número de épocas
+        tamanho_lote (int): janelas por mini-lote
+        bias (float): bias de todas as camadas
+        taxa_aprendizado (float): passo do gradiente
+        semente (int ou None): semente da ordem de cada época (semente + época)
+
+    Retorna:
+        Pesos treinados (float32).
+    """
+    total = len(X)
+    num_entradas = X.num_entradas if isinstance(X, DatasetJanelas) else X.shape[1]
+    buffer = np.empty((tamanho_lote, num_entradas), dtype=np.float32)
+    bruto = None if isinstance(X, DatasetJanelas) else np.empty((tamanho_lote, num_entradas), dtype=X.dtype)
+    y_lote = np.empty((tamanho_lote,) + y.shape[1:], dtype=y.dtype)
+    motor = MotorTreino(pesos, tamanho_lote, bias, taxa_aprendizado)
+    for epoca in range(epocas):
+        tempo_inicio = time.time()
+        acertos = 0
+        semente_epoca = None if semente is None else semente + epoca
+        for indices in indices_lotes(total, tamanho_lote, embaralhar=True, semente=semente_epoca):
+            X_lote = lote_entradas(X, indices, buffer, bruto)
+            rotulos = np.take(y, indices, axis=0, out=y_lote[:len(indices)], mode="clip")
+            acertos += motor.passo(X_lote, rotulos)
+
+        duracao = time.time() - tempo_inicio
+        print(f"Época {epoca+1}/{epocas} - Acurácia: {acertos / total:.4f} - "
+              f"{total / duracao:,.0f} amostras/s ({duracao:.1f} s)")
+    return motor.pesos
+
+
+##################################
+# Inferência convolucional (imagem inteira)
+##################################
+def mapa_probabilidades(matriz, pesos, tamanho_janela, bias=1.0, linhas_por_bloco=16, out=None):
+    """
+    Saída da rede para todas as janelas de `matriz`, sem montar as janelas.
+
+    z[i, j] = Σ_di Σ_dj matriz[i+di, j+dj] · W0[di·lado + dj] é uma
+    convolução: para cada linha di da janela, a view deslocada
+    (linhas, colunas, lado) de `matriz` vezes o bloco W0[di] (lado, ocultos)
+    é acumulada em z. A imagem é percorrida em blocos de `linhas_por_bloco`
+    linhas, com os buffers de cada camada alocados uma vez.
+
+    Args:
+        matriz (array 2D): imagem (ou ladrilho), qualquer dtype numérico
+        pesos (list): pesos treinados; a primeira camada tem lado² entradas
+            e a última uma saída
+        tamanho_janela (int): como no treino (lado = 2 * (tamanho_janela // 2) + 1)
+        bias (float): bias usado no treino
+        linhas_por_bloco (int): linhas de saída por bloco (memória ~ linhas × largura × ocultos)
+        out (array ou None): destino (altura - lado + 1, largura - lado + 1)
+
+    Retorna:
+        Mapa de probabilidades; a posição (i, j) é a janela centrada em
+        (i + lado // 2, j + lado // 2). float32 (float64 se os pesos forem float64).
+    """
+    pad = tamanho_janela // 2
+    lado = 2 * pad + 1
+    if pesos[0].shape[0] != lado * lado:
+        raise ValueError(f"A primeira camada tem {pesos[0].shape[0]} entradas, "
+                         f"a janela {lado}x{lado} tem {lado * lado}")
+    if pesos[-1].shape[1] != 1:
+        raise ValueError(f"A última camada tem {pesos[-1].shape[1]} saídas, esperado 1")
+
+    dtype = np.result_type(np.float32, *pesos)
+    pesos = [np.ascontiguousarray(w, dtype=dtype) for w in pesos]
+    primeira = pesos[0].reshape(lado, lado, -1)  # [di] → (lado, ocultos)
+    bias = dtype.type(bias)
+
+    altura, largura = matriz.shape
+    linhas, colunas = max(altura - 2 * pad, 0), max(largura - 2 * pad, 0)
+    if out is None:
+        out = np.empty((linhas, colunas), dtype=dtype)
+    if linhas == 0 or colunas == 0:
+        return out
+
+    bloco = min(linhas_por_bloco, linhas)
+    entrada = np.empty((bloco + 2 * pad, largura), dtype=dtype)
+    acumulador = np.empty((bloco, colunas, primeira.shape[2]), dtype=dtype)
+    parcial = np.empty_like(acumulador)
+    camadas = [np.empty((bloco * colunas, w.shape[1]), dtype=dtype) for w in pesos[1:]]
+
+    for i0 in range(0, linhas, bloco):
+        n = min(bloco, linhas - i0)
+        x = entrada[:n + 2 * pad]
+        np.copyto(x, matriz[i0:i0 + n + 2 * pad], casting="unsafe")
+
+        # primeira camada: um matmul por linha da janela, acumulado
+        z = acumulador[:n]
+        for di in range(lado):
+            deslocada = sliding_window_view(x[di:di + n], lado, axis=1)  # (n, colunas, lado)
+            destino = z if di == 0 else parcial[:n]
+            np.matmul(deslocada, primeira[di], out=destino)
+            if di:
+                np.add(z, destino, out=z)
+
+        a = z.reshape(n * colunas, -1)
+        np.add(a, bias, out=a)
+        sigmoid_no_lugar(a)
+        for w, buffer in zip(pesos[1:], camadas):
+            b = buffer[:n * colunas]
+            np.matmul(a, w, out=b)
+            np.add(b, bias, out=b)
+            sigmoid_no_lugar(b)
+            a = b
+        out[i0:i0 + n] = a.reshape(n, colunas)
+
+    return out
+
+
+def mapa_alvos(matriz, pesos, tamanho_janela, bias=1.0, linhas_por_bloco=16):
+    """
+    Mapa binário uint8 com o shape de `matriz`: 1 onde a saída da rede > 0.5.
+
+    As `tamanho_janela // 2` linhas/colunas da borda ficam 0, como no laço
+    por pixel de `contar_alvos`. Preserva o shape, então pode rodar por
+    ladrilhos com halo = tamanho_janela // 2.
+    """
+    pad = tamanho_janela // 2
+    mapa = np.zeros(matriz.shape, dtype=np.uint8)
+    probabilidades = mapa_probabilidades(matriz, pesos, tamanho_janela, bias, linhas_por_bloco)
+    np.greater(probabilidades, 0.5, out=mapa[pad:pad + probabilidades.shape[0],
+                                            pad:pad + probabilidades.shape[1]].view(bool))
+    return mapa
+
+'''
+Exemplo:
+probabilidades = mapa_probabilidades(imagem, pesos, tamanho_janela=3, bias=1.0)  # (h-2, w-2)
+mapa = processar_em_ladrilhos(mapa_alvos, pilha, halo=3 // 2, pesos=pesos,
+                              tamanho_janela=3, bias=1.0)
+'''
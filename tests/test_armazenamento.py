@@ -0,0 +1,165 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from armazenamento import (adicionar_imagem_zip, carregar_mascaras_zip, carregar_matrizes_zip, ler_imagens_zip,
+                           salvar_imagens_zip, salvar_mascaras_zip, salvar_npy_zip)
+from mascaras import MascaraBits
+
+
+def salvar_compactar(nome_zip, nome_npy, matrizes):
+    """Caminho antigo dos scripts: np.save no disco e depois zip com ZIP_DEFLATED."""
+    with zipfile.ZipFile(nome_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
+        buffer = io.BytesIO()
+        np.save(buffer, np.array(matrizes))
+        zipf.writestr(nome_npy, buffer.getvalue())
+
+
+def ler_npy(nome_zip):
+    with zipfile.ZipFile(nome_zip) as zipf:
+        (nome,) = zipf.namelist()
+        return nome, np.load(io.BytesIO(zipf.read(nome)))
+
+
+@pytest.mark.parametrize("comprimir", [True, False])
+@pytest.mark.parametrize("como_lista", [True, False])
+def test_salvar_npy_zip_igual_np_save(tmp_path, comprimir, como_lista):
+    matrizes = np.random.default_rng(0).integers(0, 256, (1, 3, 7, 5), dtype=np.uint8)
+    salvar_compactar(tmp_path / "antigo.zip", "matrizes.npy", matrizes)
+    nome = str(tmp_path / "matrizes.zip")
+    shape = salvar_npy_zip(nome, list(matrizes[0]) if como_lista else matrizes, comprimir=comprimir)
+
+    esperado = matrizes[0] if como_lista else matrizes
+    assert shape == esperado.shape
+    nome_npy, lida = ler_npy(nome)
+    assert nome_npy == "matrizes.npy"
+    np.testing.assert_array_equal(lida, esperado)
+    if not como_lista:
+        np.testing.assert_array_equal(lida, ler_npy(tmp_path / "antigo.zip")[1])
+
+
+def test_salvar_npy_zip_fortran_e_vazia(tmp_path):
+    fortran = np.asfortranarray(np.arange(60, dtype=np.int16).reshape(3, 4, 5))
+    salvar_npy_zip(str(tmp_path / "f.zip"), fortran)
+    np.testing.assert_array_equal(ler_npy(tmp_path / "f.zip")[1], fortran)
+    assert salvar_npy_zip(str(tmp_path / "v.zip"), []) == (0,)
+    assert ler_npy(tmp_path / "v.zip")[1].shape == (0,)
+
+
+def carregar_concatenando(zip_path):
+    """Carregador antigo copiado nos scripts: BytesIO por entrada + np.concatenate."""
+    matrizes = []
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for nome in [n for n in zip_ref.namelist() if n.endswith(".npy")]:
+            with zip_ref.open(nome) as arquivo:
+                matrizes.append(np.load(io.BytesIO(arquivo.read())))
+    return np.concatenate(matrizes, axis=0)
+
+
+@pytest.fixture(params=["varias", "fortran", "armazenada"])
+def zip_npy(request, tmp_path):
+    rng = np.random.default_rng(5)
+    nome = str(tmp_path / "matrizes.zip")
+    if request.param == "armazenada":
+        salvar_npy_zip(nome, rng.integers(0, 256, (1, 4, 6, 5), dtype=np.uint8), comprimir=False)
+        return nome, request.param
+    partes = [rng.integers(0, 256, (n, 3, 6, 5), dtype=np.uint8) for n in (1, 2)]
+    if request.param == "fortran":
+        partes = [np.asfortranarray(p) for p in partes]
+    with zipfile.ZipFile(nome, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for k, parte in enumerate(partes):
+            buffer = io.BytesIO()
+            np.save(buffer, parte)
+            zipf.writestr(f"parte_{k}.npy", buffer.getvalue())
+    return nome, request.param
+
+
+def test_carregar_matrizes_zip_igual_concatenate(zip_npy):
+    zip_npy, tipo = zip_npy
+    carregadas = carregar_matrizes_zip(zip_npy)
+    np.testing.assert_array_equal(carregadas, carregar_concatenando(zip_npy))
+    assert isinstance(carregadas, np.memmap) == (tipo == "armazenada")
+
+
+def test_carregar_matrizes_zip_por_indices(zip_npy):
+    zip_npy, tipo = zip_npy
+    todas = carregar_concatenando(zip_npy)
+    planas = todas.reshape((-1,) + todas.shape[-2:])
+    indices = [3, 0, 3]
+    if tipo == "fortran":
+        with pytest.raises(ValueError, match="Fortran"):
+            carregar_matrizes_zip(zip_npy, indices=indices)
+        return
+    np.testing.assert_array_equal(carregar_matrizes_zip(zip_npy, indices=indices), planas[indices])
+    with pytest.raises(IndexError):
+        carregar_matrizes_zip(zip_npy, indices=[len(planas)])
+
+
+def test_adicionar_imagem_igual_salvar_de_uma_vez(tmp_path):
+    rng = np.random.default_rng(0)
+    pilha = rng.integers(0, 256, (3, 6, 5), dtype=np.uint8)
+    nome = str(tmp_path / "imagens.zip")
+    for k, imagem in enumerate(pilha):
+        assert adicionar_imagem_zip(nome, imagem) == k
+    np.testing.assert_array_equal(ler_imagens_zip(nome), pilha)
+
+
+def test_adicionar_imagem_com_lote_recusado(tmp_path):
+    rng = np.random.default_rng(1)
+    pilha = rng.integers(0, 256, (2, 3, 6, 5), dtype=np.uint8)
+    nome = str(tmp_path / "lote.zip")
+    salvar_imagens_zip(nome, pilha)
+    with pytest.raises(ValueError, match="lote"):
+        adicionar_imagem_zip(nome, pilha[0, 0])
+    np.testing.assert_array_equal(ler_imagens_zip(nome), pilha)
+
+
+def test_adicionar_imagem_incompativel(tmp_path):
+    nome = str(tmp_path / "imagens.zip")
+    adicionar_imagem_zip(nome, np.zeros((6, 5), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        adicionar_imagem_zip(nome, np.zeros((5, 6), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        adicionar_imagem_zip(nome, np.zeros((6, 5), dtype=np.float32))
+    assert ler_imagens_zip(nome).shape == (1, 6, 5)
+
+
+def test_adicionar_mascara_compacta_antes_de_gravar(tmp_path):
+    # largura 13 e 12 ocupam os mesmos 2 bytes: só a largura lógica as distingue
+    matrizes = np.where(np.random.default_rng(3).random((4, 6, 13)) < 0.5, 255, 0).astype(np.uint8)
+    nome = str(tmp_path / "mascaras.zip")
+    salvar_mascaras_zip(nome, matrizes[:2])
+    assert adicionar_imagem_zip(nome, matrizes[2]) == 2
+    assert adicionar_imagem_zip(nome, MascaraBits.de_matriz(matrizes[3])) == 3
+    with pytest.raises(ValueError):
+        adicionar_imagem_zip(nome, matrizes[0, :, :12])
+    with pytest.raises(ValueError):
+        adicionar_imagem_zip(nome, MascaraBits.de_matriz(matrizes[0]).bits)
+    np.testing.assert_array_equal(ler_imagens_zip(nome), matrizes)
+    np.testing.assert_array_equal(carregar_mascaras_zip(nome).para_uint8(), matrizes)
+
+    nova = str(tmp_path / "nova.zip")
+    adicionar_imagem_zip(nova, MascaraBits.de_matriz(matrizes[0]))
+    adicionar_imagem_zip(nova, matrizes[1])
+    np.testing.assert_array_equal(ler_imagens_zip(nova), matrizes[:2])
+
+    imagens = str(tmp_path / "imagens.zip")
+    adicionar_imagem_zip(imagens, matrizes[0])
+    with pytest.raises(ValueError, match="compactadas"):
+        adicionar_imagem_zip(imagens, MascaraBits.de_matriz(matrizes[1]))
+
+
+def test_salvar_mascaras_zip_ida_e_volta(tmp_path):
+    matrizes = np.where(np.random.default_rng(9).random((4, 6, 13)) < 0.5, 255, 0).astype(np.uint8)
+    nome = str(tmp_path / "mascaras.zip")
+    assert salvar_mascaras_zip(nome, matrizes) == matrizes.shape
+    np.testing.assert_array_equal(carregar_matrizes_zip(nome), matrizes)
+    np.testing.assert_array_equal(carregar_matrizes_zip(nome, indices=[2]), matrizes[[2]])
+    assert carregar_mascaras_zip(nome) == MascaraBits.de_matriz(matrizes)
+
+    # artefato antigo, sem compactação: compactado na leitura
+    antigo = str(tmp_path / "antigo.zip")
+    salvar_npy_zip(antigo, matrizes)
+    assert carregar_mascaras_zip(antigo) == MascaraBits.de_matriz(matrizes)
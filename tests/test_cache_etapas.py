@@ -0,0 +1,102 @@
+import types
+
+import numpy as np
+import pytest
+
+from cache_etapas import CacheEtapas, chave_etapa, identidade_funcao
+
+FONTE = '''
+import numpy as np
+
+def auxiliar(x):
+    return x + 1
+
+def etapa(x, k=2):
+    return auxiliar(x) * k
+'''
+
+
+def modulo(nome, fonte, caminho):
+    m = types.ModuleType(nome)
+    exec(compile(fonte, str(caminho), "exec"), m.__dict__)
+    return m
+
+
+def test_mesma_chave_como_script_ou_importado(tmp_path):
+    caminho = tmp_path / "etapas.py"
+    importado = modulo("etapas", FONTE, caminho)
+    script = modulo("__main__", FONTE, caminho)
+    assert identidade_funcao(importado.etapa) == identidade_funcao(script.etapa)
+    assert (chave_etapa("e", importado.etapa, ["x"], {"k": 2})
+            == chave_etapa("e", script.etapa, ["x"], {"k": 2}))
+
+
+def test_editar_etapa_ou_funcao_chamada_muda_a_chave(tmp_path):
+    caminho = tmp_path / "etapas.py"
+    original = identidade_funcao(modulo("etapas", FONTE, caminho).etapa)
+    editada = FONTE.replace("* k", "* k + 0")
+    auxiliar_editada = FONTE.replace("x + 1", "x + 2")
+    padrao_editado = FONTE.replace("k=2", "k=3")
+    for fonte in (editada, auxiliar_editada, padrao_editado):
+        assert identidade_funcao(modulo("etapas", fonte, caminho).etapa) != original
+
+
+def test_versao_cache_substitui_o_hash(tmp_path):
+    m = modulo("etapas", FONTE, tmp_path / "etapas.py")
+    m.etapa.versao_cache = "2"
+    assert identidade_funcao(m.etapa) == "etapa@2"
+
+
+def test_executar_reaproveita_resultado(tmp_path):
+    chamadas = []
+
+    def dobrar(x, fator):
+        chamadas.append(1)
+        return x * fator
+
+    cache = CacheEtapas(str(tmp_path / "cache"))
+    x = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    a, chave_a = cache.executar("dobro", dobrar, [x], 2)
+    b, chave_b = cache.executar("dobro", dobrar, [x], 2)
+    c, chave_c = cache.executar("dobro", dobrar, [x], 3)
+    assert len(chamadas) == 2 and chave_a == chave_b != chave_c
+    np.testing.assert_array_equal(b, x * 2)
+
+
+def test_limitar_nao_apaga_memmap_em_uso(tmp_path):
+    cache = CacheEtapas(str(tmp_path / "cache"), limite_bytes=1)
+    cache.guardar("a", np.zeros(1000, dtype=np.uint8))
+    aberto = cache.obter("a")
+    fatia = aberto[10:20]
+    del aberto
+    cache.guardar("b", np.ones(1000, dtype=np.uint8))
+    assert cache.obter("a") is not None  # ainda referenciado pela fatia
+    del fatia
+    cache.guardar("c", np.ones(1000, dtype=np.uint8))
+    assert cache.obter("a") is None and cache.obter("b") is None
+
+
+def test_limitar_ignora_falha_ao_remover(tmp_path, monkeypatch):
+    cache = CacheEtapas(str(tmp_path / "cache"), limite_bytes=1, mmap=False)
+    cache.guardar("a", np.zeros(1000, dtype=np.uint8))
+
+    def remover(caminho):
+        raise PermissionError(caminho)
+
+    monkeypatch.setattr("cache_etapas.os.remove", remover)
+    cache.guardar("b", np.zeros(1000, dtype=np.uint8))
+    monkeypatch.undo()
+    assert cache.obter("a") is not None and cache.obter("b") is not None
+
+
+def test_dicionario_de_arrays(tmp_path):
+    cache = CacheEtapas(str(tmp_path / "cache"))
+    resultado = {"binarizadas": np.full((2, 3), 255, dtype=np.uint8), "limiares": np.array([1.5])}
+    cache.guardar("d", resultado)
+    lido = cache.obter("d")
+    assert sorted(lido) == ["binarizadas", "limiares"]
+    for nome, valor in resultado.items():
+        np.testing.assert_array_equal(lido[nome], valor)
+        assert lido[nome].dtype == valor.dtype
+    with pytest.raises(TypeError):
+        cache.guardar("e", {"x": [1, 2]})
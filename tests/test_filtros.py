@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from filtros import binarizar_por_histograma, estatisticas_histograma, filtro_media_integral, reduzir_blocos
+
+MODOS_NP_PAD = {"constante": "constant", "refletir": "symmetric", "repetir": "edge"}
+
+
+@pytest.fixture
+def pilha():
+    return np.random.default_rng(1).integers(0, 256, (2, 9, 7), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("filtro_size", [1, 3, 5])
+@pytest.mark.parametrize("size_padding", [0, 1, 2, 4])
+@pytest.mark.parametrize("bordas", sorted(MODOS_NP_PAD))
+def test_manter_padding_igual_zero_padding_mais_filtro(pilha, filtro_size, size_padding, bordas):
+    # referência: o caminho antigo, np.pad seguido do filtro que deixa a moldura intacta
+    larguras = ((0, 0), (size_padding, size_padding), (size_padding, size_padding))
+    esperado = filtro_media_integral(np.pad(pilha, larguras, mode=MODOS_NP_PAD[bordas]), filtro_size)
+    resultado = filtro_media_integral(pilha, filtro_size, bordas=bordas,
+                                      manter_padding=True, size_padding=size_padding)
+    np.testing.assert_array_equal(resultado, esperado)
+
+
+def filtro_media_por_pixel(matrizes, filtro_size):
+    """Laço por pixel original de filtro_media (bordas intactas, média truncada)."""
+    pad = filtro_size // 2
+    suavizadas = []
+    for matriz in matrizes:
+        nova_matriz = np.copy(matriz)
+        for i in range(pad, matriz.shape[0] - pad):
+            for j in range(pad, matriz.shape[1] - pad):
+                vizinhanca = matriz[i - pad:i + pad + 1, j - pad:j + pad + 1]
+                nova_matriz[i, j] = int(np.sum(vizinhanca) / (filtro_size ** 2))
+        suavizadas.append(nova_matriz)
+    return np.array(suavizadas)
+
+
+@pytest.mark.parametrize("filtro_size", [1, 3, 5, 7])
+def test_sem_bordas_igual_laco_por_pixel(pilha, filtro_size):
+    np.testing.assert_array_equal(filtro_media_integral(pilha, filtro_size),
+                                  filtro_media_por_pixel(pilha, filtro_size))
+
+
+def test_sem_padding_igual_scipy(pilha):
+    from scipy.ndimage import correlate
+    soma = correlate(pilha.astype(np.int32), np.ones((1, 3, 3), dtype=np.int32), mode="nearest")
+    resultado = filtro_media_integral(pilha, 3, bordas="repetir")
+    np.testing.assert_array_equal(resultado, (soma // 9).astype(np.uint8))
+
+
+@pytest.mark.parametrize("filtro_size", [2, 4])
+def test_tamanho_par_rejeitado(pilha, filtro_size):
+    with pytest.raises(ValueError):
+        filtro_media_integral(pilha, filtro_size, bordas="constante")
+
+
+@pytest.mark.parametrize("k", [0, 0.5, 2])
+def test_binarizar_por_histograma_igual_media_desvio(pilha, k):
+    binarizadas, estatisticas = binarizar_por_histograma(pilha[None], k)
+    limiar = k * np.std(pilha) + np.mean(pilha)
+    np.testing.assert_allclose(estatisticas["limiares"], [limiar])
+    np.testing.assert_array_equal(binarizadas[0], np.where(pilha >= limiar, 255, 0))
+
+
+def test_histograma_vazio_sem_nan():
+    vazia = np.zeros((2, 0, 5), dtype=np.uint8)
+    with np.errstate(all="raise"):
+        binarizadas, estatisticas = binarizar_por_histograma(vazia, 3)
+        somente = estatisticas_histograma(vazia, 3)
+    assert binarizadas.shape == vazia.shape
+    for chave in ("medias", "desvios", "limiares"):
+        np.testing.assert_array_equal(estatisticas[chave], 0)
+        np.testing.assert_array_equal(somente[chave], 0)
+
+
+def reduzir_com_mascara_laco(binary_images, block_size):
+    """Quatro laços originais de reduzir_com_mascara (1.1)."""
+    n_batches, n_imagens, h, w = binary_images.shape
+    reduced = np.zeros((n_batches, n_imagens, h // block_size, w // block_size), dtype=np.uint8)
+    for b in range(n_batches):
+        for idx in range(n_imagens):
+            for i in range(h // block_size):
+                for j in range(w // block_size):
+                    block = binary_images[b, idx, i * block_size:(i + 1) * block_size,
+                                          j * block_size:(j + 1) * block_size]
+                    reduced[b, idx, i, j] = 255 if np.mean(block) > ((255 + 255) / 4) else 0
+    return reduced
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 4])
+@pytest.mark.parametrize("binaria", [True, False])
+def test_reduzir_blocos_igual_laco(block_size, binaria):
+    rng = np.random.default_rng(block_size)
+    pilha = rng.integers(0, 256, (2, 3, 11, 9), dtype=np.uint8)
+    if binaria:
+        pilha = np.where(pilha > 127, 255, 0).astype(np.uint8)
+    np.testing.assert_array_equal(reduzir_blocos(pilha, block_size),
+                                  reduzir_com_mascara_laco(pilha, block_size))
+
+
+@pytest.mark.parametrize("regra, referencia", [
+    ("maioria", lambda b: 255 * (2 * np.count_nonzero(b) > b.size)),
+    ("qualquer", lambda b: 255 * bool(np.any(b))),
+    ("todos", lambda b: 255 * bool(np.all(b))),
+    ("maximo", np.max),
+])
+def test_reduzir_blocos_regras_com_preencher(regra, referencia):
+    pilha = np.random.default_rng(3).integers(0, 3, (2, 7, 5), dtype=np.uint8) * 100
+    resultado = reduzir_blocos(pilha, 3, regra=regra, bordas="preencher")
+    assert resultado.shape == (2, 3, 2)
+    completa = np.pad(pilha, ((0, 0), (0, 2), (0, 1)))
+    for n, i, j in np.ndindex(resultado.shape):
+        assert resultado[n, i, j] == referencia(completa[n, 3 * i:3 * i + 3, 3 * j:3 * j + 3])
@@ -0,0 +1,215 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import imagens
+from imagens import (VERSAO_MANIFESTO, caminho_manifesto, carregar_imagem_decodificada, carregar_manifesto,
+                     carregar_pilha, pasta_decodificadas)
+
+
+def salvar(pasta, nome, matriz, modo="L"):
+    Image.fromarray(matriz).convert(modo).save(pasta / nome)
+
+
+@pytest.fixture
+def pasta_com_imagens(tmp_path):
+    pasta = tmp_path / "img"
+    pasta.mkdir()
+    rng = np.random.default_rng(1)
+    for nome in ("a.png", "b.png", "c.png"):
+        salvar(pasta, nome, rng.integers(0, 256, (7, 5), dtype=np.uint8))
+    return pasta
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Nomes dos arquivos cujo conteúdo foi lido para calcular o hash."""
+    lidos = []
+    hash_original = imagens.hash_arquivo
+
+    def contar(caminho, *args, **kwargs):
+        lidos.append(os.path.basename(caminho))
+        return hash_original(caminho, *args, **kwargs)
+
+    monkeypatch.setattr(imagens, "hash_arquivo", contar)
+    return lidos
+
+
+def envelhecer(caminho):
+    # mtime antigo: uma regravação posterior sempre muda o mtime
+    os.utime(caminho, ns=(10 ** 9, 10 ** 9))
+    return os.stat(caminho).st_mtime_ns
+
+
+@pytest.mark.parametrize("usar_cache", [True, False])
+def test_carregar_pilha_igual_pil(tmp_path, usar_cache):
+    pasta = tmp_path / "img"
+    pasta.mkdir()
+    rng = np.random.default_rng(0)
+    matrizes = rng.integers(0, 256, (3, 7, 5), dtype=np.uint8)
+    for k, matriz in enumerate(matrizes):
+        salvar(pasta, f"{k}.png", matriz)
+    pilha = carregar_pilha(str(pasta), num_threads=2, usar_cache=usar_cache)
+    ordem = [int(e["nome"].split(".")[0]) for e in carregar_manifesto(str(pasta))]
+    np.testing.assert_array_equal(pilha, matrizes[ordem])
+
+
+def test_carregar_pilha_sem_cache_por_padrao(pasta_com_imagens):
+    pasta = str(pasta_com_imagens)
+    carregar_pilha(pasta)
+    assert not os.path.exists(pasta_decodificadas(pasta))
+    carregar_pilha(pasta, usar_cache=True)
+    assert len(os.listdir(pasta_decodificadas(pasta))) == 3
+
+
+def test_pasta_vazia(tmp_path):
+    pasta = tmp_path / "img"
+    pasta.mkdir()
+    with pytest.raises(ValueError, match="Nenhuma imagem"):
+        carregar_pilha(str(pasta))
+
+
+def test_imagem_rgb(tmp_path):
+    pasta = tmp_path / "img"
+    pasta.mkdir()
+    salvar(pasta, "cinza.png", np.zeros((4, 4), dtype=np.uint8))
+    salvar(pasta, "cor.png", np.zeros((4, 4), dtype=np.uint8), modo="RGB")
+    with pytest.raises(ValueError, match=r"cor\.png \(RGB\)"):
+        carregar_pilha(str(pasta))
+
+
+def test_manifesto_reinspeciona_so_alterados(pasta_com_imagens, hashes):
+    pasta = str(pasta_com_imagens)
+    primeiro = {e["nome"]: e for e in carregar_manifesto(pasta)}
+    assert sorted(hashes) == ["a.png", "b.png", "c.png"]
+
+    hashes.clear()
+    assert {e["nome"]: e for e in carregar_manifesto(pasta)} == primeiro
+    assert hashes == []
+
+    # conteúdo novo (tamanho diferente): só b é lido de novo e o hash muda
+    salvar(pasta_com_imagens, "b.png", np.zeros((7, 5), dtype=np.uint8))
+    hashes.clear()
+    segundo = {e["nome"]: e for e in carregar_manifesto(pasta)}
+    assert hashes == ["b.png"]
+    assert segundo["b.png"]["hash"] != primeiro["b.png"]["hash"]
+    assert segundo["a.png"] == primeiro["a.png"] and segundo["c.png"] == primeiro["c.png"]
+
+    # só o mtime muda (touch): c é lido de novo, com o mesmo hash
+    mtime = envelhecer(pasta_com_imagens / "c.png")
+    hashes.clear()
+    terceiro = {e["nome"]: e for e in carregar_manifesto(pasta)}
+    assert hashes == ["c.png"]
+    assert terceiro["c.png"]["mtime_ns"] == mtime
+    assert terceiro["c.png"]["hash"] == primeiro["c.png"]["hash"]
+
+
+def test_manifesto_de_outra_versao_e_descartado(pasta_com_imagens, hashes):
+    pasta = str(pasta_com_imagens)
+    carregar_manifesto(pasta)
+    arquivo = caminho_manifesto(pasta)
+    with open(arquivo, encoding="utf-8") as f:
+        dados = json.load(f)
+    dados["versao"] = VERSAO_MANIFESTO + 1
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+
+    hashes.clear()
+    carregar_manifesto(pasta)
+    assert sorted(hashes) == ["a.png", "b.png", "c.png"]
+    with open(arquivo, encoding="utf-8") as f:
+        assert json.load(f)["versao"] == VERSAO_MANIFESTO
+
+
+def test_manifesto_so_e_gravado_quando_muda(pasta_com_imagens):
+    pasta = str(pasta_com_imagens)
+    arquivo = caminho_manifesto(pasta)
+    assert not os.path.exists(arquivo)
+    carregar_manifesto(pasta, salvar=False)
+    assert not os.path.exists(arquivo)
+
+    carregar_manifesto(pasta)
+    mtime = envelhecer(arquivo)
+    carregar_manifesto(pasta)
+    assert os.stat(arquivo).st_mtime_ns == mtime
+
+    os.remove(pasta_com_imagens / "a.png")
+    carregar_manifesto(pasta)
+    assert os.stat(arquivo).st_mtime_ns != mtime
+    with open(arquivo, encoding="utf-8") as f:
+        assert sorted(json.load(f)["arquivos"]) == ["b.png", "c.png"]
+
+
+@pytest.fixture
+def decodificacoes(monkeypatch):
+    """Nomes das imagens abertas pelo PIL (e os os.replace feitos pelo cache)."""
+    abertas, trocas = [], []
+    abrir_original, replace_original = Image.open, os.replace
+
+    def abrir(caminho, *args, **kwargs):
+        abertas.append(os.path.basename(caminho))
+        return abrir_original(caminho, *args, **kwargs)
+
+    def trocar(origem, destino):
+        trocas.append((os.fspath(origem), os.fspath(destino)))
+        return replace_original(origem, destino)
+
+    monkeypatch.setattr(imagens.Image, "open", abrir)
+    monkeypatch.setattr(imagens.os, "replace", trocar)
+    return abertas, trocas
+
+
+def test_imagem_decodificada_grava_uma_vez(pasta_com_imagens, decodificacoes):
+    abertas, trocas = decodificacoes
+    pasta = str(pasta_com_imagens)
+    entrada = next(e for e in carregar_manifesto(pasta) if e["nome"] == "a.png")
+    with Image.open(pasta_com_imagens / "a.png") as img:
+        esperado = np.array(img)
+    abertas.clear()
+
+    primeira = carregar_imagem_decodificada(pasta, entrada)
+    caminho = os.path.join(pasta_decodificadas(pasta), entrada["hash"] + ".npy")
+    assert abertas == ["a.png"]
+    assert trocas == [(caminho + ".tmp", caminho)]
+    assert os.listdir(pasta_decodificadas(pasta)) == [entrada["hash"] + ".npy"]
+    assert isinstance(primeira, np.memmap)
+    np.testing.assert_array_equal(primeira, esperado)
+
+    segunda = carregar_imagem_decodificada(pasta, entrada)
+    assert abertas == ["a.png"] and len(trocas) == 1
+    assert isinstance(segunda, np.memmap) and not segunda.flags.writeable
+    np.testing.assert_array_equal(segunda, esperado)
+
+
+def test_imagem_decodificada_hash_novo_invalida(pasta_com_imagens, decodificacoes):
+    abertas, _ = decodificacoes
+    pasta = str(pasta_com_imagens)
+    antiga = next(e for e in carregar_manifesto(pasta) if e["nome"] == "b.png")
+    carregar_imagem_decodificada(pasta, antiga)
+
+    nova = np.full((7, 5), 9, dtype=np.uint8)
+    salvar(pasta_com_imagens, "b.png", nova)
+    entrada = next(e for e in carregar_manifesto(pasta) if e["nome"] == "b.png")
+    assert entrada["hash"] != antiga["hash"]
+    abertas.clear()
+    np.testing.assert_array_equal(carregar_imagem_decodificada(pasta, entrada), nova)
+    assert abertas == ["b.png"]
+    assert sorted(os.listdir(pasta_decodificadas(pasta))) == sorted(
+        [antiga["hash"] + ".npy", entrada["hash"] + ".npy"])
+
+
+def test_imagem_decodificada_sem_mmap(pasta_com_imagens, decodificacoes):
+    abertas, _ = decodificacoes
+    pasta = str(pasta_com_imagens)
+    entrada = next(e for e in carregar_manifesto(pasta) if e["nome"] == "c.png")
+    abertas.clear()
+    primeira = carregar_imagem_decodificada(pasta, entrada, mmap=False)
+    segunda = carregar_imagem_decodificada(pasta, entrada, mmap=False)
+    assert abertas == ["c.png"]
+    for matriz in (primeira, segunda):
+        assert type(matriz) is np.ndarray and matriz.flags.writeable
+    assert not np.shares_memory(primeira, segunda)
+    np.testing.assert_array_equal(primeira, segunda)
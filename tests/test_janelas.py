@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from janelas import DatasetJanelas, indices_lotes
+
+
+@pytest.mark.parametrize("total, tamanho_lote", [(0, 8), (5, 4096), (1000, 64), (300_001, 4096)])
+def test_indices_lotes_cobre_tudo_uma_vez(total, tamanho_lote):
+    for embaralhar in (False, True):
+        lotes = list(indices_lotes(total, tamanho_lote, embaralhar, semente=1))
+        assert all(len(lote) == tamanho_lote for lote in lotes[:-1])
+        todos = np.concatenate(lotes) if lotes else np.empty(0, dtype=np.int64)
+        np.testing.assert_array_equal(np.sort(todos), np.arange(total))
+
+
+def test_embaralhar_mistura_regioes():
+    total, tamanho_lote, tamanho_bloco = 500_000, 4096, 4096
+    lotes = list(indices_lotes(total, tamanho_lote, True, semente=3, tamanho_bloco=tamanho_bloco))
+    for lote in lotes[:-1]:
+        # cada lote junta janelas de muitos blocos, sem passo constante (não é progressão aritmética)
+        assert len(np.unique(lote // tamanho_bloco)) >= 32
+        assert len(np.unique(np.diff(lote))) > 1
+    assert not np.array_equal(lotes[0], next(indices_lotes(total, tamanho_lote, True, semente=4)))
+    np.testing.assert_array_equal(lotes[0], next(indices_lotes(total, tamanho_lote, True, semente=3,
+                                                               tamanho_bloco=tamanho_bloco)))
+
+
+def gerar_dados_treino_listas(matrizes, tamanho_janela, limiar_alvo):
+    """gerar_dados_treino original dos scripts 2.1: um vetor por janela numa lista."""
+    X, y = [], []
+    pad = tamanho_janela // 2
+    for matriz in matrizes:
+        for i in range(pad, matriz.shape[0] - pad):
+            for j in range(pad, matriz.shape[1] - pad):
+                vetor = matriz[i - pad:i + pad + 1, j - pad:j + pad + 1].flatten()
+                X.append(vetor)
+                y.append(1 if np.mean(vetor) > limiar_alvo else 0)
+    return np.array(X), np.array(y).reshape(-1, 1)
+
+
+@pytest.mark.parametrize("tamanho_janela", [3, 4, 5])
+def test_dataset_igual_listas(tamanho_janela, tmp_path):
+    matrizes = np.random.default_rng(tamanho_janela).integers(0, 256, (3, 12, 10), dtype=np.uint8)
+    X, _ = gerar_dados_treino_listas(matrizes, tamanho_janela, 220)
+    dataset = DatasetJanelas(matrizes[None], tamanho_janela)    # eixo de lote (1, n, h, w) dos zips
+
+    assert len(dataset) == len(X) and dataset.num_entradas == X.shape[1]
+    np.testing.assert_array_equal(dataset.fatia(0, len(dataset)), X)
+    np.testing.assert_array_equal(dataset.salvar_memmap(str(tmp_path / "X.npy"), linhas_por_bloco=3), X)
+    indices = np.array([len(X) - 1, 0, 17])
+    np.testing.assert_array_equal(dataset.lote(indices, out=np.empty((8, X.shape[1]))), X[indices])
+    lotes = [(indices, lote.copy()) for indices, lote in dataset.lotes(16, embaralhar=True, semente=0)]
+    for indices, lote in lotes:
+        np.testing.assert_array_equal(lote, X[indices])
+
+
+@pytest.mark.parametrize("tamanho_janela", [3, 4])
+@pytest.mark.parametrize("limiar_alvo", [100, 127.5, 220])
+def test_rotulos_igual_media_por_janela(tamanho_janela, limiar_alvo):
+    matrizes = np.random.default_rng(tamanho_janela).integers(0, 256, (3, 12, 10), dtype=np.uint8)
+    matrizes[0, :6] = 100                                  # janelas com média exatamente no limiar
+    _, y = gerar_dados_treino_listas(matrizes, tamanho_janela, limiar_alvo)
+    dataset = DatasetJanelas(matrizes, tamanho_janela)
+    rotulos = dataset.rotulos(limiar_alvo)
+    assert rotulos.dtype == np.uint8 and rotulos.shape == dataset.shape_posicoes
+    np.testing.assert_array_equal(rotulos.reshape(-1, 1), y)
+    assert dataset.rotulos(limiar_alvo) is rotulos
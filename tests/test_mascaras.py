@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from mascaras import MascaraBits
+
+
+@pytest.mark.parametrize("largura", [1, 7, 8, 9, 70])
+def test_mascara_bits_ida_e_volta(largura):
+    sorteio = np.random.default_rng(largura).random((2, 3, 5, largura))
+    matrizes = np.where(sorteio < 0.5, 255, 0).astype(np.uint8)
+    mascara = MascaraBits.de_matriz(matrizes)
+    assert mascara.nbytes == 2 * 3 * 5 * -(-largura // 8)
+    np.testing.assert_array_equal(mascara.para_uint8(), matrizes)
+    np.testing.assert_array_equal(mascara.para_bool(), matrizes == 255)
+    assert mascara.contar() == np.count_nonzero(matrizes)
+    np.testing.assert_array_equal(mascara[1, 2].para_uint8(), matrizes[1, 2])
+    assert mascara == MascaraBits.de_matriz(matrizes == 255)
+    with pytest.raises(IndexError):
+        mascara[0, 0, 0]
@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+from scipy import ndimage
+from scipy.ndimage import correlate
+
+from mascaras import MascaraBits
+from morfologia import (afinar_zhang_suen, aplicar_padroes_3x3, aplicar_padroes_bits, dilatacao, dilatacao_bits,
+                        erosao, erosao_bits, padrao_de_esqueleto)
+
+ESQUELETOS = [np.array(e, dtype=np.uint8) * 255 for e in (
+    [[0, 1, 0], [0, 1, 0], [0, 1, 0]],
+    [[0, 0, 0], [1, 1, 1], [0, 0, 0]],
+    [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+    [[0, 0, 1], [0, 1, 0], [1, 0, 0]],
+)]
+
+
+@pytest.fixture(params=[(1, 2, 12, 9), (2, 3, 17, 70)])
+def mascaras(request):
+    rng = np.random.default_rng(sum(request.param))
+    return np.where(rng.random(request.param) < 0.45, 255, 0).astype(np.uint8)
+
+
+def esqueleto_direto(matrizes, esqueleto):
+    """Comparação direta original (1.2): bordas intactas, janela inteira igual."""
+    b, n, h, w = matrizes.shape
+    resultado = matrizes.copy()
+    kernel_bin = (esqueleto == 255).astype(np.uint8)
+    for i in range(b):
+        for j in range(n):
+            img = (resultado[i, j] == 255).astype(np.uint8)
+            for y in range(1, h - 1):
+                for x in range(1, w - 1):
+                    if np.array_equal(img[y - 1:y + 2, x - 1:x + 2], kernel_bin):
+                        resultado[i, j, y, x] = 0
+    return resultado
+
+
+def esqueleto_binario(matrizes, esqueleto):
+    """Correlação binária original (1.2): zeros fora da imagem, só os 1 do kernel importam."""
+    resultado = matrizes.copy()
+    kernel = (esqueleto == 255).astype(np.uint8)
+    for i, j in np.ndindex(matrizes.shape[:2]):
+        img = (resultado[i, j] == 255).astype(np.uint8)
+        resultado[i, j][correlate(img, kernel, mode="constant", cval=0) == kernel.sum()] = 0
+    return resultado
+
+
+def test_padroes_igual_comparacao_direta(mascaras):
+    esperado = mascaras
+    for esqueleto in ESQUELETOS:
+        esperado = esqueleto_direto(esperado, esqueleto)
+    padroes = [padrao_de_esqueleto(e, "exato") for e in ESQUELETOS]
+    np.testing.assert_array_equal(aplicar_padroes_3x3(mascaras, padroes, bordas="ignorar"), esperado)
+
+
+def test_padroes_igual_correlacao(mascaras):
+    esperado = mascaras
+    for esqueleto in ESQUELETOS:
+        esperado = esqueleto_binario(esperado, esqueleto)
+    padroes = [padrao_de_esqueleto(e, "correlacao") for e in ESQUELETOS]
+    np.testing.assert_array_equal(aplicar_padroes_3x3(mascaras, padroes), esperado)
+
+
+def test_paralelo_usa_so_a_entrada(mascaras):
+    padroes = [padrao_de_esqueleto(e, "correlacao") for e in ESQUELETOS]
+    esperado = mascaras.copy()
+    for padrao in padroes:
+        esperado[aplicar_padroes_3x3(mascaras, [padrao]) != mascaras] = 0
+    np.testing.assert_array_equal(aplicar_padroes_3x3(mascaras, padroes, modo="paralelo"), esperado)
+
+
+TAMANHOS = [1, 2, 3, 4, 5, 7, (2, 5), (4, 1)]
+
+
+@pytest.mark.parametrize("tamanho", TAMANHOS)
+def test_erosao_dilatacao_igual_scipy(mascaras, tamanho):
+    forma = tamanho if isinstance(tamanho, tuple) else (tamanho, tamanho)
+    estrutura = np.ones((1, 1) + forma, dtype=bool)
+    binarias = mascaras == 255
+    np.testing.assert_array_equal(erosao(mascaras, tamanho),
+                                  255 * ndimage.binary_erosion(binarias, structure=estrutura))
+    np.testing.assert_array_equal(dilatacao(mascaras, tamanho),
+                                  255 * ndimage.binary_dilation(binarias, structure=estrutura))
+
+
+@pytest.mark.parametrize("bordas, modo", [("refletir", "reflect"), ("repetir", "nearest")])
+@pytest.mark.parametrize("tamanho", [3, 5, (3, 7)])
+def test_bordas_virtuais_igual_filtros_scipy(mascaras, bordas, modo, tamanho):
+    forma = (1, 1) + (tamanho if isinstance(tamanho, tuple) else (tamanho, tamanho))
+    np.testing.assert_array_equal(erosao(mascaras, tamanho, bordas=bordas),
+                                  ndimage.minimum_filter(mascaras, size=forma, mode=modo))
+    np.testing.assert_array_equal(dilatacao(mascaras, tamanho, bordas=bordas),
+                                  ndimage.maximum_filter(mascaras, size=forma, mode=modo))
+
+
+def test_saida_bool_no_buffer(mascaras):
+    out = np.empty(mascaras.shape, dtype=bool)
+    assert erosao(mascaras, 3, out=out) is out
+    np.testing.assert_array_equal(out, erosao(mascaras, 3) == 255)
+
+
+@pytest.fixture(params=[1, 8, 63, 64, 65, 130])
+def mascara_bits(request):
+    rng = np.random.default_rng(request.param)
+    matrizes = np.where(rng.random((2, 2, 11, request.param)) < 0.6, 255, 0).astype(np.uint8)
+    return matrizes, MascaraBits.de_matriz(matrizes)
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 4, 7, (3, 66), (5, 2)])
+def test_morfologia_bits_igual_uint8(mascara_bits, tamanho):
+    matrizes, mascara = mascara_bits
+    assert erosao_bits(mascara, tamanho) == MascaraBits.de_matriz(erosao(matrizes, tamanho))
+    assert dilatacao_bits(mascara, tamanho) == MascaraBits.de_matriz(dilatacao(matrizes, tamanho))
+
+
+@pytest.mark.parametrize("modo", ["sequencial", "paralelo"])
+@pytest.mark.parametrize("bordas, tipo", [("zero", "correlacao"), ("ignorar", "exato")])
+def test_padroes_bits_igual_uint8(mascara_bits, modo, bordas, tipo):
+    matrizes, mascara = mascara_bits
+    padroes = [padrao_de_esqueleto(e, tipo) for e in ESQUELETOS]
+    esperado = aplicar_padroes_3x3(matrizes, padroes, modo=modo, bordas=bordas)
+    assert aplicar_padroes_bits(mascara, padroes, modo=modo, bordas=bordas) == MascaraBits.de_matriz(esperado)
+
+
+def zhang_suen_varredura(imagem, max_iteracoes=None):
+    """Zhang-Suen de livro: varre a imagem inteira a cada subiteração (fora = 0)."""
+    img = np.pad(imagem.astype(np.uint8), 1)
+    iteracao = 0
+    mudou = True
+    while mudou and (max_iteracoes is None or iteracao < max_iteracoes):
+        mudou = False
+        for sub in (0, 1):
+            apagar = []
+            for y, x in zip(*np.nonzero(img)):
+                p2, p3, p4, p5 = img[y - 1, x], img[y - 1, x + 1], img[y, x + 1], img[y + 1, x + 1]
+                p6, p7, p8, p9 = img[y + 1, x], img[y + 1, x - 1], img[y, x - 1], img[y - 1, x - 1]
+                vizinhos = [p2, p3, p4, p5, p6, p7, p8, p9]
+                b = sum(vizinhos)
+                a = sum(vizinhos[k] == 0 and vizinhos[(k + 1) % 8] == 1 for k in range(8))
+                if sub == 0:
+                    condicao = p2 * p4 * p6 == 0 and p4 * p6 * p8 == 0
+                else:
+                    condicao = p2 * p4 * p8 == 0 and p2 * p6 * p8 == 0
+                if 2 <= b <= 6 and a == 1 and condicao:
+                    apagar.append((y, x))
+            for y, x in apagar:
+                img[y, x] = 0
+            mudou |= bool(apagar)
+        iteracao += 1
+    return img[1:-1, 1:-1].astype(bool)
+
+
+@pytest.mark.parametrize("max_iteracoes", [None, 1, 2])
+def test_zhang_suen_igual_varredura_completa(max_iteracoes):
+    rng = np.random.default_rng(4)
+    pilha = np.zeros((2, 3, 18, 23), dtype=np.uint8)
+    pilha[..., 3:15, 4:19] = 255                        # blocos cheios afinam por várias iterações
+    pilha[rng.random(pilha.shape) < 0.15] = 255
+    resultado = afinar_zhang_suen(pilha, max_iteracoes=max_iteracoes)
+    for indice in np.ndindex(pilha.shape[:2]):
+        esperado = zhang_suen_varredura(pilha[indice] == 255, max_iteracoes)
+        np.testing.assert_array_equal(resultado[indice], 255 * esperado)
+    np.testing.assert_array_equal(afinar_zhang_suen(pilha == 255, max_iteracoes=max_iteracoes),
+                                  resultado == 255)
@@ -0,0 +1,79 @@
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import paralelo
+from paralelo import executar_por_imagem
+from filtros import filtro_media_integral, reduzir_blocos
+from morfologia import erosao, dilatacao
+
+
+@pytest.fixture
+def pilha():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (5, 40, 30), dtype=np.uint8)
+
+
+def serial(funcao, matrizes, **kwargs):
+    return np.stack([funcao(m, **kwargs) for m in matrizes])
+
+
+@pytest.mark.parametrize("funcao, kwargs", [
+    (filtro_media_integral, {"filtro_size": 3, "bordas": "constante", "manter_padding": True}),
+    (reduzir_blocos, {"block_size": 2}),
+    (erosao, {"tamanho": 3}),
+    (dilatacao, {"tamanho": 4}),
+])
+@pytest.mark.parametrize("imagens_por_bloco", [None, 1, 3])
+def test_processos_igual_serial(pilha, funcao, kwargs, imagens_por_bloco):
+    esperado = serial(funcao, pilha, **kwargs)
+    resultado = executar_por_imagem(funcao, pilha, num_processos=2,
+                                    imagens_por_bloco=imagens_por_bloco, **kwargs)
+    assert resultado.dtype == esperado.dtype
+    np.testing.assert_array_equal(resultado, esperado)
+    np.testing.assert_array_equal(executar_por_imagem(funcao, pilha, num_processos=1, **kwargs), esperado)
+
+
+def test_eixos_de_lote_e_memmap(pilha, tmp_path):
+    caminho = tmp_path / "pilha.npy"
+    np.save(caminho, pilha.reshape(1, 5, 40, 30))
+    entrada = np.load(caminho, mmap_mode="r")
+    funcao = partial(filtro_media_integral, filtro_size=5)
+    resultado = executar_por_imagem(funcao, entrada, num_processos=2)
+    assert resultado.shape == (1, 5, 40, 30)
+    np.testing.assert_array_equal(resultado[0], serial(funcao, pilha))
+
+
+def test_pilha_vazia():
+    vazia = np.empty((0, 10, 12), dtype=np.uint8)
+    resultado = executar_por_imagem(erosao, vazia, num_processos=2, tamanho=3)
+    assert resultado.shape == (0, 10, 12)
+
+
+def test_falha_ao_criar_saida_libera_entrada(pilha, monkeypatch):
+    criados = []
+    original = paralelo._criar_compartilhado
+
+    def criar(shape, dtype):
+        if criados:
+            raise MemoryError("sem memória compartilhada")
+        shm, array = original(shape, dtype)
+        criados.append(shm.name)
+        return shm, array
+
+    monkeypatch.setattr(paralelo, "_criar_compartilhado", criar)
+    with pytest.raises(MemoryError):
+        executar_por_imagem(erosao, pilha, num_processos=2, tamanho=3)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=criados[0])
+
+
+def test_uma_imagem_sem_pool(pilha, monkeypatch):
+    def sem_pool(*args, **kwargs):
+        raise AssertionError("Pool criado para uma única imagem")
+
+    monkeypatch.setattr(paralelo, "Pool", sem_pool)
+    resultado = executar_por_imagem(reduzir_blocos, pilha[:1], num_processos=4, block_size=2)
+    np.testing.assert_array_equal(resultado, serial(reduzir_blocos, pilha[:1], block_size=2))
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from mascaras import MascaraBits
+from pilha import PilhaImagens, achatar_lote, verificar_pilha
+
+
+@pytest.fixture
+def matrizes():
+    return np.random.default_rng(0).integers(0, 256, (4, 6, 5), dtype=np.uint8)
+
+
+def test_achatar_lote_sem_copia(matrizes):
+    lote = matrizes.reshape(1, 2, 2, 6, 5)
+    achatadas = achatar_lote(lote)
+    assert achatadas.shape == (4, 6, 5)
+    assert np.shares_memory(achatadas, matrizes)
+    assert achatar_lote(matrizes[0]).shape == (1, 6, 5)
+    with pytest.raises(ValueError):
+        achatar_lote(matrizes[0, 0])
+
+
+def test_achatar_lote_mascara(matrizes):
+    mascara = MascaraBits.de_matriz(matrizes.reshape(2, 2, 6, 5))
+    achatada = achatar_lote(mascara)
+    assert isinstance(achatada, MascaraBits)
+    assert achatada.shape == (4, 6, 5)
+    assert np.shares_memory(achatada.bits, mascara.bits)
+    np.testing.assert_array_equal(achatada.para_bool(), matrizes != 0)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, bool])
+def test_verificar_pilha_devolve_a_propria(matrizes, dtype):
+    pilha = matrizes.astype(dtype)
+    assert verificar_pilha(pilha, "etapa", dtype=dtype, shape=(4, 6, 5)) is pilha
+
+
+@pytest.mark.parametrize("entrada, erro, mensagem", [
+    (lambda m: list(m), TypeError, "lista"),
+    (lambda m: MascaraBits.de_matriz(m), TypeError, "np.ndarray"),
+    (lambda m: m[0], ValueError, "shape"),
+    (lambda m: m[None], ValueError, "shape"),
+    (lambda m: m.astype(np.int64), TypeError, "int64"),
+    (lambda m: m.astype(np.float32), TypeError, "float32"),
+    (lambda m: m[:, :, ::2], ValueError, "contígua"),
+    (lambda m: m.transpose(0, 2, 1), ValueError, "contígua"),
+])
+def test_verificar_pilha_erros(matrizes, entrada, erro, mensagem):
+    with pytest.raises(erro, match=mensagem):
+        verificar_pilha(entrada(matrizes), "etapa")
+
+
+def test_verificar_pilha_dtype_e_shape_esperados(matrizes):
+    with pytest.raises(TypeError, match="esperado bool"):
+        verificar_pilha(matrizes, "etapa", dtype=bool)
+    with pytest.raises(ValueError, match="esperado"):
+        verificar_pilha(matrizes, "etapa", shape=(4, 5, 6))
+
+
+def test_alocar():
+    pilha = PilhaImagens.alocar(3, 6, 5, dtype=bool, etapa="vazia")
+    assert pilha.shape == (3, 6, 5) and pilha.dtype == bool
+    assert pilha.dados.flags.c_contiguous
+    assert pilha.historico == [("vazia", (3, 6, 5), np.dtype(bool), 90)]
+
+
+def test_de_matrizes_array(matrizes):
+    pilha = PilhaImagens.de_matrizes(matrizes.reshape(1, 4, 6, 5))
+    assert pilha.shape == (4, 6, 5)
+    assert np.shares_memory(pilha.dados, matrizes)
+
+    # entrada não contígua: uma única cópia contígua
+    transposta = PilhaImagens.de_matrizes(matrizes.transpose(0, 2, 1))
+    assert transposta.dados.flags.c_contiguous
+    np.testing.assert_array_equal(transposta.dados, matrizes.transpose(0, 2, 1))
+
+    with pytest.raises(TypeError):
+        PilhaImagens.de_matrizes(matrizes.astype(np.float64))
+
+
+def test_de_matrizes_lista(matrizes):
+    pilha = PilhaImagens.de_matrizes(list(matrizes), "lista")
+    np.testing.assert_array_equal(pilha.dados, matrizes)
+    assert not np.shares_memory(pilha.dados, matrizes)
+    assert pilha.etapa == "lista"
+
+    with pytest.raises(ValueError, match="nenhuma"):
+        PilhaImagens.de_matrizes([])
+    with pytest.raises(ValueError, match="matriz 2"):
+        PilhaImagens.de_matrizes([matrizes[0], matrizes[1], matrizes[2, :5]])
+    with pytest.raises(ValueError, match="matriz 1"):
+        PilhaImagens.de_matrizes([matrizes[0], matrizes[1].astype(bool)])
+
+
+def test_seguinte(matrizes):
+    pilha = PilhaImagens.de_matrizes(matrizes, "suavizadas")
+    binarizadas = pilha.seguinte("binarizacao", matrizes > 127, dtype=bool, mesmo_shape=True)
+    assert binarizadas.etapa == "binarizacao"
+    assert [etapa for etapa, *_ in binarizadas.historico] == ["suavizadas", "binarizacao"]
+    assert pilha.historico == [("suavizadas", (4, 6, 5), np.dtype(np.uint8), 120)]
+
+    reduzidas = binarizadas.seguinte("reducao", np.zeros((4, 3, 2), dtype=np.uint8))
+    assert reduzidas.historico[-1] == ("reducao", (4, 3, 2), np.dtype(np.uint8), 24)
+
+    with pytest.raises(TypeError, match="binarizacao"):
+        pilha.seguinte("binarizacao", matrizes > 127, dtype=np.uint8)
+    with pytest.raises(ValueError, match="reducao"):
+        pilha.seguinte("reducao", matrizes[:, :3], mesmo_shape=True)
+    with pytest.raises(ValueError, match="3 imagens"):
+        pilha.seguinte("reducao", matrizes[:3])
+
+
+def test_aplicar(matrizes):
+    pilha = PilhaImagens.de_matrizes(matrizes)
+    chamadas = []
+
+    def etapa(dados, limiar, saida=None):
+        chamadas.append((dados, limiar))
+        np.greater(dados, limiar, out=saida)
+        return saida
+
+    saida = pilha.alocar_saida(dtype=bool)
+    resultado = pilha.aplicar("limiar", etapa, 100, saida=saida, dtype=bool, mesmo_shape=True)
+    assert chamadas[0][0] is pilha.dados and chamadas[0][1] == 100
+    assert resultado.dados is saida
+    np.testing.assert_array_equal(resultado.dados, matrizes > 100)
+
+    with pytest.raises(TypeError, match="soma"):
+        pilha.aplicar("soma", lambda dados: dados + np.int64(1))
+
+
+def test_para_mascara(matrizes):
+    binarizadas = np.where(matrizes > 127, 255, 0).astype(np.uint8)
+    mascara = PilhaImagens.de_matrizes(binarizadas).para_mascara()
+    assert isinstance(mascara, MascaraBits)
+    assert mascara.shape == (4, 6, 5)
+    np.testing.assert_array_equal(mascara.para_uint8(), binarizadas)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from pipeline import executar_pipeline, etapa_deteccao
+from imagens import carregar_pilha
+from filtros import filtro_media_integral, binarizar_por_histograma, reduzir_blocos
+from morfologia import erosao, dilatacao
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    rng = np.random.default_rng(3)
+    pasta = tmp_path / "img"
+    pasta.mkdir()
+    for i in range(4):
+        imagem = rng.normal(50, 20, (120, 90))
+        for y, x in rng.integers(0, 80, (6, 2)):
+            imagem[y:y + 6, x:x + 6] = 250
+        Image.fromarray(imagem.clip(0, 255).astype(np.uint8)).save(pasta / f"i{i}.png")
+    return str(pasta)
+
+
+def referencia(pasta):
+    imagens = carregar_pilha(pasta, usar_cache=False)
+    suavizadas = filtro_media_integral(imagens, 3, bordas="constante", manter_padding=True,
+                                       size_padding=1)
+    binarizadas = binarizar_por_histograma(suavizadas[None], 5)[0][0]
+    return dilatacao(erosao(reduzir_blocos(binarizadas, 2), 1), 4)
+
+
+@pytest.mark.parametrize("num_processos", [1, 2])
+def test_pipeline_igual_etapas_diretas(pasta, tmp_path, num_processos):
+    alvos, chaves = executar_pipeline(pasta, pasta_cache=str(tmp_path / "cache"),
+                                      num_processos=num_processos)
+    np.testing.assert_array_equal(alvos, etapa_deteccao(referencia(pasta)))
+    mascaras, _ = executar_pipeline(pasta, fim="morfologia", pasta_cache=str(tmp_path / "cache"),
+                                    num_processos=num_processos)
+    np.testing.assert_array_equal(mascaras, referencia(pasta))
+
+
+@pytest.mark.parametrize("parametros", [
+    {},
+    {"manter_padding": False, "filtro_size": 5},
+    {"kernel_erosao": 3, "kernel_dilatacao": 4,
+     "esqueletos": (((0, 255, 0), (0, 255, 0), (0, 255, 0)),)},
+])
+def test_ladrilhos_igual_imagem_inteira(pasta, tmp_path, parametros):
+    inteiro, _ = executar_pipeline(pasta, parametros, fim="morfologia",
+                                   pasta_cache=str(tmp_path / "cache"))
+    por_ladrilhos, _ = executar_pipeline(pasta, parametros, fim="morfologia", num_processos=2,
+                                         pasta_cache=str(tmp_path / "cache"), tamanho_ladrilho=16)
+    np.testing.assert_array_equal(por_ladrilhos, inteiro)
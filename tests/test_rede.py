@@ -0,0 +1,178 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from rede import MotorTreino
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def passo_referencia(pesos, X, y, bias, taxa_aprendizado):
+    """Passo em float64 com listas novas a cada camada (regra dos scripts 2.1)."""
+    ativacoes = [X]
+    for w in pesos:
+        ativacoes.append(sigmoid(ativacoes[-1] @ w + bias))
+    acertos = np.count_nonzero((ativacoes[-1] > 0.5) == y)
+    delta = (ativacoes[-1] - y) * ativacoes[-1] * (1 - ativacoes[-1])
+    gradientes = [None] * len(pesos)
+    for i in reversed(range(len(pesos))):
+        gradientes[i] = ativacoes[i].T @ delta
+        if i > 0:
+            delta = (delta @ pesos[i].T) * ativacoes[i] * (1 - ativacoes[i])
+    return [w - taxa_aprendizado * g for w, g in zip(pesos, gradientes)], acertos
+
+
+def test_passo_igual_referencia_float64():
+    rng = np.random.default_rng(0)
+    pesos = [rng.standard_normal(s) * 0.3 for s in ((9, 32), (32, 32), (32, 1))]
+    motor = MotorTreino(pesos, 64, bias=1.0, taxa_aprendizado=0.01)
+    referencia = [w.astype(np.float64) for w in motor.pesos]
+    for passo in range(20):
+        n = 37 if passo % 5 == 0 else 64  # lotes incompletos usam views dos buffers
+        X = rng.integers(0, 256, (n, 9)).astype(np.float32) / 255
+        y = (rng.random((n, 1)) < 0.3).astype(np.uint8)
+        acertos = motor.passo(X, y)
+        referencia, acertos_referencia = passo_referencia(referencia, X.astype(np.float64), y, 1.0, 0.01)
+        assert acertos == acertos_referencia
+    for w, r in zip(motor.pesos, referencia):
+        assert w.dtype == np.float32
+        np.testing.assert_allclose(w, r, atol=1e-5)
+
+
+def test_lote_maior_que_o_motor():
+    motor = MotorTreino([np.zeros((9, 4)), np.zeros((4, 1))], 8)
+    with pytest.raises(ValueError):
+        motor.passo(np.zeros((9, 9), dtype=np.float32), np.zeros((9, 1), dtype=np.uint8))
+
+
+def test_passo_sem_alocacoes_em_regime():
+    rng = np.random.default_rng(1)
+    tamanho_lote, ocultos = 1024, 64
+    pesos = [rng.standard_normal(s).astype(np.float32) for s in ((9, ocultos), (ocultos, ocultos), (ocultos, 1))]
+    motor = MotorTreino(pesos, tamanho_lote)
+    X = rng.random((tamanho_lote, 9), dtype=np.float32)
+    y = (rng.random((tamanho_lote, 1)) < 0.3).astype(np.uint8)
+    for _ in range(3):  # aquecimento (caches internos do NumPy/BLAS)
+        motor.passo(X, y)
+
+    tracemalloc.start()
+    try:
+        inicio = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(10):
+            motor.passo(X, y)
+        atual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert atual - inicio <= 0
+    # nenhum array por passo: o pico fica muito abaixo de um buffer de ativação
+    assert pico - inicio < tamanho_lote * ocultos * 4 // 4
+
+
+def test_treino_com_dataset_igual_memmap(tmp_path):
+    from janelas import DatasetJanelas
+    from rede import treinar_mini_lotes
+
+    rng = np.random.default_rng(2)
+    matrizes = rng.integers(0, 256, (2, 30, 40), dtype=np.uint8)
+    dataset = DatasetJanelas(matrizes, 3)
+    y = dataset.rotulos(120).reshape(-1, 1)
+    pesos = [rng.standard_normal(s).astype(np.float32) * 0.001 for s in ((9, 8), (8, 1))]
+
+    a = treinar_mini_lotes(dataset, y, pesos, 2, tamanho_lote=256, taxa_aprendizado=1e-4, semente=5)
+    b = treinar_mini_lotes(dataset.salvar_memmap(str(tmp_path / "janelas.npy")), y, pesos, 2,
+                           tamanho_lote=256, taxa_aprendizado=1e-4, semente=5)
+    for wa, wb in zip(a, b):
+        np.testing.assert_array_equal(wa, wb)
+
+
+def mapa_por_pixel(matriz, pesos, tamanho_janela, bias):
+    """Laço por pixel antigo de contar_alvos: um feedforward por janela."""
+    pad = tamanho_janela // 2
+    probabilidades = np.zeros(matriz.shape)
+    for i in range(pad, matriz.shape[0] - pad):
+        for j in range(pad, matriz.shape[1] - pad):
+            a = matriz[i - pad:i + pad + 1, j - pad:j + pad + 1].flatten().astype(np.float64)
+            for w in pesos:
+                a = sigmoid(a @ w + bias)
+            probabilidades[i, j] = a[0]
+    return probabilidades
+
+
+@pytest.mark.parametrize("tamanho_janela", [3, 4, 5])
+@pytest.mark.parametrize("linhas_por_bloco", [1, 7, 64])
+def test_mapa_igual_laco_por_pixel(tamanho_janela, linhas_por_bloco):
+    from rede import mapa_alvos, mapa_probabilidades
+
+    rng = np.random.default_rng(tamanho_janela)
+    lado = 2 * (tamanho_janela // 2) + 1
+    matriz = rng.integers(0, 256, (23, 31), dtype=np.uint8)
+    pesos = [rng.standard_normal(s) * 0.01 for s in ((lado * lado, 16), (16, 8), (8, 1))]
+    referencia = mapa_por_pixel(matriz, pesos, tamanho_janela, 1.0)
+    pad = tamanho_janela // 2
+
+    probabilidades = mapa_probabilidades(matriz, pesos, tamanho_janela, 1.0, linhas_por_bloco)
+    np.testing.assert_allclose(probabilidades, referencia[pad:-pad, pad:-pad], rtol=1e-12)
+    np.testing.assert_array_equal(mapa_alvos(matriz, pesos, tamanho_janela, 1.0, linhas_por_bloco),
+                                  referencia > 0.5)
+
+
+@pytest.mark.parametrize("tamanho_ladrilho", [8, (5, 13), 512])
+def test_mapa_alvos_em_ladrilhos_igual_imagem_inteira(tamanho_ladrilho):
+    from ladrilhos import processar_em_ladrilhos
+    from rede import mapa_alvos
+
+    rng = np.random.default_rng(7)
+    pilha = rng.integers(0, 256, (2, 37, 29), dtype=np.uint8)
+    pesos = [(rng.standard_normal(s) * 0.01).astype(np.float32) for s in ((9, 16), (16, 1))]
+    inteira = np.stack([mapa_alvos(m, pesos, 3, 1.0) for m in pilha])
+    por_ladrilhos = processar_em_ladrilhos(mapa_alvos, pilha, 3 // 2, tamanho_ladrilho,
+                                           pesos=pesos, tamanho_janela=3, bias=1.0)
+    np.testing.assert_array_equal(por_ladrilhos, inteira)
+    assert 0 < inteira.sum() < inteira.size
+
+
+def test_passo_com_memmap_sem_alocacoes(tmp_path):
+    from janelas import DatasetJanelas
+    from rede import lote_entradas
+
+    rng = np.random.default_rng(3)
+    tamanho_lote, ocultos = 1024, 64
+    dataset = DatasetJanelas(rng.integers(0, 256, (2, 40, 50), dtype=np.uint8), 3)
+    X = dataset.salvar_memmap(str(tmp_path / "janelas.npy"))
+    y = dataset.rotulos(127).reshape(-1, 1)
+    pesos = [rng.standard_normal(s).astype(np.float32) * 0.01 for s in ((9, ocultos), (ocultos, 1))]
+    motor = MotorTreino(pesos, tamanho_lote, taxa_aprendizado=1e-4)
+    buffer = np.empty((tamanho_lote, 9), dtype=np.float32)
+    bruto = np.empty((tamanho_lote, 9), dtype=X.dtype)
+    y_lote = np.empty((tamanho_lote, 1), dtype=y.dtype)
+    lotes = [rng.permutation(len(X))[:n] for n in (tamanho_lote, 700)]
+
+    def passo(indices):
+        X_lote = lote_entradas(X, indices, buffer, bruto)
+        return motor.passo(X_lote, np.take(y, indices, axis=0, out=y_lote[:len(indices)], mode="clip"))
+
+    np.testing.assert_array_equal(lote_entradas(X, lotes[1], buffer, bruto), X[lotes[1]])
+    for _ in range(30):  # aquecimento: os caches internos do NumPy enchem nas primeiras chamadas
+        for indices in lotes:
+            passo(indices)
+
+    tracemalloc.start()
+    try:
+        inicio = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(10):
+            for indices in lotes:
+                passo(indices)
+        atual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # tolerância para objetos pequenos dos caches do NumPy e para as views
+    # do lote parcial; copiar o lote para um array novo (float32) passaria disso
+    assert atual - inicio < 1024
+    assert pico - inicio < buffer[:len(lotes[1])].nbytes // 2